@@ -20,30 +20,20 @@ try:
     from droidrun.agent.droid import DroidAgent
     from droidrun.agent.utils.llm_picker import load_llm
     from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig
+    from droidrun import AdbTools
 except ImportError:
     print("CRITICAL ERROR: 'droidrun' library not found.")
     sys.exit(1)
 
+from neurorun.device_pool import get_device_pool
+from neurorun.app_registry import resolve_package
+from neurorun.device_primitives import DevicePrimitives
+
 # CONFIGURATION
 # Set this to FALSE if cloud credits run out during the demo!
 USE_CLOUD = os.getenv("USE_MOBILE_RUN", "False").lower() == "true"
 
 class AgentFactory:
-    
-    APP_MAPPING = {
-        "Uber": "com.ubercab",
-        "MakeMyTrip": "com.makemytrip",
-        "Booking.com": "com.booking",
-        "Amazon": "com.amazon.mShop.android.shopping",
-        "Flipkart": "com.flipkart.android",
-        "Zomato": "com.application.zomato",
-        "Swiggy": "in.swiggy.android", 
-        "WhatsApp": "com.whatsapp",
-        "PharmEasy": "com.pharmeasy.app",
-        "Apollo 24|7": "com.apollo.patientapp",
-        "Tata 1mg": "com.aranoah.healthkart.plus",
-        "Ola": "com.olacabs.customer"
-    }
 
     @staticmethod
     async def run_task(app_identifier, instruction, provider="gemini", model="models/gemini-2.5-flash"):
@@ -52,7 +42,7 @@ class AgentFactory:
         app_identifier: Can be App Name (e.g. "Uber") or Package ID.
         """
         # Resolve App ID
-        app_package = AgentFactory.APP_MAPPING.get(app_identifier, app_identifier)
+        app_package = resolve_package(app_identifier) or app_identifier
 
         if USE_CLOUD and MobileRunClient:
             try:
@@ -96,15 +86,25 @@ class AgentFactory:
         telemetry_config = TelemetryConfig(enabled=False)
         config = DroidrunConfig(agent=agent_config, telemetry=telemetry_config)
 
-        agent = DroidAgent(goal=instruction, llms=llm, config=config)
-        
-        try:
-            result = await agent.run()
-            raw_text = str(result.reason) if hasattr(result, 'reason') else str(result)
-            return AgentFactory._parse_output(raw_text)
-        except Exception as e:
-            print(f"❌ Local Execution Failed: {e}")
-            return {"status": "failed", "error": str(e)}
+        # Pin the agent to a leased phone so concurrent tasks don't share one device
+        async with get_device_pool().lease(f"factory:{app_identifier}", package=app_package) as device:
+            primitives = DevicePrimitives(device.serial)
+            quick = await primitives.run_goal(instruction)
+            if quick is not None:
+                return quick
+            if resolve_package(app_identifier):
+                await primitives.launch_app(app_package)
+            # Tools bound to the leased serial: the agent must never fall back to "the" attached device
+            tools = await AdbTools.create(serial=device.serial)
+            agent = DroidAgent(goal=instruction, llms=llm, config=config, tools=tools)
+
+            try:
+                result = await agent.run()
+                raw_text = str(result.reason) if hasattr(result, 'reason') else str(result)
+                return AgentFactory._parse_output(raw_text)
+            except Exception as e:
+                print(f"❌ Local Execution Failed: {e}")
+                return {"status": "failed", "error": str(e)}
 
     @staticmethod
     def _parse_output(raw_text: str) -> dict:
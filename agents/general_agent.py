@@ -1,7 +1,7 @@
 import os
 import json
 import asyncio
-from typing import List, Dict, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from dotenv import load_dotenv
 
 # Import DroidRun LLM tools for the Brain
@@ -18,23 +18,36 @@ except ImportError:
     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
     from agents.agent_factory import AgentFactory
 
+from neurorun.llm_gateway import get_gateway, PRIORITY_INTERACTIVE, estimate_tokens
+from neurorun.chat_sessions import ChatSessionStore
+from neurorun.intent_parser import fast_path
+
 load_dotenv()
 
 class GeneralAgent:
     """
     The 'Brain' of the Agentic OS.
-    - Maintains conversation history.
-    - Classifies Intent: CHAT vs ACTION.
+    - Maintains conversation history (bounded: LRU/TTL sessions, capped turns; see ChatSessionStore).
+    - Classifies Intent: CHAT vs ACTION (clear, complete commands are parsed locally, no LLM call).
     - Asks clarifying questions if ACTION parameters are missing.
-    - Delegates to AgentFactory.
+    - Delegates to AgentFactory, or hands the action to `submit_action(session_id, action) -> task_id`
+      (the server's task system) and replies without waiting for the phone.
     """
     
-    def __init__(self, provider="gemini", model="models/gemini-2.5-flash"):
+    def __init__(self, provider="gemini", model="models/gemini-2.5-flash",
+                 submit_action: Optional[Callable[[str, Dict[str, Any]], Awaitable[str]]] = None):
         self.provider = provider
         self.model = model
-        # Simple in-memory session store: { session_id: [messages] }
-        # In prod, use Redis/DB.
-        self.sessions: Dict[str, List[Dict]] = {}
+        self.submit_action = submit_action
+        # Live chat objects per session; evicted sessions go to CHAT_SESSION_DIR when set
+        self.sessions = ChatSessionStore()
+        self.llm = get_gateway()
+        # Local intent parser for clear commands; anything below the confidence bar goes to the LLM
+        self.fast_path = os.getenv("INTENT_FASTPATH", "True").lower() == "true"
+        self.min_confidence = float(os.getenv("INTENT_MIN_CONFIDENCE", "0.8"))
+        self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+        if self.api_key:
+            self.llm.configure(self.api_key)
         
         # System Prompt defines the persona
         self.system_prompt = (
@@ -72,25 +85,32 @@ class GeneralAgent:
             "}\n"
             "```"
         )
+        self.prompt_tokens = estimate_tokens(self.system_prompt)
 
     async def chat(self, session_id: str, user_text: str) -> Dict[str, Any]:
         """
-        Main entry point. Returns { "text": "...", "action": ... }
+        Main entry point. Returns { "response": "...", "action_debug": ..., "task_id": ... }
+        (task_id is set when an action was handed to the task system).
         """
-        # 1. Initialize Session
-        if session_id not in self.sessions:
-            self.sessions[session_id] = [
-                {"role": "user", "parts": [f"System: {self.system_prompt}"]} # Priming
-            ]
-        
-        history = self.sessions[session_id]
-        history.append({"role": "user", "parts": [user_text]})
-        
-        # 2. Call LLM (Using DroidRun's LLM Picker or direct)
-        response_text = await self._call_llm(history)
+        # 1. Session (turns of one session run one at a time; other sessions are not blocked)
+        session = self.sessions.get(session_id)
+        async with session.lock:
+            local = fast_path(user_text, self.min_confidence) if self.fast_path else None
+            if local:
+                # 2a. Clear command: answered locally; the turn is recorded so the LLM sees it next time
+                print(f"⚡ [GeneralAgent] Local intent: {local['app']}")
+                response_text = f"```json\n{json.dumps(local)}\n```"
+                session.add_turn(user_text, response_text)
+                if session.chat is not None:
+                    # Extend the live chat (the history setter converts plain dicts) instead of rebuilding it
+                    session.chat.history = list(session.chat.history) + session.history[-2:]
+            else:
+                # 2b. Call LLM on the session's live chat object
+                response_text = await self._call_llm(session, user_text)
         
         # 3. Parse Response
         action = None
+        task_id = None
         clean_text = response_text
         
         try:
@@ -105,74 +125,58 @@ class GeneralAgent:
                     # 4. EXECUTE AGENT IF ACTION DETECTED
                     print(f"🤖 Triggering Agent: {action['app']}")
                     
-                    # Run in background or await? 
-                    # For responsiveness, we usually await if it's fast, or return "Started"
-                    # User asked for "Not Fail", so let's await to confirm start, 
-                    # but maybe the actual long-running task should be async.
-                    # For this demo, we'll await the result to give immediate feedback.
-                    
-                    agent_res = await AgentFactory.run_task(
-                        app_identifier=action['app'],
-                        instruction=action['instruction'],
-                        provider=self.provider,
-                        model=self.model
-                    )
-                    
-                    if agent_res.get("status") == "success":
-                         clean_text = f"Done! {agent_res.get('message', 'Task completed successfully.')}"
-                         # Add specific details if available
-                         if 'price' in str(agent_res): 
-                             clean_text += f" The price is {agent_res.get('price', '')}."
+                    if self.submit_action:
+                        # Runs as a task: the acknowledgement is spoken now, the result arrives over /ws
+                        task_id = await self.submit_action(session_id, action)
                     else:
-                         clean_text = f"I tried, but ran into an issue: {agent_res.get('error', 'Unknown error')}."
+                        agent_res = await AgentFactory.run_task(
+                            app_identifier=action['app'],
+                            instruction=action['instruction'],
+                            provider=self.provider,
+                            model=self.model
+                        )
+                        clean_text = self.describe_result(agent_res)
             
         except Exception as e:
             print(f"Error parsing general agent response: {e}")
         
-        # 5. Update History
-        history.append({"role": "model", "parts": [response_text]})
-        
         return {
             "response": clean_text,
-            "action_debug": action
+            "action_debug": action,
+            "task_id": task_id
         }
 
-    async def _call_llm(self, history: List[Dict]) -> str:
-        """Helper to call Gemini via DroidRun or Direct"""
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        
-        # Simplify history for API consumption if needed, 
-        # but Gemini SDK handles the list format well usually.
-        # We'll use a direct generation here for simplicity/speed if DroidRun is heavy,
-        # but let's try to align with the project's imports if possible.
-        
+    @staticmethod
+    def describe_result(agent_res: Optional[Dict[str, Any]]) -> str:
+        """One spoken sentence for a finished action."""
+        agent_res = agent_res or {}
+        if agent_res.get("status") == "success":
+            text = f"Done! {agent_res.get('message', 'Task completed successfully.')}"
+            # Add specific details if available
+            if agent_res.get('price'):
+                text += f" The price is {agent_res['price']}."
+            return text
+        return f"I tried, but ran into an issue: {agent_res.get('error', 'Unknown error')}."
+
+    def _start_chat(self, history: List[Dict]):
+        # The persona goes in as a system instruction (model cached by the gateway), not as a fake first turn
+        return self.llm.model(self.model, system_instruction=self.system_prompt).start_chat(history=list(history))
+
+    async def _call_llm(self, session, user_text: str) -> str:
+        """One async chat turn; the turn is only added to history when the model answered."""
         try:
-            import google.generativeai as genai
-            if not api_key: return "Configuration Error: API Key missing."
-            
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel(self.model)
-            
-            # Convert history to Gemini format (User/Model)
-            chat_history = []
-            for h in history:
-                role = "user" if h["role"] == "user" else "model"
-                # Handle system prompt hack (Gemini doesn't support 'system' role in chat usually, 
-                # so we merged it into first user message or use system_instruction in beta)
-                parts = h["parts"]
-                chat_history.append({"role": role, "parts": parts})
-            
-            # Generate
-            # We treat the whole thing as a chat session or just send valid history
-            # To be safe, let's just use generate_content with the list
-            # But the first item is our 'System' hack. The library might complain if we feed it directly execution.
-            
-            # Quick hack: Consolidate strict history for the chat object
-            # Ideally we keep a persistent chat object, but for REST API statelessness we rebuild.
+            if not self.api_key: return "Configuration Error: API Key missing."
             
-            chat = model.start_chat(history=chat_history[:-1]) # All except last
-            response = chat.send_message(chat_history[-1]["parts"][0])
+            chat = self.sessions.chat_for(session, self._start_chat)
+            response = await self.llm.send_message(
+                chat, user_text,
+                priority=PRIORITY_INTERACTIVE, call_site="general_chat",
+                history_tokens=self.prompt_tokens + estimate_tokens(session.history)
+            )
+            session.add_turn(user_text, response.text)
             return response.text
             
         except Exception as e:
+            # The chat object may hold a half-finished turn: rebuild it from our history next time
+            session.chat = None
             return f"I'm sorry, my brain is having trouble connecting. Error: {e}"
@@ -23,41 +23,20 @@ try:
     from droidrun.agent.droid import DroidAgent
     from droidrun.agent.utils.llm_picker import load_llm
     from droidrun.config_manager import DroidrunConfig, AgentConfig, ManagerConfig, ExecutorConfig, TelemetryConfig
+    from droidrun import AdbTools
 except ImportError:
     print("CRITICAL ERROR: 'droidrun' library not found.")
     sys.exit(1)
 
+from neurorun.device_pool import get_device_pool
+from neurorun.app_registry import resolve_package
+from neurorun.device_primitives import DevicePrimitives
+
 class MobileRunWrapper:
     """
     Unified client for MobileRun Cloud with DroidRun Local Fallback.
     """
     
-    APP_MAPPING = {
-        # Transit
-        "Uber": "com.ubercab",
-        "MakeMyTrip": "com.makemytrip",
-        
-        # Stay
-        "Booking.com": "com.booking",
-        
-        # Commerce
-        "Amazon": "com.amazon.mShop.android.shopping",
-        "Flipkart": "com.flipkart.android",
-        "Zomato": "com.application.zomato",
-        "Swiggy": "in.swiggy.android", # Check exact ID, usually this or bundl
-        
-        # Social
-        "WhatsApp": "com.whatsapp",
-        
-        # Pharmacy
-        "PharmEasy": "com.pharmeasy.app",
-        "Apollo 24|7": "com.apollo.patientapp",
-        "Tata 1mg": "com.aranoah.healthkart.plus",
-        
-        # Ride
-        "Ola": "com.olacabs.customer"
-    }
-
     def __init__(self, provider="gemini", model="models/gemini-2.5-flash"):
         self.provider = provider
         self.model = model
@@ -79,7 +58,7 @@ class MobileRunWrapper:
         """
         Attempts to run via MobileRun. Falls back to DroidRun on failure.
         """
-        app_id = self.APP_MAPPING.get(app_name)
+        app_id = resolve_package(app_name)
         
         # --- 1. MobileRun Execution ---
         if self.client and app_id:
@@ -109,9 +88,9 @@ class MobileRunWrapper:
         
         # --- 2. DroidRun Logic (Fallback) ---
         print(f"[Fallback] 📱 Switching to Local DroidRun for {app_name}...")
-        return await self._run_local_droid(goal)
+        return await self._run_local_droid(goal, app_id)
 
-    async def _run_local_droid(self, goal: str) -> dict:
+    async def _run_local_droid(self, goal: str, app_id: str = None) -> dict:
         """
         Internal: Executes using DroidRun Local Agent
         """
@@ -124,19 +103,29 @@ class MobileRunWrapper:
         telemetry_config = TelemetryConfig(enabled=False)
         config = DroidrunConfig(agent=agent_config, telemetry=telemetry_config)
 
-        agent = DroidAgent(goal=goal, llms=llm, config=config)
-        
-        try:
-            print(f"      [DroidRun] 🧠 Analyzing...")
-            result = await agent.run()
-            
-            # Robust Parsing from original logic
-            raw_text = str(result.reason) if hasattr(result, 'reason') else str(result)
-            return self._parse_output(raw_text)
-                
-        except Exception as e:
-            print(f"[DroidRun] Error: {e}")
-            return {"status": "failed", "error": str(e)}
+        # Pin the agent to a leased phone so concurrent tasks don't share one device
+        async with get_device_pool().lease("mobilerun_fallback", package=app_id) as device:
+            primitives = DevicePrimitives(device.serial)
+            quick = await primitives.run_goal(goal)
+            if quick is not None:
+                return quick
+            if app_id:
+                await primitives.launch_app(app_id)
+            # Explicit serial: without it DroidRun drives whichever device adb lists first
+            tools = await AdbTools.create(serial=device.serial)
+            agent = DroidAgent(goal=goal, llms=llm, config=config, tools=tools)
+
+            try:
+                print(f"      [DroidRun] 🧠 Analyzing...")
+                result = await agent.run()
+
+                # Robust Parsing from original logic
+                raw_text = str(result.reason) if hasattr(result, 'reason') else str(result)
+                return self._parse_output(raw_text)
+
+            except Exception as e:
+                print(f"[DroidRun] Error: {e}")
+                return {"status": "failed", "error": str(e)}
 
     def _parse_output(self, raw_text: str) -> dict:
         """Shared parser for both Cloud and Local outputs"""
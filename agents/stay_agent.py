@@ -1,8 +1,8 @@
 import os
 import json
 import asyncio
-import google.generativeai as genai
 import sys
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from datetime import datetime
 
 # --- DroidRun Professional Architecture Imports ---
@@ -15,21 +15,88 @@ except ImportError:
     sys.exit(1)
 
 from schemas import HotelDetails, ItineraryDay, ItineraryActivity, FullTripPlan
+from neurorun.llm_gateway import get_gateway, PRIORITY_BACKGROUND
+from neurorun.device_pool import get_device_pool, DeviceLease
+from neurorun.app_registry import resolve_package
+from neurorun.device_primitives import DevicePrimitives
+from neurorun.ranking import HOTEL_CRITERIA, get_ranking_index, merge_weights
+
+SEARCH_TOP_N = int(os.getenv("SEARCH_TOP_N", "5"))
+ITINERARY_DAYS_PER_CALL = int(os.getenv("ITINERARY_DAYS_PER_CALL", "4"))
+
+
+class JsonObjectStream:
+    """Pulls complete top-level JSON objects out of streamed text (the surrounding [ ] and fences are ignored)."""
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> List[dict]:
+        self.buf += text
+        objects = []
+        while self.pos < len(self.buf):
+            ch = self.buf[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.depth:
+                self.in_string = True
+            elif ch == "{":
+                if not self.depth:
+                    self.buf, self.pos = self.buf[self.pos:], 0  # drop text between objects
+                self.depth += 1
+            elif ch == "}" and self.depth:
+                self.depth -= 1
+                if not self.depth:
+                    raw, self.buf, self.pos = self.buf[:self.pos + 1], self.buf[self.pos + 1:], 0
+                    try:
+                        objects.append(json.loads(raw))
+                    except json.JSONDecodeError as e:
+                        print(f"[Warn] Could not parse streamed object: {e}")
+                    continue
+            self.pos += 1
+        if not self.depth:
+            self.buf, self.pos = "", 0
+        return objects
+
 
 class StayManager:
     def __init__(self, provider="gemini", model="models/gemini-2.5-flash"):
         self.provider = provider
         self.model = model
         self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+        self.llm = get_gateway()
         if self.api_key:
-            genai.configure(api_key=self.api_key)
+            self.llm.configure(self.api_key)
 
-    async def _run_agent(self, goal: str) -> dict:
+    async def _run_agent(self, goal: str, app: Optional[str] = None) -> dict:
+        """
+        Leases a free device from the pool for one DroidAgent run (launching `app` directly first).
+        Goals that are a single trivial action (home, back, open app/URL) run as ADB primitives instead.
+        """
+        async with get_device_pool().lease("stay", package=resolve_package(app) if app else None) as device:
+            primitives = DevicePrimitives(device.serial)
+            quick = await primitives.run_goal(goal)
+            if quick is not None:
+                return quick
+            if app:
+                await primitives.launch_app(app)
+            return await self._run_agent_on(device, goal)
+
+    async def _run_agent_on(self, device: DeviceLease, goal: str) -> dict:
         """Helper to run DroidAgent for Hotel Search."""
         provider_name = "GoogleGenAI" if self.provider == "gemini" else self.provider
         llm = load_llm(provider_name=provider_name, model=self.model, api_key=self.api_key)
         
-        tools = await AdbTools.create()
+        tools = await AdbTools.create(serial=device.serial)
 
         agent = DroidAgent(
             goal=goal, 
@@ -70,9 +137,22 @@ class StayManager:
             print(f"[Error] Agent Execution Failed: {e}")
             return {"status": "failed", "error": str(e)}
 
-    async def find_hotel(self, city: str, check_in_date: str) -> HotelDetails:
-        print(f"🏨 Searching Hotel in {city} for {check_in_date}")
-        
+    async def find_hotels(self, city: str, check_in_date: str, preference: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Top SEARCH_TOP_N hotel cards of one MakeMyTrip search, captured in a single device session and
+        kept in the ranking index. With a `preference` the search also looks for a matching card.
+        """
+        index = get_ranking_index()
+        key = (city, check_in_date)
+        cached = index.get("hotel", key) or []
+        if cached and (not preference or self._matching(cached, preference)):
+            print(f"🏨 Using {len(cached)} cached hotels in {city} for {check_in_date}")
+            return cached
+
+        print(f"🏨 Searching Hotels in {city} for {check_in_date} (top {SEARCH_TOP_N})"
+              + (f" (preference: {preference})" if preference else ""))
+        extra = (f"If none of those cards matches '{preference}', keep scrolling and also include the first card that does. "
+                 if preference else "")
         goal = (
             f"1. Open 'MakeMyTrip'. "
             f"2. Handle any Ads/Popups if they appear. "
@@ -81,59 +161,111 @@ class StayManager:
             f"5. Select Check-in Date: '{check_in_date}'. "
             f"6. Click the central 'SEARCH' button. "
             f"7. Wait 10 seconds for the hotel list. "
-            f"8. **SCROLL DOWN** slightly to see hotel cards. "
-            f"9. Identify the FIRST hotel card in the list. "
-            f"10. Extract directly from card: Hotel Name, Location/Address, Price Per Night. "
-            f"11. Return strict JSON: {{'name': '...', 'address': '...', 'price_per_night': '...'}}."
+            f"8. **SCROLL DOWN** slowly through the list until you have seen {SEARCH_TOP_N} hotel cards (or the end of the list). {extra}"
+            f"9. Extract from EACH of those cards, in list order: Hotel Name, Location/Address, Price Per Night, Rating (if shown, else 'N/A'). "
+            f"10. Return strict JSON: {{'hotels': [{{'name': '...', 'address': '...', 'price_per_night': '...', 'rating': '...'}}, ...]}}."
         )
-        
-        result = await self._run_agent(goal)
-        
+
+        result = await self._run_agent(goal, app="MakeMyTrip")
+        records = result.get("hotels") if isinstance(result.get("hotels"), list) else None
+        if records is None and result.get("name"):
+            records = [result]  # agent returned just one card
+        records = [r for r in (records or []) if isinstance(r, dict) and r.get("name")][:SEARCH_TOP_N + 1]
+        # Merge with what an earlier search of the same city/date already found
+        seen = {r["name"].lower() for r in records}
+        records += [r for r in cached if r["name"].lower() not in seen]
+        index.put("hotel", key, records)
+        return records
+
+    @staticmethod
+    def _matching(records: List[Dict[str, Any]], preference: str) -> List[Dict[str, Any]]:
+        wanted = preference.lower()
+        return [r for r in records if wanted in f"{r.get('name', '')} {r.get('address', '')}".lower()]
+
+    async def hotel_options(self, city: str, check_in_date: str, weights: Optional[Dict[str, float]] = None,
+                            preference: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Captured hotels ranked by price and rating; hotels matching `preference` come first."""
+        records = await self.find_hotels(city, check_in_date, preference)
+        ranked = get_ranking_index().ranked("hotel", (city, check_in_date),
+                                            merge_weights(HOTEL_CRITERIA, weights)) or records
+        if preference:
+            matching = self._matching(ranked, preference)
+            ranked = matching + [r for r in ranked if r not in matching]
+        return ranked
+
+    async def find_hotel(self, city: str, check_in_date: str, preference: Optional[str] = None,
+                         weights: Optional[Dict[str, float]] = None) -> HotelDetails:
+        """Best captured hotel. Raises ValueError when the search found none (never an "Unknown Hotel")."""
+        options = await self.hotel_options(city, check_in_date, weights, preference)
+        if not options:
+            raise ValueError(f"No hotel found in {city} for {check_in_date}")
+        result = options[0]
+
         try:
              hotel = HotelDetails(
-                 name=result.get("name", "Unknown Hotel"),
+                 name=result["name"],
                  address=result.get("address", "Unknown Address"),
-                 price_per_night=result.get("price_per_night", "Unknown")
+                 price_per_night=result.get("price_per_night", "Unknown"),
+                 rating=result.get("rating")
              )
+             if len(options) > 1:
+                 print(f"🏨 Picked {hotel.name} ({hotel.price_per_night}) out of {len(options)} hotels")
              return hotel
         except Exception as e:
             print(f"Error parsing hotel details: {e}")
             raise e
 
-    async def generate_itinerary(self, hotel_location: str, user_interests: str, days: int = 3) -> list[ItineraryDay]:
-        print(f"🗺️ Generating Itinerary for {days} days based on interests: {user_interests}")
-        
-        prompt = (
-            f"Create a {days}-day travel itinerary for a trip staying at {hotel_location}. "
-            f"User Interests: {user_interests}. "
-            f"Strict Rules: \n"
-            f"1. Lunch MUST be at 1:00 PM every day. \n"
-            f"2. Activities MUST end by 10:00 PM (Sleep time). \n"
-            f"3. Include travel time between places. \n"
-            f"Return ONLY raw JSON list of objects matching this schema: \n"
-            f"[{{'day_number': 1, 'activities': [{{'time': '...','description': '...'}}]}}]"
-        )
-        
-        model = genai.GenerativeModel(self.model)
-        response = model.generate_content(prompt)
-        
+    @staticmethod
+    def _to_day(obj: dict) -> Optional[ItineraryDay]:
         try:
-            # Clean up response
-            text = response.text
-            import re
-            json_match = re.search(r"\[.*\]", text, re.DOTALL)
-            if json_match:
-                clean_json = json_match.group(0)
-                data = json.loads(clean_json)
-                
-                itinerary = []
-                for day in data:
-                    activities = [ItineraryActivity(**a) for a in day['activities']]
-                    itinerary.append(ItineraryDay(day_number=day['day_number'], activities=activities))
-                return itinerary
-            else:
-                 print("Error: Could not find JSON in LLM response")
-                 return []
+            activities = [ItineraryActivity(**a) for a in obj['activities']]
+            return ItineraryDay(day_number=obj['day_number'], activities=activities)
         except Exception as e:
-            print(f"Error generating itinerary: {e}")
-            return []
+            print(f"[Warn] Skipping malformed itinerary day: {e}")
+            return None
+
+    async def generate_itinerary(self, hotel_location: str, user_interests: str, days: int = 3,
+                                 on_day: Optional[Callable[[ItineraryDay], Awaitable[None]]] = None) -> list[ItineraryDay]:
+        """
+        Streams the itinerary: each day is parsed and handed to `on_day` as soon as its JSON object
+        is complete. Long trips are planned ITINERARY_DAYS_PER_CALL days per call, so neither prompt
+        nor response grows with the trip length.
+        """
+        print(f"🗺️ Generating Itinerary for {days} days based on interests: {user_interests}")
+        
+        itinerary = []
+        per_call = max(1, ITINERARY_DAYS_PER_CALL)
+        for first in range(1, days + 1, per_call):
+            last = min(days, first + per_call - 1)
+            # Keep later windows from repeating places (bounded: only the most recent activities)
+            planned = [a.description for d in itinerary for a in d.activities][-20:]
+            prompt = (
+                f"Create days {first} to {last} of a {days}-day travel itinerary for a trip staying at {hotel_location}. "
+                f"User Interests: {user_interests}. "
+                + (f"Already planned on earlier days (do NOT repeat): {'; '.join(planned)}. " if planned else "")
+                + f"Strict Rules: \n"
+                f"1. Lunch MUST be at 1:00 PM every day. \n"
+                f"2. Activities MUST end by 10:00 PM (Sleep time). \n"
+                f"3. Include travel time between places. \n"
+                f"Return ONLY raw JSON list of objects (day_number {first} to {last}) matching this schema: \n"
+                f'[{{"day_number": {first}, "activities": [{{"time": "...", "description": "..."}}]}}]'
+            )
+            
+            parser = JsonObjectStream()
+            try:
+                async for chunk in self.llm.generate_stream(self.model, prompt, priority=PRIORITY_BACKGROUND,
+                                                            call_site="itinerary"):
+                    for obj in parser.feed(chunk):
+                        day = self._to_day(obj)
+                        if day:
+                            itinerary.append(day)
+                            print(f"   🗓️ Day {day.day_number} ready ({len(day.activities)} activities)")
+                            if on_day:
+                                await on_day(day)
+            except Exception as e:
+                # Keep the days that already arrived
+                print(f"Error generating itinerary (days {first}-{last}): {e}")
+                break
+        if not itinerary:
+            print("Error: Could not find JSON in LLM response")
+        return itinerary
@@ -3,6 +3,7 @@ import json
 import asyncio
 from datetime import datetime, timedelta
 import sys
+from typing import Any, Dict, List, Optional
 
 # --- DroidRun Professional Architecture Imports ---
 try:
@@ -14,6 +15,12 @@ except ImportError:
     sys.exit(1)
 
 from schemas import FlightDetails, CabDetails
+from neurorun.device_pool import get_device_pool, DeviceLease
+from neurorun.app_registry import resolve_package
+from neurorun.device_primitives import DevicePrimitives
+from neurorun.ranking import FLIGHT_CRITERIA, get_ranking_index, merge_weights
+
+SEARCH_TOP_N = int(os.getenv("SEARCH_TOP_N", "5"))
 
 class TransitManager:
     def __init__(self, provider="gemini", model="models/gemini-2.5-flash"):
@@ -21,13 +28,27 @@ class TransitManager:
         self.model = model
         self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
 
-    async def _run_agent(self, goal: str) -> dict:
+    async def _run_agent(self, goal: str, app: Optional[str] = None) -> dict:
+        """
+        Leases a free device from the pool for one DroidAgent run (launching `app` directly first).
+        Goals that are a single trivial action (home, back, open app/URL) run as ADB primitives instead.
+        """
+        async with get_device_pool().lease("transit", package=resolve_package(app) if app else None) as device:
+            primitives = DevicePrimitives(device.serial)
+            quick = await primitives.run_goal(goal)
+            if quick is not None:
+                return quick
+            if app:
+                await primitives.launch_app(app)
+            return await self._run_agent_on(device, goal)
+
+    async def _run_agent_on(self, device: DeviceLease, goal: str) -> dict:
         """Helper to run DroidAgent."""
         # Config setup
         provider_name = "GoogleGenAI" if self.provider == "gemini" else self.provider
         llm = load_llm(provider_name=provider_name, model=self.model, api_key=self.api_key)
         
-        tools = await AdbTools.create()
+        tools = await AdbTools.create(serial=device.serial)
 
         agent = DroidAgent(
             goal=goal, 
@@ -69,9 +90,18 @@ class TransitManager:
             print(f"[Error] Agent Execution Failed: {e}")
             return {"status": "failed", "error": str(e)}
 
-    async def find_best_flight(self, source: str, dest: str, date: str) -> FlightDetails:
-        print(f"✈️ Searching Flight: {source} to {dest} on {date}")
-        
+    async def find_flights(self, source: str, dest: str, date: str) -> List[Dict[str, Any]]:
+        """
+        Top SEARCH_TOP_N flight cards of one MakeMyTrip search, captured in a single device session.
+        Results are kept in the ranking index, so asking again (or for another pick) needs no device.
+        """
+        index = get_ranking_index()
+        cached = index.get("flight", (source, dest, date))
+        if cached is not None:
+            print(f"✈️ Using {len(cached)} cached flights: {source} to {dest} on {date}")
+            return cached
+
+        print(f"✈️ Searching Flights: {source} to {dest} on {date} (top {SEARCH_TOP_N})")
         goal = (
             f"1. Open 'MakeMyTrip'. "
             f"2. Handle any Ads/Popups if they appear (Click 'X' or 'Skip'). "
@@ -81,28 +111,47 @@ class TransitManager:
             f"6. Select Date: '{date}'. "
             f"7. Click 'Search Flights'. "
             f"8. Wait 10 seconds for results to fully load. "
-            f"9. **SCROLL DOWN** slowly to ensure flight cards are rendered. "
-            f"10. Identify the FIRST flight card in the list. "
-            f"11. Extract directly from the card: Airline Name, Flight Number (if visible, else 'N/A'), Price, and ARRIVAL Time. "
-            f"12. Return strict JSON: {{'airline': '...', 'flight_number': '...', 'price': '...', 'arrival_time': 'YYYY-MM-DD HH:MM:SS'}}."
+            f"9. **SCROLL DOWN** slowly through the list until you have seen {SEARCH_TOP_N} flight cards (or the end of the list). "
+            f"10. Extract from EACH of those cards, in list order: Airline Name, Flight Number (if visible, else 'N/A'), Price, and ARRIVAL Time. "
+            f"11. Return strict JSON: {{'flights': [{{'airline': '...', 'flight_number': '...', 'price': '...', 'arrival_time': 'YYYY-MM-DD HH:MM:SS'}}, ...]}}."
         )
-        
-        result = await self._run_agent(goal)
-        
-        # Fallback/Validation logic could go here
-        try:
-             # Basic validation of return format
-             flight = FlightDetails(
-                 airline=result.get("airline", "Unknown"),
-                 flight_number=result.get("flight_number", "Unknown"),
-                 price=result.get("price", "Unknown"),
-                 arrival_time=datetime.strptime(result.get("arrival_time", datetime.now().strftime("%Y-%m-%d %H:%M:%S")), "%Y-%m-%d %H:%M:%S")
-             )
-             return flight
-        except Exception as e:
-            print(f"Error parsing flight details: {e}")
-            # Return dummy/error object or raise
-            raise e
+
+        result = await self._run_agent(goal, app="MakeMyTrip")
+        records = result.get("flights") if isinstance(result.get("flights"), list) else None
+        if records is None and result.get("airline"):
+            records = [result]  # agent returned just one card
+        records = [r for r in (records or []) if isinstance(r, dict) and r.get("airline")][:SEARCH_TOP_N]
+        index.put("flight", (source, dest, date), records)
+        return records
+
+    async def flight_options(self, source: str, dest: str, date: str,
+                             weights: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+        """Captured flights ranked by price and arrival time (`weights` overrides, e.g. {"arrival_time": 1})."""
+        records = await self.find_flights(source, dest, date)
+        return get_ranking_index().ranked("flight", (source, dest, date), merge_weights(FLIGHT_CRITERIA, weights)) or records
+
+    async def find_best_flight(self, source: str, dest: str, date: str,
+                               weights: Optional[Dict[str, float]] = None) -> FlightDetails:
+        """
+        Best captured flight. Raises ValueError when the search found no flight with a readable
+        arrival time: the cab is booked against it, so a made-up time must never stand in for it.
+        """
+        options = await self.flight_options(source, dest, date, weights)
+        for result in options:
+            try:
+                flight = FlightDetails(
+                    airline=result["airline"],
+                    flight_number=result.get("flight_number", "Unknown"),
+                    price=result.get("price", "Unknown"),
+                    arrival_time=datetime.strptime(str(result.get("arrival_time")), "%Y-%m-%d %H:%M:%S")
+                )
+            except Exception as e:
+                print(f"Error parsing flight details: {e}")
+                continue
+            if len(options) > 1:
+                print(f"✈️ Picked {flight.airline} ({flight.price}) out of {len(options)} flights")
+            return flight
+        raise ValueError(f"No usable flight found from {source} to {dest} on {date}")
 
     async def book_cab(self, location: str, flight_arrival_time: datetime) -> CabDetails:
         pickup_time = flight_arrival_time + timedelta(minutes=45)
@@ -121,8 +170,10 @@ class TransitManager:
             f"8. Return strict JSON: {{'provider': 'MakeMyTrip Cabs', 'pickup_time': '{pickup_time.strftime('%Y-%m-%d %H:%M:%S')}', 'estimated_price': '...'}}."
         )
 
-        result = await self._run_agent(goal)
-        
+        result = await self._run_agent(goal, app="MakeMyTrip")
+        if result.get("status") == "failed":
+            raise ValueError(f"Cab booking failed: {result.get('error') or 'no readable result'}")
+
         try:
              cab = CabDetails(
                  provider=result.get("provider", "Uber"),
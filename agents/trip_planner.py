@@ -0,0 +1,131 @@
+from typing import Any, Dict, List, Optional
+
+from agents.transit_agent import TransitManager
+from agents.stay_agent import StayManager
+from trip_visualizer import TripVisualizer
+from schemas import FullTripPlan
+from neurorun.workflow import Workflow, EventCallback, StageMemo
+from neurorun.ranking import FLIGHT_CRITERIA, HOTEL_CRITERIA, get_ranking_index, merge_weights
+
+ITINERARY_DAYS = 3  # days the itinerary stage plans
+
+STAGE_LABELS = {"flight": "Outbound flight", "return_flight": "Return flight", "cab": "Arrival cab",
+                "hotel": "Hotel", "itinerary": "Itinerary"}
+
+# Shared across requests: a re-plan that only changes the interests reuses flight, cab and hotel.
+_stage_memo = StageMemo()
+
+
+class TripPlanner:
+    """
+    Voyager-1 trip pipeline as a dependency graph instead of a fixed sequence:
+
+        flight ──> cab
+        return_flight            (optional, only with an end date)
+        hotel ──> itinerary      (LLM only, runs while the phone stages are still going)
+
+    Phone stages each lease their own device, so with several phones the flights and the
+    hotel search run side by side. Every stage is memoized by its inputs, so re-planning only
+    recomputes what a change actually affects (new interests -> itinerary only). Flight and hotel
+    searches capture the top few cards, so new ranking weights or a hotel preference that was
+    among them are picked locally without another device session.
+    """
+
+    def __init__(self, transit: Optional[TransitManager] = None, stay: Optional[StayManager] = None,
+                 memo: Optional[StageMemo] = None):
+        self.transit = transit or TransitManager()
+        self.stay = stay or StayManager()
+        self.memo = memo or _stage_memo
+
+    def build(self, source: str, destination: str, date: str, user_interests: str,
+              end_date: Optional[str] = None, on_event: Optional[EventCallback] = None,
+              hotel_preference: Optional[str] = None, weights: Optional[Dict[str, float]] = None) -> Workflow:
+        async def on_day(day):
+            # Itinerary days stream out while the rest of the day list is still being generated
+            if on_event:
+                await on_event({"type": "itinerary_day", "node": "itinerary", "day": day.dict()})
+
+        ranking = tuple(sorted((weights or {}).items()))
+        wf = Workflow("trip")
+        wf.add("flight", lambda r: self.transit.find_best_flight(source, destination, date, weights),
+               key=lambda r: (source, destination, date, ranking))
+        if end_date:
+            wf.add("return_flight", lambda r: self.transit.find_best_flight(destination, source, end_date, weights),
+                   optional=True, key=lambda r: (destination, source, end_date, ranking))
+        wf.add("cab", lambda r: self.transit.book_cab(destination, r["flight"].arrival_time), deps=["flight"],
+               key=lambda r: (destination, r["flight"].arrival_time.isoformat()))
+        wf.add("hotel", lambda r: self.stay.find_hotel(destination, date, preference=hotel_preference, weights=weights),
+               key=lambda r: (destination, date, hotel_preference, ranking))
+        # A stage that fails raises and is never memoized; an itinerary cut short by an LLM error is
+        # still shown but recomputed next time.
+        wf.add("itinerary", lambda r: self.stay.generate_itinerary(r["hotel"].name, user_interests, ITINERARY_DAYS,
+                                                                  on_day=on_day),
+               deps=["hotel"], kind="llm", key=lambda r: (r["hotel"].name, user_interests),
+               complete=lambda days: len(days) == ITINERARY_DAYS)
+        return wf
+
+    @staticmethod
+    def describe(event: Dict[str, Any]) -> Optional[str]:
+        """One log line for a workflow event (None for events not worth a line)."""
+        label = STAGE_LABELS.get(event.get("node"), event.get("node"))
+        if event["type"] == "node_start":
+            return f"▶️ {label}: started"
+        if event["type"] == "node_failed":
+            return f"⚠️ {label} failed: {event['error']}"
+        if event["type"] == "node_skipped":
+            return f"⏭️ {label} skipped ({event['reason']})"
+        if event["type"] == "itinerary_day":
+            day = event["day"]
+            plan = "; ".join(f"{a['time']} {a['description']}" for a in day["activities"][:3])
+            return f"🗓️ Day {day['day_number']}: {plan}"
+        if event["type"] != "node_done":
+            return None
+        r = event["result"]
+        took = "[reused]" if event.get("memoized") else f"[{event['duration_ms'] / 1000:.1f}s]"
+        if event["node"] in ("flight", "return_flight"):
+            return f"✅ {label}: {r.airline} ({r.price}) {took}"
+        if event["node"] == "cab":
+            return f"✅ {label}: {r.provider} at {r.pickup_time} {took}"
+        if event["node"] == "hotel":
+            return f"✅ {label}: {r.name} ({r.price_per_night}) {took}"
+        if event["node"] == "itinerary":
+            return f"✅ {label}: {len(r)} days {took}"
+        return f"✅ {label} {took}"
+
+    @staticmethod
+    def compile(results: Dict[str, Any]) -> FullTripPlan:
+        plan = FullTripPlan(
+            flight=results["flight"],
+            arrival_cab=results["cab"],
+            hotel=results["hotel"],
+            daily_schedule=results["itinerary"],
+        )
+        plan.flowchart_code = TripVisualizer.generate_mermaid(plan)
+        return plan
+
+    @staticmethod
+    def options(source: str, destination: str, date: str,
+                weights: Optional[Dict[str, float]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """Every captured flight/hotel for this trip, ranked (the alternatives a user can switch to)."""
+        index = get_ranking_index()
+        return {"flights": index.ranked("flight", (source, destination, date), merge_weights(FLIGHT_CRITERIA, weights)) or [],
+                "hotels": index.ranked("hotel", (destination, date), merge_weights(HOTEL_CRITERIA, weights)) or []}
+
+    async def plan(self, source: str, destination: str, date: str, user_interests: str,
+                   end_date: Optional[str] = None, on_event: Optional[EventCallback] = None,
+                   hotel_preference: Optional[str] = None, weights: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Returns {"plan": FullTripPlan, "return_flight": FlightDetails|None, "options": ranked alternatives,
+        "report": timing report}. Stages whose inputs match an earlier run (within WORKFLOW_MEMO_TTL)
+        are reused, not recomputed. `weights` re-weights the ranking, e.g. {"price": 1, "arrival_time": 2}.
+        """
+        wf = self.build(source, destination, date, user_interests, end_date, on_event, hotel_preference, weights)
+        run = await wf.run(on_event, memo=self.memo)
+        report = run["report"]
+        recomputed = [n for n, t in report["stages"].items() if t["status"] == "done"]
+        report["recomputed"] = recomputed
+        print(f"🧭 Trip planned in {report['wall_ms'] / 1000:.1f}s "
+              f"(stages total {report['serial_ms'] / 1000:.1f}s, x{report['parallel_speedup']} overlap; "
+              f"recomputed: {', '.join(recomputed) or 'nothing'})")
+        return {"plan": self.compile(run["results"]), "return_flight": run["results"].get("return_flight"),
+                "options": self.options(source, destination, date, weights), "report": report}
@@ -0,0 +1,62 @@
+"""
+Taps per second: one `adb shell input tap` process per tap (the old os.system path)
+versus the persistent AdbTransport session (sequential and pipelined).
+
+    python benchmarks/bench_adb_taps.py --serial <device> --taps 50 --x 5 --y 5
+
+Taps land on (x, y); keep it somewhere harmless such as the status bar.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from neurorun.adb_transport import AdbTransport
+
+
+def bench_os_system(serial, taps, x, y):
+    prefix = f"adb -s {serial} " if serial else "adb "
+    t0 = time.perf_counter()
+    for _ in range(taps):
+        os.system(f"{prefix}shell input tap {x} {y}")
+    return time.perf_counter() - t0
+
+
+async def bench_transport(serial, taps, x, y, pipelined):
+    adb = AdbTransport.for_device(serial)
+    await adb.start()
+    await adb.run("true")  # warm-up: session already open, as in a running mission
+    t0 = time.perf_counter()
+    if pipelined:
+        await adb.run_many([f"input tap {x} {y}"] * taps, timeout=taps * 5)
+    else:
+        for _ in range(taps):
+            await adb.tap(x, y)
+    elapsed = time.perf_counter() - t0
+    return elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="ADB tap throughput benchmark")
+    parser.add_argument("--serial", help="Device serial (default: adb default device)")
+    parser.add_argument("--taps", type=int, default=30)
+    parser.add_argument("--x", type=int, default=5)
+    parser.add_argument("--y", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    results["os.system (process per tap)"] = bench_os_system(args.serial, args.taps, args.x, args.y)
+    results["AdbTransport (sequential)"] = await bench_transport(args.serial, args.taps, args.x, args.y, False)
+    results["AdbTransport (pipelined)"] = await bench_transport(args.serial, args.taps, args.x, args.y, True)
+    await AdbTransport.for_device(args.serial).close()
+
+    print(f"\n--- {args.taps} taps ---")
+    base = results["os.system (process per tap)"]
+    for name, elapsed in results.items():
+        print(f"{name:32s} {args.taps / elapsed:7.1f} taps/s  ({elapsed * 1000 / args.taps:6.1f} ms/tap, x{base / elapsed:.1f})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
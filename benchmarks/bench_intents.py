@@ -0,0 +1,90 @@
+"""
+Accuracy and latency of the local intent fast path on a labelled utterance set.
+
+    python benchmarks/bench_intents.py
+    python benchmarks/bench_intents.py --data my_utterances.jsonl --verbose
+
+Each line of the data file is {"text", "intent", "slots", "app", "split"}; "intent": null means the
+utterance should go to the LLM (chit-chat, questions, missing details, compound requests, lists,
+quantities, scheduled rides). Reports, per split, how many utterances skip the LLM, how many of those
+are exactly right, and how many should have been deferred but were not (the costly mistake).
+The "tuning" split is what the patterns were written against; "holdout" utterances were added
+without adjusting the parser to them, so its numbers are the ones to trust.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from neurorun.intent_parser import DEFAULT_MIN_CONFIDENCE, fast_path, parse_intent
+
+DEFAULT_DATA = os.path.join(os.path.dirname(__file__), "intent_utterances.jsonl")
+
+
+def matches(parsed, case):
+    if parsed["intent"] != case["intent"]:
+        return False
+    if case.get("app") and parsed["app"] != case["app"]:
+        return False
+    return all(str(parsed["slots"].get(k, "")).lower() == str(v).lower() for k, v in case.get("slots", {}).items())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local intent parser benchmark")
+    parser.add_argument("--data", default=DEFAULT_DATA)
+    parser.add_argument("--min-confidence", type=float, default=DEFAULT_MIN_CONFIDENCE)
+    parser.add_argument("--repeat", type=int, default=200, help="Parses per utterance for latency")
+    parser.add_argument("--verbose", action="store_true", help="Print every mistake")
+    args = parser.parse_args()
+
+    with open(args.data, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    latencies = []
+    splits = {}
+    for case in cases:
+        counts = splits.setdefault(case.get("split", "tuning"), {"cases": 0, "actionable": 0, "handled": 0,
+                                                                   "correct": 0, "false_fast": 0, "missed": 0})
+        counts["cases"] += 1
+        counts["actionable"] += case["intent"] is not None
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            action = fast_path(case["text"], args.min_confidence)
+        latencies.append((time.perf_counter() - t0) * 1e6 / args.repeat)
+
+        parsed = parse_intent(case["text"])
+        if action:
+            counts["handled"] += 1
+            if case["intent"] is None:
+                counts["false_fast"] += 1
+                if args.verbose:
+                    print(f"  should defer: {case['text']!r} -> {parsed['intent']} {parsed['slots']}")
+            elif matches(parsed, case):
+                counts["correct"] += 1
+            elif args.verbose:
+                print(f"  wrong: {case['text']!r} -> {parsed['intent']} {parsed['app']} {parsed['slots']}")
+        elif case["intent"] is not None:
+            counts["missed"] += 1
+            if args.verbose:
+                why = parsed["reason"] or (f"missing {', '.join(parsed['missing'])}" if parsed["missing"]
+                                           else f"confidence {parsed['confidence']}")
+                print(f"  deferred: {case['text']!r} ({why})")
+
+    for split, c in splits.items():
+        handled, actionable = c["handled"], c["actionable"]
+        print(f"\n--- {split}: {c['cases']} utterances ({actionable} complete commands) ---")
+        print(f"fast path taken     {handled:4d}  ({handled / c['cases']:.0%} of all utterances skip the LLM)")
+        print(f"  exactly right     {c['correct']:4d}  ({c['correct'] / handled if handled else 0:.0%} precision)")
+        print(f"  should defer      {c['false_fast']:4d}")
+        print(f"complete, deferred  {c['missed']:4d}  "
+              f"({(actionable - c['missed']) / actionable if actionable else 0:.0%} recall)")
+
+    latencies.sort()
+    print(f"latency             p50 {latencies[len(latencies) // 2]:.0f}µs  "
+          f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.0f}µs  max {latencies[-1]:.0f}µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Model calls per completed mission: one action per screenshot ("single") versus
+multi-action plans verified locally between actions ("sequence").
+
+    python benchmarks/bench_plan_calls.py --runs 3
+    python benchmarks/bench_plan_calls.py --mission "Open Settings and search for battery"
+
+Needs a connected device and GEMINI_API_KEY. Every run starts from the home screen
+with the response cache cleared, so both modes pay for every planner call.
+"""
+import os
+import sys
+import asyncio
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from dotenv import load_dotenv
+from neurorun.orchestrator import NeuroOrchestrator
+from neurorun.adb_transport import AdbTransport
+
+DEFAULT_MISSIONS = [
+    "Open Settings and search for 'battery'",
+    "Open Chrome and search for 'weather in Pune'",
+    "Open YouTube and search for 'lofi music'",
+]
+
+
+async def run_mode(api_key, mode, missions, runs):
+    completed, calls, actions, replans = 0, 0, 0, 0
+    for mission in missions:
+        for _ in range(runs):
+            orchestrator = NeuroOrchestrator(api_key)
+            orchestrator.plan_mode = mode
+            orchestrator.llm.cache.clear()
+            await AdbTransport.for_device().keyevent(3)
+            await asyncio.sleep(1)
+            result = await orchestrator.run_mission(mission)
+            stats = result.get("stats", {})
+            if result.get("status") == "success":
+                completed += 1
+                calls += stats.get("llm_calls", 0)
+                actions += stats.get("actions", 0)
+                replans += stats.get("replans", 0)
+    total = len(missions) * runs
+    return {
+        "completed": f"{completed}/{total}",
+        "avg_calls": calls / completed if completed else 0.0,
+        "avg_actions": actions / completed if completed else 0.0,
+        "avg_replans": replans / completed if completed else 0.0,
+    }
+
+
+async def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Planner calls per mission benchmark")
+    parser.add_argument("--mission", action="append", help="Mission goal (repeatable, default: built-in set)")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per mission and mode")
+    parser.add_argument("--modes", default="single,sequence")
+    args = parser.parse_args()
+
+    api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+    missions = args.mission or DEFAULT_MISSIONS
+    results = {}
+    for mode in args.modes.split(","):
+        results[mode] = await run_mode(api_key, mode.strip(), missions, args.runs)
+
+    print(f"\n--- {len(missions)} missions x {args.runs} runs ---")
+    for mode, r in results.items():
+        per_call = r["avg_actions"] / r["avg_calls"] if r["avg_calls"] else 0.0
+        print(f"{mode:10s} completed {r['completed']:>6s}  {r['avg_calls']:5.2f} model calls/mission  "
+              f"{per_call:4.2f} actions/call  {r['avg_replans']:4.2f} re-plans/mission")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+"""
+Ranking latency for growing offer lists: the shared column-wise engine (rank_offers)
+versus the per-offer loop it replaced (min over one numeric price).
+
+    python benchmarks/bench_ranking.py --sizes 10,100,500,2000 --repeat 50
+
+Offers are synthetic: raw price strings, ETAs and ratings across several apps,
+with ~10% of ratings/ETAs missing and some prices unreadable.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from neurorun.ranking import FOOD_CRITERIA, RIDE_CRITERIA, rank_offers, to_number
+
+APPS = ["Zomato", "Swiggy", "Uber", "Ola", "Rapido"]
+
+
+def make_offers(n, rng):
+    offers = []
+    for i in range(n):
+        price = f"₹{rng.randint(80, 4000):,}" if rng.random() > 0.05 else "N/A"
+        offers.append({
+            "app": rng.choice(APPS),
+            "title": f"Offer {i}",
+            "price": price,
+            "numeric_price": to_number(price),
+            "rating": f"{rng.uniform(3.0, 5.0):.1f}" if rng.random() > 0.1 else None,
+            "eta": f"{rng.randint(2, 25)} mins" if rng.random() > 0.1 else "N/A",
+        })
+    return offers
+
+
+def bench(fn, offers, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(offers)
+    return (time.perf_counter() - t0) * 1000 / repeat, result
+
+
+def cheapest_only(offers):
+    priced = [o for o in offers if o["numeric_price"] is not None]
+    return min(priced, key=lambda o: o["numeric_price"]) if priced else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offer ranking latency benchmark")
+    parser.add_argument("--sizes", default="10,100,500,2000")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'offers':>7s}  {'min(price)':>11s}  {'food rank':>10s}  {'ride rank':>10s}  top (food)")
+    for size in (int(s) for s in args.sizes.split(",")):
+        offers = make_offers(size, rng)
+        base_ms, _ = bench(cheapest_only, offers, args.repeat)
+        food_ms, food = bench(lambda o: rank_offers(o, FOOD_CRITERIA, required=("numeric_price",)), offers, args.repeat)
+        ride_ms, _ = bench(lambda o: rank_offers(o, RIDE_CRITERIA, required=("numeric_price",)), offers, args.repeat)
+        top = f"{food[0]['app']} {food[0]['price']} ★{food[0]['rating']}" if food else "-"
+        print(f"{size:7d}  {base_ms:9.3f}ms  {food_ms:8.3f}ms  {ride_ms:8.3f}ms  {top}")
+
+
+if __name__ == "__main__":
+    main()
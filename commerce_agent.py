@@ -4,13 +4,18 @@ import argparse
 import asyncio
 import re
 import sys
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 import asyncio.subprocess
 # try:
 from droidrun.agent.droid.droid_agent import DroidAgent
 from droidrun import AdbTools
+from neurorun.ui_extractor import UIExtractor
+from neurorun.device_pool import get_device_pool, DeviceLease
+from neurorun.app_registry import resolve_package
+from neurorun.device_primitives import DevicePrimitives
+from neurorun.ranking import FOOD_CRITERIA, rank_offers
 # except ImportError:
 #     print("CRITICAL ERROR: 'droidrun' library not found or incompatible version.")
 #     print("Please ensure you have installed it: pip install droidrun")
@@ -56,18 +61,29 @@ class CommerceAgent:
             print(f"[Error] Price Parse Failed for '{price_str}': {e}")
             return float('inf')
 
-    async def execute_task(self, app_name: str, query: Optional[str] = None, item_type: str = "product", action: str = "search", target_item: Optional[str] = None, url: Optional[str] = None) -> dict:
+    async def execute_task(self, app_name: str, query: Optional[str] = None, item_type: str = "product", action: str = "search", target_item: Optional[str] = None, url: Optional[str] = None, cart_items: Optional[List[dict]] = None) -> dict:
+        """Leases a free device from the pool and runs the task on it."""
+        async with get_device_pool().lease(f"commerce:{app_name}", package=resolve_package(app_name)) as device:
+            return await self._execute_on_device(device, app_name, query, item_type, action, target_item, url, cart_items)
+
+    async def _execute_on_device(self, device: DeviceLease, app_name: str, query: Optional[str] = None, item_type: str = "product", action: str = "search", target_item: Optional[str] = None, url: Optional[str] = None, cart_items: Optional[List[dict]] = None) -> dict:
         """
         Spawns a DroidAgent to execute a specific commerce task.
         Uses Vision capabilities for better UI understanding.
-        Action: 'search' (compare prices) or 'order' (buy item via COD).
+        Action: 'search' (compare prices), 'order' (buy item via COD) or
+        'cart' (add every cart_items entry from restaurant `query` to one cart, then check out once via COD).
         """
         print(f"\n[CommerceAgent] Initializing Task for: {app_name} (Action: {action})")
+
+        # Launch the app directly (am start -n) so the agent doesn't have to find its icon
+        primitives = DevicePrimitives(device.serial)
+        launched = not url and (await primitives.launch_app(app_name))["status"] == "success"
+        open_step = f"The app '{app_name}' is already open. " if launched else f"Open the app '{app_name}'. "
         
         # 1. Define Goal (Natural Language with Structural Constraints)
         if url:
             goal = (
-                f"Open the app '{app_name}'. "
+                f"{open_step}"
                 f"Navigate directly to the URL: '{url}'. "
                 f"Wait for the page to load. "
                 f"Visually SCAN the product details page. "
@@ -82,7 +98,7 @@ class CommerceAgent:
         elif action == "order":
             item_instruction = f"find the item '{target_item}'" if target_item else "Select the first relevant item"
             goal = (
-                f"Open the app '{app_name}'. "
+                f"{open_step}"
                 f"Search for '{query}'. "
                 f"Wait for results. "
                 f"Visually SCAN and {item_instruction}. "
@@ -93,9 +109,24 @@ class CommerceAgent:
                 f"CRITICAL: Click 'Place Order', 'Confirm Order', or 'Swipe to Pay' to finalize the booking. "
                 f"Return a strict JSON object with keys: 'status' (success/failed), 'order_id', 'final_price'. "
             )
+        elif action == "cart":
+            lines = " ".join(
+                f"{n}. '{c['title']}' x{c.get('quantity', 1)}." for n, c in enumerate(cart_items or [], 1))
+            goal = (
+                f"{open_step}"
+                f"Search for the restaurant '{query}' and open its menu. "
+                f"Add ALL of these items to the cart, tapping '+' until each quantity is reached: {lines} "
+                f"Do NOT check out until every item is in the cart. "
+                f"Go to View Cart and verify the items and quantities. "
+                f"Click 'Proceed to Pay' or 'Checkout'. "
+                f"Select 'Cash on Delivery' (COD) or 'Pay on Delivery'. "
+                f"CRITICAL: Click 'Place Order', 'Confirm Order', or 'Swipe to Pay' ONCE to finalize the whole cart. "
+                f"Return a strict JSON object with keys: 'status' (success/failed), 'order_id', 'final_price', "
+                f"'items_added' (list of titles actually in the cart). "
+            )
         else:
             goal = (
-                f"Open the app '{app_name}'. "
+                f"{open_step}"
                 f"Search for '{query}'. "
                 f"Wait for the search results to load. "
                 f"Visually SCAN the search results. "
@@ -122,29 +153,19 @@ class CommerceAgent:
         )
 
         # Create tools instance
-        tools = await AdbTools.create()
+        tools = await AdbTools.create(serial=device.serial)
+        extractor = UIExtractor(device.serial)
         
-        # Mapping app names to package names
-        package_names = {
-            "Amazon": "com.amazon.mShop.android.shopping",
-            "Flipkart": "com.flipkart.android",
-            # Add other app mappings as needed
-        }
-
         # If a URL is provided, instruct DroidRun to open it directly
         if url:
             try:
-                target_package = package_names.get(app_name)
-                if not target_package:
+                if not resolve_package(app_name):
                     raise ValueError(f"Unknown app_name for direct URL: {app_name}")
 
-                # ADB command to start an activity to view the URL in the specified app
-                adb_command = (
-                    f"am start -a android.intent.action.VIEW "
-                    f"-d \"{url}\" "
-                    f"{target_package}"
-                )
-                await tools.shell(adb_command)
+                # VIEW intent pinned to the app's package
+                opened = await primitives.open_url(url, app_name)
+                if opened["status"] != "success":
+                    raise RuntimeError(opened["detail"])
                 print(f"[CommerceAgent] Opened URL {url} in {app_name} via ADB shell.")
 
                 # After opening URL, the DroidAgent's goal becomes to extract info from the page
@@ -163,6 +184,56 @@ class CommerceAgent:
                 print(f"[Error] Failed to open URL {url} directly: {e}")
                 return {"platform": app_name, "status": "failed", "data": {"error": str(e)}}
 
+            # The page is already open: read it from the view hierarchy before paying for vision.
+            await asyncio.sleep(3)
+            data = await self._extract_from_hierarchy(app_name, extractor, query)
+            if data:
+                data["numeric_price"] = self._parse_price(data.get("price"))
+                return {"platform": app_name, "status": "success", "data": data}
+
+        elif action == "search":
+            # Let the agent only navigate; the result cards are read from the view hierarchy.
+            nav_goal = (
+                f"{open_step}"
+                f"Search for '{query}'. "
+                f"Wait for the search results to load. "
+                f"Do NOT open any result. "
+                f"Return a strict JSON object: {{'status': 'ready'}}. "
+            )
+            nav = await self._run_goal(nav_goal, llm, tools)
+            if nav and str(nav.get("status", "")).lower() == "ready":
+                data = await self._extract_from_hierarchy(app_name, extractor, query)
+                if data:
+                    data["numeric_price"] = self._parse_price(data.get("price"))
+                    return {"platform": app_name, "status": "success", "data": data}
+
+                # Results are on screen already: only the reading step needs vision.
+                goal = (
+                    f"The search results for '{query}' are already on screen. Do NOT search again. "
+                    f"Visually SCAN the search results. "
+                    f"COMPARE their prices and Select the CHEAPEST option. "
+                    f"Extract the following details for the CHEAPEST item: "
+                    f"1. Product Name (title) "
+                    f"2. Price (numeric value) "
+                    f"3. Rating "
+                    f"4. Restaurant Name "
+                    f"Return a strict JSON object with keys: 'title', 'price', 'rating', 'restaurant'. "
+                )
+
+        # 3. Execute
+        start_data = {"platform": app_name, "status": "failed", "data": {}}
+        data = await self._run_goal(goal, llm, tools)
+        if data is not None:
+            start_data["data"] = data
+            start_data["status"] = "success"
+            start_data["data"]["numeric_price"] = self._parse_price(data.get("price"))
+            # Ensure restaurant key exists
+            if "restaurant" not in start_data["data"]:
+                start_data["data"]["restaurant"] = "Unknown"
+        return start_data
+
+    async def _run_goal(self, goal: str, llm, tools) -> Optional[dict]:
+        """Runs one DroidAgent goal and returns its parsed JSON output (None on failure)."""
         # Instantiate DroidAgent directly with required args for v0.3.2
         # signature: (goal, llm, tools, personas, max_steps, timeout, vision, reasoning, reflection, ...)
         agent = DroidAgent(
@@ -173,8 +244,6 @@ class CommerceAgent:
             reasoning=False,  # AgentConfig had reasoning=True
         )
 
-        # 3. Execute
-        start_data = {"platform": app_name, "status": "failed", "data": {}}
         try:
             print(f"[CommerceAgent] 🧠 Running Agent Logic...")
             result = await agent.run()
@@ -207,25 +276,57 @@ class CommerceAgent:
                 # Heuristic validation
                 if clean_json.startswith("{"):
                     try:
-                         data = json.loads(clean_json)
-                         start_data["data"] = data
-                         start_data["status"] = "success"
-                         start_data["data"]["numeric_price"] = self._parse_price(data.get("price"))
-                         # Ensure restaurant key exists
-                         if "restaurant" not in start_data["data"]:
-                              start_data["data"]["restaurant"] = "Unknown"
+                         return json.loads(clean_json)
                     except json.JSONDecodeError:
                          print(f"[Warn] JSON Decode Error: {clean_json}")
                 else:
                      print(f"[Warn] Agent output was not JSON: {clean_json[:50]}...")
             else:
                  print("[Warn] Agent returned None result.")
-            
-            return start_data
+            return None
 
         except Exception as e:
             print(f"[Error] Task Execution Failed: {e}")
-            return start_data
+            return None
+
+    async def _extract_from_hierarchy(self, app_name: str, extractor: UIExtractor,
+                                      query: Optional[str] = None) -> Optional[dict]:
+        """
+        Reads title/price/rating/restaurant from the view hierarchy (no LLM).
+        Picks the best-ranked complete card (price, rating) among those matching `query`.
+        Returns None when the selectors miss.
+        """
+        extracted = await extractor.extract(app_name, ["title", "price", "rating", "restaurant"], query)
+        complete = [r for r in extracted["records"] if r.get("title") and r.get("price")]
+        if not complete:
+            print(f"[CommerceAgent] Hierarchy selectors missed on {app_name} ({extracted['missing']}). Falling back to vision.")
+            return None
+
+        ranked = rank_offers([{**r, "numeric_price": self._parse_price(r["price"])} for r in complete],
+                             FOOD_CRITERIA, required=("numeric_price",))
+        if not ranked:
+            print(f"[CommerceAgent] No readable price on {app_name}. Falling back to vision.")
+            return None
+        data = {k: v for k, v in ranked[0].items() if k not in ("numeric_price", "score", "rank", "tied")}
+        data.setdefault("rating", "N/A")
+        data.setdefault("restaurant", "Unknown")
+        print(f"[CommerceAgent] ⚡ Extracted from UI hierarchy ({len(complete)} cards): {data}")
+        return data
+
+    def rank_platforms(self, results: dict, preferences: Optional[dict] = None) -> List[dict]:
+        """
+        Ranks {platform: execute_task result} by price and rating (see neurorun.ranking).
+        Platforms without a price are left out; returns [] when none has one.
+        """
+        offers = []
+        for platform, res in results.items():
+            if not isinstance(res, dict) or res.get('status') != 'success':
+                continue
+            data = res.get('data') or {}
+            offers.append({"app": res.get('platform') or platform.capitalize(), "title": data.get('title'),
+                           "restaurant": data.get('restaurant', 'Unknown'), "price": data.get('price'),
+                           "numeric_price": data.get('numeric_price'), "rating": data.get('rating')})
+        return rank_offers(offers, FOOD_CRITERIA, preferences, required=("numeric_price",))
 
     async def auto_order_cheapest(self, query):
         """
@@ -242,37 +343,19 @@ class CommerceAgent:
             results[platform.lower()] = res
             await asyncio.sleep(2)
 
-        # 2. Determine Victor
-        z_price = float('inf')
-        s_price = float('inf')
-        
-        if results.get('zomato', {}).get('status') == 'success':
-            z_price = results['zomato']['data'].get('numeric_price', float('inf'))
-            
-        if results.get('swiggy', {}).get('status') == 'success':
-             s_price = results['swiggy']['data'].get('numeric_price', float('inf'))
-             
-        victor = None
-        target_app = None
-        target_title = None
-        
-        if z_price < s_price:
-            victor = results['zomato']
-            target_app = "Zomato"
-            target_title = victor['data'].get('title')
-        elif s_price < z_price:
-             victor = results['swiggy']
-             target_app = "Swiggy"
-             target_title = victor['data'].get('title')
-        elif s_price == z_price and s_price != float('inf'):
-             target_app = "Swiggy" # Default to Swiggy on tie
-             victor = results['swiggy']
-             target_title = victor['data'].get('title')
-        
-        if not target_app:
+        # 2. Determine Victor (weighted price + rating across platforms)
+        ranked = self.rank_platforms(results)
+        results["ranked"] = ranked
+        if not ranked:
              print("\n❌ Could not determine valid pricing on either app. Aborting order.")
              return results
 
+        target_app = ranked[0]["app"]
+        victor = results[target_app.lower()]
+        target_title = victor['data'].get('title')
+        if ranked[0]["tied"]:
+             print(f"[CommerceAgent] Tie between {', '.join(o['app'] for o in ranked if o['rank'] == 1)}; taking {target_app}.")
+
         print(f"\n[CommerceAgent] 🏆 Best Deal identify: {target_app} @ {victor['data'].get('price')}")
         print(f"Details: {target_title}")
         print(f"Proceeding to ORDER on {target_app}...")
@@ -3,8 +3,10 @@ import json
 import argparse
 import asyncio
 import sys
+from typing import Optional
 import time
 import ast # Added for robust parsing
+import uuid
 from dotenv import load_dotenv
 
 # --- DroidRun Professional Architecture Imports ---
@@ -23,20 +25,70 @@ except ImportError:
     print("CRITICAL ERROR: 'commerce_agent.py' not found.")
     sys.exit(1)
 
+from neurorun.device_pool import get_device_pool, DeviceLease, NoDeviceAvailable
+from neurorun.app_registry import resolve_package
+from neurorun.device_primitives import DevicePrimitives
+from neurorun.notification_listener import NotificationListener
+from neurorun.research_queue import ResearchQueue
+from neurorun.checkpoint_store import get_checkpoint_store
+
 load_dotenv()
 
+UNKNOWN_RESTAURANTS = ("", "unknown", "n/a", "none")
+ACTIVE_RUNS = set()  # run_ids being executed in this process (one runner per run)
+
+
+def plan_carts(orders: list) -> list:
+    """
+    Groups researched orders into one cart per (app, restaurant); the same dish for several
+    guests becomes one line with a quantity. Apps only allow one restaurant per cart, so orders
+    whose restaurant is unknown cannot be merged and each get a cart of their own.
+    """
+    carts = {}
+    for n, order in enumerate(orders):
+        restaurant = str(order.get('best_restaurant') or "").strip()
+        known = restaurant.lower() not in UNKNOWN_RESTAURANTS
+        key = (order['best_app'], restaurant.lower() if known else f"#{n}")
+        cart = carts.setdefault(key, {"app": order['best_app'], "restaurant": restaurant if known else None,
+                                      "lines": {}, "people": []})
+        title = order['exact_title']
+        line = cart['lines'].setdefault(title.lower(), {"title": title, "query": order['item_wanted'], "quantity": 0})
+        line['quantity'] += 1
+        cart['people'].append(order['person'])
+    return [{"app": c['app'], "restaurant": c['restaurant'], "items": list(c['lines'].values()), "people": c['people']}
+            for c in carts.values()]
+
+
 class EventCoordinatorAgent:
     def __init__(self, provider="gemini", model="models/gemini-2.5-flash"):
         self.provider = provider
         self.model = model
         self.commerce_bot = CommerceAgent(provider=provider, model=model)
+        # Identical items (eight guests all wanting "Pizza") are researched once
+        self.research_queue = ResearchQueue(self.research_item)
+        self.store = get_checkpoint_store()
         self._ensure_api_keys()
 
     def _ensure_api_keys(self):
         if self.provider == "gemini" and not os.getenv("GEMINI_API_KEY") and not os.getenv("GOOGLE_API_KEY"):
              print("[Warn] GEMINI_API_KEY not found in env.")
 
-    async def _run_agent(self, goal: str) -> dict:
+    async def _run_agent(self, goal: str, app: Optional[str] = None, serial: Optional[str] = None) -> dict:
+        """
+        Leases a free device from the pool (or `serial`) for one DroidAgent run (launching `app` directly first).
+        Goals that are a single trivial action (home, back, open app/URL) run as ADB primitives instead.
+        """
+        async with get_device_pool().lease("coordinator", serial=serial,
+                                           package=resolve_package(app) if app else None) as device:
+            primitives = DevicePrimitives(device.serial)
+            quick = await primitives.run_goal(goal)
+            if quick is not None:
+                return quick
+            if app:
+                await primitives.launch_app(app)
+            return await self._run_agent_on(device, goal)
+
+    async def _run_agent_on(self, device: DeviceLease, goal: str) -> dict:
         """Helper to run DroidAgent with Robust Regex Parsing."""
         # ... (Config setup same) ...
         api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
@@ -44,7 +96,7 @@ class EventCoordinatorAgent:
         
         llm = load_llm(provider_name=provider_name, model=self.model, api_key=api_key)
         
-        tools = await AdbTools.create()
+        tools = await AdbTools.create(serial=device.serial)
         
         agent = DroidAgent(
             goal=goal,
@@ -98,7 +150,8 @@ class EventCoordinatorAgent:
             print(f"[Error] Agent Execution Failed: {e}")
             return {"status": "failed", "error": str(e)}
 
-    async def send_invite(self, contact_name: str, message: str, app_name: str = "WhatsApp") -> dict:
+    async def send_invite(self, contact_name: str, message: str, app_name: str = "WhatsApp",
+                          serial: Optional[str] = None) -> dict:
         print(f"   📨 Sending Invite to: {contact_name}")
         
         # Linear Goal: Step-by-step Execution
@@ -112,9 +165,10 @@ class EventCoordinatorAgent:
             f"Return a strict JSON object: {{'status': 'success'}}. "
             f"Do NOT read previous messages."
         )
-        return await self._run_agent(goal)
+        return await self._run_agent(goal, app=app_name, serial=serial)
 
-    async def check_response(self, contact_name: str, invite_snippet: str, app_name: str = "WhatsApp") -> dict:
+    async def check_response(self, contact_name: str, invite_snippet: str, app_name: str = "WhatsApp",
+                             serial: Optional[str] = None) -> dict:
         print(f"   � Checking {contact_name}...")
         goal = (
             f"Open '{app_name}'. "
@@ -127,132 +181,28 @@ class EventCoordinatorAgent:
             f"Return strict JSON: {{'status': 'new_reply', 'items': ['Item1']}} or {{'status': 'waiting'}}. "
             f"CRITICAL: If a food item is found, you MUST set 'status' to 'new_reply'. Do NOT set it to 'waiting'."
         )
-        return await self._run_agent(goal)
-    
-    # ... (research_item, etc.)
-
-    async def organize_event(self, contacts_str, event_details):
-        # ... (Phase 1 remains same)
-        contacts = [c.strip() for c in contacts_str.split(",")]
-        # ...
-        
-        # --- PHASE 2: POLLING & RESEARCH ---
-        # ...
-        for i in range(max_cycles):
-            # ...
-            for contact in pending_contacts:
-                # Poll
-                await self.go_home() 
-                res = await self.check_response(contact, invite_msg)
-                
-                # Check for 'new_reply' OR if 'items' exists and is not empty
-                is_reply = res.get('status') == 'new_reply'
-                has_items = res.get('items') and len(res.get('items')) > 0
-                
-                if is_reply or has_items:
-                    items = res.get('items', [])
-                    # ...
-    
-    # ... (research_item logic remains same)
-
-    async def organize_event(self, contacts_input, event_details):
-        if isinstance(contacts_input, list):
-            contacts = contacts_input
-        else:
-            contacts = [c.strip() for c in contacts_input.split(",")]
-        
-        invite_msg = (
-            f"Hi! Invited to {event_details['name']} on {event_details['date']}. "
-            f"Loc: {event_details['location']}. "
-            f"Please Reply with FOOD PREFERENCE."
-        )
-        
-        # --- PHASE 1: INVITE EVERYONE ---
-        print(f"\n=== 📨 PHASE 1: SENDING INVITES ===")
-        print(f"Targeting: {contacts}")
-        
-        for contact in contacts:
-            await self.go_home() # Clean state start
-            await self.send_invite(contact, invite_msg)
-            print(f"   🏠 Resetting to Home after invite to {contact}...")
-            await self.go_home() # STRICT EXIT as requested
-            await asyncio.sleep(2)
-        print("✅ Phase 1 Complete: All invites sent & returned to Home.\n")
-
-        # --- PHASE 2: POLLING & RESEARCH (Infinite) ---
-        print(f"=== 👂 PHASE 2: POLLING & RESEARCH (Infinite Loop) ===")
-        print(f"ℹ️  Agent will now enter Dormant State and wake up every 10s to check for replies.")
-        
-        # Central Data Structure
-        order_plan = {c: {"status": "invited", "research_data": []} for c in contacts}
-        
-        cycle_count = 0
-        while True:
-            cycle_count += 1
-            print(f"\n🔄 Cycle {cycle_count} (Infinite Mode)")
-            
-            pending_contacts = [c for c, data in order_plan.items() if data['status'] == "invited"]
-            
-            if not pending_contacts:
-                print("✅ All contacts has replied and been researched!")
-                break
-            
-            for contact in pending_contacts:
-                # Poll
-                await self.go_home() 
-                res = await self.check_response(contact, invite_msg)
-                
-                print(f"      [DEBUG] Raw Response for {contact}: {res}")
-                
-                # Check for 'new_reply' OR if 'items' exists and is not empty
-                # Case-insensitive check for reliability
-                status = res.get('status', '').lower()
-                is_reply = status == 'new_reply'
-                has_items = res.get('items') and len(res.get('items')) > 0
-                
-                if is_reply or has_items:
-                    items = res.get('items', [])
-                    # Fallback
-                    if not items and res.get('content'): items = [res.get('content')]
-                    
-                    if items:
-                        print(f"   🎉 {contact} replied: {items}")
-                        order_plan[contact]['status'] = "replied"
-                        
-                        # Research Loop
-                        researched_items = []
-                        for item in items:
-                            data = await self.research_item(item)
-                            if data: researched_items.append(data)
-                        
-                        order_plan[contact]['research_data'] = researched_items
-                        order_plan[contact]['status'] = "researched"
-                        print(f"   💾 Data saved for {contact}.")
-                    else:
-                        print(f"   ℹ️ {contact} replied but no items found. Content: {res.get('content')}")
-                else:
-                     print(f"   ⏳ {contact} hasn't replied yet.")
-                
-                await asyncio.sleep(2)
+        return await self._run_agent(goal, app=app_name, serial=serial)
 
-    async def go_home(self) -> dict:
-        """Helper to ensure device is at Home Screen."""
+    async def go_home(self, serial: Optional[str] = None) -> dict:
+        """Helper to ensure device (`serial`, or any free one) is at Home Screen (one keyevent, no agent run)."""
         print("   🏠 Navigating to Home Screen...")
-        goal = "Press the System Home Button immediately. Do NOT swipe. Do NOT look for keyboard. Just press 'Home'."
-        return await self._run_agent(goal)
+        async with get_device_pool().lease("coordinator", serial=serial) as device:
+            return await DevicePrimitives(device.serial).home()
 
     async def research_item(self, item: str) -> dict:
-        """Finds best price across Swiggy/Zomato. Returns Data Dict (No Order)."""
+        """
+        Finds best price across Swiggy/Zomato. Returns Data Dict (No Order).
+        Call through self.research_queue so repeated items are not searched again.
+        """
         print(f"      🔎 Researching Best Deal for: {item}...")
         platforms = ["Zomato", "Swiggy"]
-        results = {}
         
-        for p in platforms:
-             await self.go_home() # Reset state to avoid "Already Open" loops
-             await asyncio.sleep(2)
-             
-             print(f"      👉 Checking {p}...")
-             res = await self.commerce_bot.execute_task(p, item, "food item", action="search")
+        # Each search leases its own phone and launches the app directly, so with two devices
+        # both platforms are searched at the same time (no go_home/sleep reset needed).
+        responses = await asyncio.gather(
+            *(self.commerce_bot.execute_task(p, item, "food item", action="search") for p in platforms))
+        results = {}
+        for p, res in zip(platforms, responses):
              results[p.lower()] = res
              
              # Verbose Logging as requested
@@ -260,35 +210,19 @@ class EventCoordinatorAgent:
              price = res.get('data', {}).get('price', 'N/A')
              print(f"         [{p}] Status: {status} | Price: {price}")
              
-             await asyncio.sleep(2)
-             
-        z_data = results.get('zomato', {}).get('data', {})
-        s_data = results.get('swiggy', {}).get('data', {})
-        
-        z_price = float(z_data.get('numeric_price', float('inf')))
-        s_price = float(s_data.get('numeric_price', float('inf')))
+        # Weighted price + rating ranking across platforms (ties keep the listing order)
+        ranked = self.commerce_bot.rank_platforms(results)
+        print(f"      ⚖️  Comparison: " + " vs ".join(f"{o['app']} ({o['numeric_price']}, score {o['score']})" for o in ranked))
         
-        print(f"      ⚖️  Comparison: Zomato ({z_price}) vs Swiggy ({s_price})")
-        
-        if z_price == float('inf') and s_price == float('inf'):
+        if not ranked:
             print(f"      ❌ Price not found for {item} on ANY platform.")
             return None
 
-        best_app = "Swiggy"
-        best_price = s_price
-        best_title = s_data.get('title', item)
-        best_restaurant = s_data.get('restaurant', 'Unknown')
-        
-        # Explicit Logic:
-        # If Zomato exists and Swiggy fails (inf) -> Zomato wins
-        # If Zomato exists and is cheaper than Swiggy -> Zomato wins
-        if z_price < s_price: 
-            best_app = "Zomato"
-            best_price = z_price
-            best_title = z_data.get('title', item)
-            best_restaurant = z_data.get('restaurant', 'Unknown')
-        
-        print(f"      🏆 Winner: {best_app} @ {best_price}")
+        best = ranked[0]
+        best_app = best["app"]
+        best_price = best["numeric_price"]
+        best_title = best.get("title") or item
+        best_restaurant = best.get("restaurant") or "Unknown"
             
         print(f"      🏆 Winner: {best_app} ({best_restaurant}) @ {best_price}")
         
@@ -298,111 +232,227 @@ class EventCoordinatorAgent:
             "best_price": best_price,
             "best_restaurant": best_restaurant,
             "exact_title": best_title,
+            "ranked": ranked,
             "platform_data": results # Saving raw data too
         }
 
-    async def organize_event(self, contacts_input, event_details):
+    def _checkpoint(self, run: dict, contact: Optional[str] = None, status: Optional[str] = None, **fields):
+        """Records one state transition and saves the whole run (invited -> replied -> researched -> ordered)."""
+        if contact:
+            guest = run['guests'][contact]
+            if status:
+                guest['status'] = status
+            guest.update(fields)
+        self.store.save(run['run_id'], run)
+
+    def _new_run(self, run_id: str, contacts: list, event_details: dict) -> dict:
+        return {
+            "run_id": run_id,
+            "event": event_details,
+            "contacts": contacts,
+            "invite_msg": (
+                f"Hi! Invited to {event_details['name']} on {event_details['date']}. "
+                f"Loc: {event_details['location']}. "
+                f"Please Reply with FOOD PREFERENCE (e.g. Pizza)."
+            ),
+            "phase": "inviting",
+            "device": None,  # the phone the invites go out from; replies are read on the same one
+            "created_at": time.time(),
+            "guests": {c: {"status": "pending", "items": [], "reply": None, "research_data": []} for c in contacts},
+            "carts": None,
+        }
+
+    async def _research_guest(self, run: dict, contact: str, items: list):
+        found = await self.research_queue.research_all(items)
+        # Copies: memoized results are shared between guests and get a 'person' below
+        self._checkpoint(run, contact, "researched", research_data=[dict(data) for data in found.values() if data])
+        print(f"   💾 Data saved for {contact}.")
+
+    async def organize_event(self, contacts_input, event_details, run_id: Optional[str] = None):
+        """
+        Invite -> listen & research -> bulk order, checkpointed after every transition.
+        Passing the run_id of an interrupted run resumes it: invited guests are not invited again,
+        researched items are not searched again and placed carts are not ordered again.
+        """
         if isinstance(contacts_input, list):
             contacts = contacts_input
         else:
             contacts = [c.strip() for c in contacts_input.split(",")]
         
-        invite_msg = (
-            f"Hi! Invited to {event_details['name']} on {event_details['date']}. "
-            f"Loc: {event_details['location']}. "
-            f"Please Reply with FOOD PREFERENCE (e.g. Pizza)."
-        )
-        
-        # --- PHASE 1: INVITE EVERYONE ---
-        print(f"\n=== 📨 PHASE 1: SENDING INVITES ===")
-        print(f"Targeting: {contacts}")
-        
-        for contact in contacts:
-            await self.send_invite(contact, invite_msg)
-            await asyncio.sleep(2)
-        print("✅ Phase 1 Complete: All invites sent.\n")
+        run = self.store.load(run_id) if run_id else None
+        if run:
+            print(f"\n♻️ Resuming coordination run {run['run_id']} (phase: {run['phase']})")
+        else:
+            run = self._new_run(run_id or uuid.uuid4().hex[:12], contacts, event_details)
+            self._checkpoint(run)
+            print(f"\n🆕 Coordination run {run['run_id']}")
+        if run['run_id'] in ACTIVE_RUNS:
+            print(f"⚠️ Run {run['run_id']} is already in progress.")
+            return {"status": "failed", "run_id": run['run_id'], "error": "Run already in progress"}
+        ACTIVE_RUNS.add(run['run_id'])
+        try:
+            return await self._organize(run)
+        finally:
+            ACTIVE_RUNS.discard(run['run_id'])
 
-        # --- PHASE 2: POLLING & RESEARCH ---
-        print(f"=== 👂 PHASE 2: POLLING & RESEARCH (Loop) ===")
-        
-        # Central Data Structure
-        order_plan = {c: {"status": "invited", "research_data": []} for c in contacts}
+    async def _organize(self, run: dict) -> dict:
+        guests = run['guests']
+        invite_msg = run['invite_msg']
+        listener = NotificationListener("WhatsApp")
+        # Research finished before an interruption also serves other guests' identical items
+        for g in guests.values():
+            for data in g['research_data']:
+                self.research_queue.remember(data['item_wanted'], data)
         
-        max_cycles = 3
-        
-        for i in range(max_cycles):
-            print(f"\n🔄 Cycle {i+1}/{max_cycles}")
+        if run['phase'] in ("inviting", "listening") and not run.get('device'):
+            # Invites, the notification shade and the chats we read must all be on one phone
+            async with get_device_pool().lease("coordinator", package=listener.package) as device:
+                run['device'] = device.serial
+            self._checkpoint(run)
+            print(f"📱 Coordinating from {run['device']}")
+        serial = run.get('device')
+
+        if run['phase'] == "inviting":
+            # Snapshot the notification shade first so only replies to these invites count.
+            # (Not on resume: replies that arrived while we were down are still in the shade.)
+            if all(g['status'] == "pending" for g in guests.values()):
+                async with get_device_pool().lease("coordinator", serial=serial) as device:
+                    await listener.prime(device.serial)
+
+            # --- PHASE 1: INVITE EVERYONE ---
+            print(f"\n=== 📨 PHASE 1: SENDING INVITES ===")
+            pending = [c for c, g in guests.items() if g['status'] == "pending"]
+            print(f"Targeting: {pending} ({len(guests) - len(pending)} already invited)")
             
-            pending_contacts = [c for c, data in order_plan.items() if data['status'] == "invited"]
+            for contact in pending:
+                await self.send_invite(contact, invite_msg, serial=serial)
+                self._checkpoint(run, contact, "invited")
+                await asyncio.sleep(2)
+            run['phase'] = "listening"
+            self._checkpoint(run)
+            print("✅ Phase 1 Complete: All invites sent.\n")
+
+        research_tasks = []
+        if run['phase'] == "listening":
+            # --- PHASE 2: LISTEN & RESEARCH ---
+            # Replies arrive as notifications; only contacts who actually replied get an agent run.
+            print(f"=== 👂 PHASE 2: LISTENING FOR REPLIES & RESEARCH ===")
+            await self.go_home(serial) # Chats we leave open would swallow their notifications
             
-            if not pending_contacts:
-                print("✅ All contacts has replied and been researched!")
-                break
+            # Replies read before an interruption only need their research redone
+            for contact, g in guests.items():
+                if g['status'] == "replied":
+                    research_tasks.append(asyncio.ensure_future(self._research_guest(run, contact, g['items'])))
             
-            for contact in pending_contacts:
-                # Poll
-                res = await self.check_response(contact, invite_msg)
+            reply_timeout = float(os.getenv("EVENT_REPLY_TIMEOUT", "600"))
+            waiting = [c for c, g in guests.items() if g['status'] == "invited"]
+            async for event in listener.replies(waiting, timeout=reply_timeout, serial=serial):
+                contact = event.contact
+                print(f"   🔔 {contact} replied: '{event.text[:60]}'")
                 
-                if res.get('status') == 'new_reply':
-                    items = res.get('items', [])
-                    # Fallback
-                    if not items and res.get('content'): items = [res.get('content')]
-                    
-                    if items:
-                        print(f"   🎉 {contact} replied: {items}")
-                        order_plan[contact]['status'] = "replied"
-                        
-                        # Research Loop
-                        researched_items = []
-                        for item in items:
-                            data = await self.research_item(item)
-                            if data: researched_items.append(data)
-                        
-                        order_plan[contact]['research_data'] = researched_items
-                        order_plan[contact]['status'] = "researched"
-                        print(f"   � Data saved for {contact}.")
-                    else:
-                        print(f"   ℹ️ {contact} replied but no items found.")
-                else:
-                     print(f"   ⏳ {contact} hasn't replied yet.")
+                # Read the chat only now that we know there is something to read
+                res = await self.check_response(contact, invite_msg, serial=serial)
+                items = res.get('items') or []
+                if not items and res.get('content'): items = [res.get('content')]
+                if not items: items = [event.text]
                 
-                await asyncio.sleep(2)
+                print(f"   🎉 {contact} wants: {items}")
+                self._checkpoint(run, contact, "replied", items=items, reply=event.text)
+                # Research in the background while we keep listening; the queue dedups across guests
+                research_tasks.append(asyncio.ensure_future(self._research_guest(run, contact, items)))
+                await self.go_home(serial)
             
-            # DORMANT STATE
-            print("   💤 Entering Dormant State... Waking up in 10s...")
-            await self.go_home() # Ensure we are at home while waiting
-            await asyncio.sleep(10)
+            silent = [c for c, g in guests.items() if g['status'] == "invited"]
+            if silent:
+                print(f"   ⏳ No reply within {reply_timeout:.0f}s from: {silent}")
+            print(f"   📊 Notification polls: {listener.stats()}")
+
+            # Wait for every unique item before ordering
+            print(f"   🔎 Finishing research for {len(research_tasks)} guest(s)...")
+            await asyncio.gather(*research_tasks)
+            print(f"   📊 Research queue: {self.research_queue.stats()}")
+            run['phase'] = "ordering"
+            self._checkpoint(run)
 
         # --- PHASE 3: BULK ORDER ---
         print(f"\n=== 🚀 PHASE 3: BULK ORDER EXECUTION ===")
         
-        all_orders = []
-        for person, data in order_plan.items():
-            if data['status'] == 'researched' and data['research_data']:
-                for item_data in data['research_data']:
-                    item_data['person'] = person
-                    all_orders.append(item_data)
+        if run['carts'] is None:
+            all_orders = []
+            for person, g in guests.items():
+                if g['status'] == 'researched' and g['research_data']:
+                    for item_data in g['research_data']:
+                        item_data['person'] = person
+                        all_orders.append(item_data)
+            # One cart and one checkout per (app, restaurant) instead of one per item
+            run['carts'] = [{**cart, "status": "pending"} for cart in plan_carts(all_orders)]
+            self._checkpoint(run)
+            print(f"📋 {len(all_orders)} items -> {len(run['carts'])} checkout(s):")
+            print(json.dumps(run['carts'], indent=2))
         
-        if not all_orders:
+        if not run['carts']:
             print("⚠️ No valid orders to place.")
-            return
-
-        print(f"📋 Placing {len(all_orders)} orders...")
-        print(json.dumps(all_orders, indent=2))
         
-        for order in all_orders:
-            print(f"\n🛒 Ordering for {order['person']}: {order['exact_title']} on {order['best_app']}...")
-            await self.commerce_bot.execute_task(
-                order['best_app'], 
-                order['item_wanted'], 
-                "food item", 
-                action="order", 
-                target_item=order['exact_title']
-            )
-            print("✅ Order Placed.")
-            await asyncio.sleep(5)
+        for cart in run['carts']:
+            names = ", ".join(f"{line['title']} x{line['quantity']}" for line in cart['items'])
+            if cart['status'] == "ordered":
+                print(f"⏭️ {cart['app']} ({names}) already ordered.")
+                continue
+            if cart['status'] == "checking_out":
+                # Interrupted mid-checkout: the order may have gone through. Never pay twice.
+                cart['status'] = "needs_review"
+                self._checkpoint(run)
+            if cart['status'] == "needs_review":
+                print(f"⚠️ {cart['app']} ({names}) was interrupted during checkout. Check the app before reordering.")
+                continue
+            
+            cart['status'] = "checking_out"
+            self._checkpoint(run)
+            try:
+                if cart['restaurant']:
+                    print(f"\n🛒 {cart['app']} / {cart['restaurant']}: {names} (for {', '.join(cart['people'])})...")
+                    res = await self.commerce_bot.execute_task(
+                        cart['app'],
+                        cart['restaurant'],
+                        "food item",
+                        action="cart",
+                        cart_items=cart['items']
+                    )
+                else:
+                    line = cart['items'][0]
+                    print(f"\n🛒 Ordering for {cart['people'][0]}: {line['title']} on {cart['app']}...")
+                    res = await self.commerce_bot.execute_task(
+                        cart['app'], 
+                        line['query'], 
+                        "food item", 
+                        action="order", 
+                        target_item=line['title']
+                    )
+            except NoDeviceAvailable:
+                # Never got a phone, so nothing was ordered: safe to retry on resume
+                cart['status'] = "pending"
+                self._checkpoint(run)
+                raise
+            cart['status'] = "ordered" if res.get('status') == 'success' else "failed"
+            cart['result'] = res.get('data')
+            self._checkpoint(run)
+            if cart['status'] == "ordered":
+                print("✅ Order Placed.")
+            else:
+                print(f"❌ Checkout failed for {cart['app']} ({names}): {res.get('data')}")
+        
+        # A guest is 'ordered' once every cart holding one of their items went through
+        for person, g in guests.items():
+            theirs = [c for c in run['carts'] if person in c['people']]
+            if theirs and all(c['status'] == "ordered" for c in theirs):
+                g['status'] = "ordered"
+        run['phase'] = "complete"
+        self._checkpoint(run)
             
         print("\n=== 🎉 EVENT COORDINATION COMPLETE ===")
+        return {"status": "success", "run_id": run['run_id'],
+                "guests": {c: g['status'] for c, g in guests.items()},
+                "carts": [{"app": c['app'], "restaurant": c['restaurant'], "status": c['status']} for c in run['carts']]}
 
 async def main():
     parser = argparse.ArgumentParser()
@@ -411,6 +461,7 @@ async def main():
     parser.add_argument("--date", required=True)
     parser.add_argument("--time", required=True)
     parser.add_argument("--location", required=True)
+    parser.add_argument("--resume", help="run_id of an interrupted run to continue")
     args = parser.parse_args()
 
     agent = EventCoordinatorAgent()
@@ -422,7 +473,7 @@ async def main():
         "location": args.location
     }
     
-    await agent.organize_event(args.contacts, details)
+    await agent.organize_event(args.contacts, details, run_id=args.resume)
 
 if __name__ == "__main__":
     # if sys.platform == 'win32':
@@ -0,0 +1,259 @@
+import time
+import shlex
+import asyncio
+import itertools
+from collections import deque
+from typing import Dict, List, Optional
+
+STREAM_LIMIT = 16 * 1024 * 1024  # uiautomator/dumpsys output can be large single lines
+
+
+class CommandResult:
+    """Structured result of one shell command on the device."""
+
+    __slots__ = ("command", "output", "exit_code", "duration_ms")
+
+    def __init__(self, command: str, output: str, exit_code: int, duration_ms: float):
+        self.command = command
+        self.output = output
+        self.exit_code = exit_code
+        self.duration_ms = duration_ms
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+    def to_dict(self) -> dict:
+        return {"command": self.command, "output": self.output, "exit_code": self.exit_code,
+                "duration_ms": round(self.duration_ms, 2)}
+
+    def __repr__(self):
+        return f"CommandResult({self.command!r}, exit={self.exit_code}, {self.duration_ms:.1f}ms)"
+
+
+class _Pending:
+    __slots__ = ("command", "marker", "future", "started", "lines")
+
+    def __init__(self, command: str, marker: str, future: asyncio.Future):
+        self.command = command
+        self.marker = marker
+        self.future = future
+        self.started = time.perf_counter()
+        self.lines: List[str] = []
+
+
+class AdbTransport:
+    """
+    Long-lived `adb shell` session per device.
+    Commands are written to the shell's stdin back-to-back (pipelined) and each one is
+    terminated by a unique exit-code marker, so a single reader task can hand every
+    caller its own output without forking an adb client per command.
+    Binary payloads (screencap) use `exec-out`, which keeps bytes intact.
+    """
+
+    _sessions: Dict[str, "AdbTransport"] = {}
+
+    def __init__(self, serial: Optional[str] = None):
+        self.serial = serial
+        self._proc: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: deque = deque()
+        self._write_lock = asyncio.Lock()
+        self._seq = itertools.count()
+        self.commands_run = 0
+        self.total_ms = 0.0
+
+    @classmethod
+    def for_device(cls, serial: Optional[str] = None) -> "AdbTransport":
+        """Shared session for a device (None = adb's default device)."""
+        key = serial or "default"
+        if key not in cls._sessions:
+            cls._sessions[key] = cls(serial)
+        return cls._sessions[key]
+
+    def _adb(self, *args) -> List[str]:
+        cmd = ["adb"]
+        if self.serial:
+            cmd += ["-s", self.serial]
+        return cmd + list(args)
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.returncode is None
+
+    async def start(self):
+        if self.alive:
+            return
+        self._proc = await asyncio.create_subprocess_exec(
+            *self._adb("shell"),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=STREAM_LIMIT,
+        )
+        self._reader = asyncio.create_task(self._read_loop())
+        print(f"[AdbTransport] Shell session opened for {self.serial or 'default device'}")
+
+    async def _read_loop(self):
+        proc = self._proc
+        while True:
+            raw = await proc.stdout.readline()
+            if not raw:
+                break
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if not self._pending:
+                continue
+            head = self._pending[0]
+            idx = line.find(head.marker)
+            if idx == -1:
+                head.lines.append(line)
+                continue
+            if idx > 0:
+                head.lines.append(line[:idx])
+            try:
+                code = int(line[idx + len(head.marker):].strip() or 0)
+            except ValueError:
+                code = -1
+            self._pending.popleft()
+            elapsed = (time.perf_counter() - head.started) * 1000
+            self.commands_run += 1
+            self.total_ms += elapsed
+            if not head.future.done():
+                head.future.set_result(CommandResult(head.command, "\n".join(head.lines), code, elapsed))
+
+        # Session died: fail everything still waiting so callers can retry.
+        while self._pending:
+            p = self._pending.popleft()
+            if not p.future.done():
+                p.future.set_exception(ConnectionError(f"adb shell session for {self.serial} closed"))
+
+    async def _submit(self, command: str) -> asyncio.Future:
+        await self.start()
+        marker = f"__TRIO_{next(self._seq)}__"
+        future = asyncio.get_running_loop().create_future()
+        async with self._write_lock:
+            pending = _Pending(command, marker, future)
+            self._pending.append(pending)
+            try:
+                self._proc.stdin.write(f"{command}; echo {marker}$?\n".encode())
+                await self._proc.stdin.drain()
+            except Exception:
+                # Never written: the caller gets the error, nobody is left waiting on this future.
+                if pending in self._pending:
+                    self._pending.remove(pending)
+                raise
+        return future
+
+    async def run(self, command: str, timeout: float = 30) -> CommandResult:
+        """Runs one shell command on the persistent session."""
+        for attempt in range(2):
+            try:
+                future = await self._submit(command)
+                return await asyncio.wait_for(future, timeout=timeout)
+            except (ConnectionError, BrokenPipeError) as e:
+                if attempt == 0:
+                    print(f"[AdbTransport] Session lost ({e}). Reconnecting...")
+                    await self.close()
+                    continue
+                return CommandResult(command, str(e), -1, 0.0)
+            except asyncio.TimeoutError:
+                # The shell is now out of sync with our markers; start a fresh one next time.
+                await self.close()
+                return CommandResult(command, "timeout", -1, timeout * 1000)
+
+    async def run_many(self, commands: List[str], timeout: float = 30) -> List[CommandResult]:
+        """
+        Pipelines several commands: all are written before any result is awaited.
+        If the session dies mid-batch, commands that already reported back keep their results and
+        the rest are sent once more on a fresh session, as run() does for a single command.
+        """
+        results: List[Optional[CommandResult]] = [None] * len(commands)
+        error: Optional[BaseException] = None
+        for attempt in range(2):
+            futures: Dict[int, asyncio.Future] = {}
+            error = None
+            for i, command in enumerate(commands):
+                if results[i] is not None:
+                    continue
+                try:
+                    futures[i] = await self._submit(command)
+                except (ConnectionError, BrokenPipeError) as e:
+                    error = e
+                    break
+            try:
+                outcomes = await asyncio.wait_for(asyncio.gather(*futures.values(), return_exceptions=True),
+                                                  timeout=timeout)
+            except asyncio.TimeoutError:
+                await self.close()
+                return [r if r is not None else CommandResult(c, "timeout", -1, timeout * 1000)
+                        for r, c in zip(results, commands)]
+            for i, outcome in zip(futures, outcomes):
+                if isinstance(outcome, CommandResult):
+                    results[i] = outcome
+                else:
+                    error = outcome
+            if error is None:
+                break
+            if attempt == 0:
+                left = sum(r is None for r in results)
+                print(f"[AdbTransport] Session lost mid-batch ({error}). Reconnecting for {left} command(s)...")
+                await self.close()
+        return [r if r is not None else CommandResult(c, str(error), -1, 0.0) for r, c in zip(results, commands)]
+
+    async def exec_out(self, *args: str, timeout: float = 20) -> bytes:
+        """Binary-safe one-shot command (e.g. screencap -p, uiautomator dump /dev/tty)."""
+        proc = await asyncio.create_subprocess_exec(
+            *self._adb("exec-out", *args),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # Abandoned (e.g. a discarded speculative frame): don't leave the adb client behind.
+            if proc.returncode is None:
+                proc.kill()
+            raise
+        if proc.returncode != 0:
+            raise RuntimeError(f"exec-out {' '.join(args)} failed: {err.decode(errors='replace').strip()}")
+        return out
+
+    # --- Input helpers ---
+
+    async def tap(self, x: int, y: int) -> CommandResult:
+        return await self.run(f"input tap {int(x)} {int(y)}")
+
+    async def keyevent(self, code) -> CommandResult:
+        return await self.run(f"input keyevent {code}")
+
+    async def text(self, text: str) -> CommandResult:
+        # `input text` treats %s as a space; everything else is shell-quoted.
+        return await self.run(f"input text {shlex.quote(text.replace(' ', '%s'))}")
+
+    async def swipe(self, x1: int, y1: int, x2: int, y2: int, duration_ms: int = 300) -> CommandResult:
+        return await self.run(f"input swipe {int(x1)} {int(y1)} {int(x2)} {int(y2)} {duration_ms}")
+
+    async def input_batch(self, events: List[str]) -> CommandResult:
+        """Sends several `input ...` events as one shell line (a single round-trip)."""
+        return await self.run(" && ".join(f"input {e}" for e in events))
+
+    def stats(self) -> dict:
+        avg = self.total_ms / self.commands_run if self.commands_run else 0.0
+        return {"serial": self.serial, "alive": self.alive, "commands": self.commands_run, "avg_ms": round(avg, 2)}
+
+    async def close(self):
+        if self._proc and self._proc.returncode is None:
+            try:
+                self._proc.stdin.close()
+                self._proc.terminate()
+                await asyncio.wait_for(self._proc.wait(), timeout=2)
+            except Exception:
+                pass
+        if self._reader:
+            self._reader.cancel()
+        while self._pending:
+            p = self._pending.popleft()
+            if not p.future.done():
+                p.future.set_exception(ConnectionError(f"adb shell session for {self.serial} closed"))
+        self._proc = None
+        self._reader = None
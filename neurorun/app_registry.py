@@ -0,0 +1,181 @@
+import re
+import time
+from typing import Dict, Optional
+
+from neurorun.adb_transport import AdbTransport
+from neurorun.device_pool import get_device_pool
+
+# The one app-name -> package table. Names are what agents and the LLM use; aliases are
+# matched case-insensitively so "tata", "1mg" and "Tata 1mg" all resolve.
+APPS: Dict[str, Dict] = {
+    # Transit / Stay
+    "Uber": {"package": "com.ubercab", "aliases": ["uber"]},
+    "Ola": {"package": "com.olacabs.customer", "aliases": ["ola", "ola cabs"]},
+    "MakeMyTrip": {"package": "com.makemytrip", "aliases": ["mmt", "make my trip"]},
+    "Booking.com": {"package": "com.booking", "aliases": ["booking"]},
+    # Commerce
+    "Amazon": {"package": "com.amazon.mShop.android.shopping", "aliases": ["amazon"]},
+    "Flipkart": {"package": "com.flipkart.android", "aliases": ["flipkart"]},
+    "Zomato": {"package": "com.application.zomato", "aliases": ["zomato"]},
+    "Swiggy": {"package": "in.swiggy.android", "aliases": ["swiggy"]},
+    # Social
+    "WhatsApp": {"package": "com.whatsapp", "aliases": ["whatsapp", "whats app"]},
+    # Pharmacy
+    "PharmEasy": {"package": "com.pharmeasy.app", "aliases": ["pharmeasy", "pharm easy"]},
+    "Apollo 24|7": {"package": "com.apollo.patientapp", "aliases": ["apollo", "apollo 247", "apollo 24/7"]},
+    "Tata 1mg": {"package": "com.aranoah.healthkart.plus", "aliases": ["tata", "1mg", "tata1mg"]},
+}
+
+PACKAGE_PATTERN = re.compile(r"^[a-zA-Z][\w]*(\.[\w]+)+$")
+
+
+def _lookup_table() -> Dict[str, str]:
+    table = {}
+    for name, app in APPS.items():
+        table[name.lower()] = app["package"]
+        for alias in app.get("aliases", []):
+            table[alias.lower()] = app["package"]
+    return table
+
+
+_NAMES = _lookup_table()
+
+
+def resolve_package(app: str) -> Optional[str]:
+    """App name, alias or package id -> package id (None if unknown)."""
+    if not app:
+        return None
+    key = app.strip().lower()
+    if key in _NAMES:
+        return _NAMES[key]
+    if PACKAGE_PATTERN.match(app.strip()):
+        return app.strip()
+    return None
+
+
+def app_name_of(package: str) -> str:
+    for name, app in APPS.items():
+        if app["package"] == package:
+            return name
+    return package
+
+
+class AppInfo:
+    """Install state, version and launcher activity of one package on one device."""
+
+    __slots__ = ("package", "installed", "version_code", "version_name", "activity", "resolved_at")
+
+    def __init__(self, package: str, installed: bool = False, version_code: str = "", version_name: str = "",
+                 activity: Optional[str] = None):
+        self.package = package
+        self.installed = installed
+        self.version_code = version_code
+        self.version_name = version_name
+        self.activity = activity
+        self.resolved_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {"package": self.package, "app": app_name_of(self.package), "installed": self.installed,
+                "version_code": self.version_code, "version_name": self.version_name, "activity": self.activity}
+
+
+class AppRegistry:
+    """
+    Per-device cache of AppInfo.
+    Every lookup re-reads the version (one grep'd dumpsys on the persistent shell); the launcher
+    activity is only re-resolved when the package is new to us or its version changed.
+    """
+
+    def __init__(self):
+        self._cache: Dict[str, Dict[str, AppInfo]] = {}
+        self.resolves = 0
+        self.invalidations = 0
+
+    async def _version(self, adb: AdbTransport, package: str):
+        res = await adb.run(f"dumpsys package {package} | grep -m2 -E 'versionCode=|versionName='")
+        code = re.search(r"versionCode=(\d+)", res.output)
+        name = re.search(r"versionName=(\S+)", res.output)
+        return (code.group(1) if code else ""), (name.group(1) if name else "")
+
+    async def _resolve_activity(self, adb: AdbTransport, package: str) -> Optional[str]:
+        res = await adb.run(f"cmd package resolve-activity --brief -c android.intent.category.LAUNCHER {package}")
+        for line in reversed(res.output.splitlines()):
+            line = line.strip()
+            if "/" in line and line.startswith(package):
+                return line
+        return None
+
+    async def info(self, serial: Optional[str], app: str) -> Optional[AppInfo]:
+        package = resolve_package(app)
+        if not package:
+            print(f"[AppRegistry] Unknown app '{app}'.")
+            return None
+        adb = AdbTransport.for_device(serial)
+        device_cache = self._cache.setdefault(serial or "default", {})
+        version_code, version_name = await self._version(adb, package)
+        installed = bool(version_code or version_name)
+
+        cached = device_cache.get(package)
+        if cached and cached.installed == installed and cached.version_code == version_code:
+            return cached
+        if cached:
+            self.invalidations += 1
+            print(f"[AppRegistry] {package} changed on {serial or 'default'} "
+                  f"({cached.version_code or 'absent'} -> {version_code or 'absent'}). Re-resolving.")
+
+        activity = await self._resolve_activity(adb, package) if installed else None
+        self.resolves += 1
+        info = AppInfo(package, installed, version_code, version_name, activity)
+        device_cache[package] = info
+        # Keep the pool's package list (used for placement) in step with what we just saw.
+        profile = get_device_pool().profiles.get(serial) if serial else None
+        if profile:
+            (profile.packages.add if installed else profile.packages.discard)(package)
+        return info
+
+    async def is_installed(self, serial: Optional[str], app: str) -> bool:
+        info = await self.info(serial, app)
+        return bool(info and info.installed)
+
+    async def launch(self, serial: Optional[str], app: str) -> bool:
+        """Starts the app's launcher activity directly (`am start -n`), no icon hunting."""
+        info = await self.info(serial, app)
+        if not info or not info.installed:
+            print(f"[AppRegistry] '{app}' is not installed on {serial or 'default'}.")
+            return False
+        adb = AdbTransport.for_device(serial)
+        if info.activity:
+            res = await adb.run(f"am start -n {info.activity}")
+            if res.ok and "Error" not in res.output:
+                print(f"[AppRegistry] 🚀 Launched {app_name_of(info.package)} ({info.activity}).")
+                return True
+            # Activity no longer exists (e.g. renamed in an update we raced with): forget it.
+            self.invalidate(serial, info.package)
+        res = await adb.run(f"monkey -p {info.package} -c android.intent.category.LAUNCHER 1")
+        return res.ok
+
+    def invalidate(self, serial: Optional[str], package: Optional[str] = None):
+        device_cache = self._cache.get(serial or "default", {})
+        if package:
+            device_cache.pop(package, None)
+        else:
+            device_cache.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "devices": {s: [i.to_dict() for i in apps.values()] for s, apps in self._cache.items()},
+            "resolves": self.resolves,
+            "invalidations": self.invalidations,
+        }
+
+
+_registry: Optional[AppRegistry] = None
+
+
+def get_app_registry() -> AppRegistry:
+    """Process-wide app registry shared by every agent."""
+    global _registry
+    if _registry is None:
+        _registry = AppRegistry()
+    return _registry
@@ -0,0 +1,145 @@
+import os
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class ChatSession:
+    """One conversation: the live chat object plus a plain copy of its turns (for trimming/persisting)."""
+
+    def __init__(self, session_id: str, history: Optional[List[Dict[str, Any]]] = None):
+        self.session_id = session_id
+        self.history: List[Dict[str, Any]] = list(history or [])
+        self.chat = None            # built lazily by ChatSessionStore.chat_for
+        self.last_used = time.time()
+        self.lock = asyncio.Lock()  # one turn at a time per session
+
+    def add_turn(self, user_text: str, model_text: str):
+        self.history.append({"role": "user", "parts": [user_text]})
+        self.history.append({"role": "model", "parts": [model_text]})
+
+
+class ChatSessionStore:
+    """
+    Bounded store of chat sessions.
+    - Keeps at most CHAT_MAX_SESSIONS live sessions (least recently used evicted first).
+    - Sessions idle for CHAT_SESSION_TTL seconds are dropped.
+    - History is capped at CHAT_MAX_TURNS turns, so per-turn prompt size stops growing.
+    - With CHAT_SESSION_DIR set, evicted sessions are written to disk and restored on their next
+      message (one JSON file per session, swapped in atomically).
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl: Optional[float] = None,
+                 max_turns: Optional[int] = None, state_dir: Optional[str] = None):
+        self.max_sessions = max_sessions or int(os.getenv("CHAT_MAX_SESSIONS", "200"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("CHAT_SESSION_TTL", "3600"))
+        self.max_turns = max_turns or int(os.getenv("CHAT_MAX_TURNS", "20"))
+        self.state_dir = state_dir if state_dir is not None else os.getenv("CHAT_SESSION_DIR") or None
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self.stats_data = {"created": 0, "restored": 0, "evicted_lru": 0, "expired": 0, "trimmed": 0}
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # --- Persistent tier ---
+
+    def _path(self, session_id: str) -> str:
+        safe = "".join(c for c in session_id if c.isalnum() or c in "-_")
+        return os.path.join(self.state_dir, f"{safe}.json")
+
+    def _spill(self, session: ChatSession):
+        if not self.state_dir or not session.history:
+            return
+        try:
+            tmp = self._path(session.session_id) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"session_id": session.session_id, "last_used": session.last_used,
+                           "history": session.history}, f)
+            os.replace(tmp, self._path(session.session_id))
+        except Exception as e:
+            print(f"[ChatSessions] Could not persist session {session.session_id}: {e}")
+
+    def _restore(self, session_id: str) -> Optional[ChatSession]:
+        if not self.state_dir:
+            return None
+        try:
+            with open(self._path(session_id), encoding="utf-8") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[ChatSessions] Could not read session {session_id}: {e}")
+            return None
+        if state.get("last_used", 0) + self.ttl < time.time():
+            return None
+        return ChatSession(session_id, state.get("history"))
+
+    # --- Live tier ---
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[session_id]
+            self.stats_data["expired"] += 1
+
+    def get(self, session_id: str) -> ChatSession:
+        """Live session for `session_id` (restored from disk or created new if needed)."""
+        self._expire()
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._restore(session_id)
+            if session:
+                self.stats_data["restored"] += 1
+            else:
+                session = ChatSession(session_id)
+                self.stats_data["created"] += 1
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                _, evicted = self._sessions.popitem(last=False)
+                self._spill(evicted)
+                self.stats_data["evicted_lru"] += 1
+        self._sessions.move_to_end(session_id)
+        session.last_used = time.time()
+        return session
+
+    def chat_for(self, session: ChatSession, start_chat: Callable[[List[Dict[str, Any]]], Any]):
+        """
+        The session's live chat object. It is only (re)built from history when the session is new,
+        restored, or its history was trimmed back to CHAT_MAX_TURNS.
+        """
+        if len(session.history) > 2 * self.max_turns:
+            # Trim to half the cap so a rebuild happens every max_turns/2 turns, not on every turn
+            keep = max(1, self.max_turns // 2) * 2
+            session.history = session.history[-keep:]
+            session.chat = None
+            self.stats_data["trimmed"] += 1
+        if session.chat is None:
+            session.chat = start_chat(session.history)
+        return session.chat
+
+    def flush(self):
+        """Writes every live session to the persistent tier (on shutdown)."""
+        for session in self._sessions.values():
+            self._spill(session)
+
+    def drop(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        if self.state_dir:
+            try:
+                os.remove(self._path(session_id))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.stats_data, "live": len(self._sessions), "max_sessions": self.max_sessions,
+                "ttl_s": self.ttl, "max_turns": self.max_turns, "persistent": bool(self.state_dir)}
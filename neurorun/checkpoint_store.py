@@ -0,0 +1,64 @@
+import os
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+
+class CheckpointStore:
+    """
+    Durable state of long-running runs: one JSON file per run under COORDINATION_STATE_DIR.
+    Writes go to a temp file first and are swapped in with os.replace, so a crash mid-save
+    leaves the previous checkpoint intact.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("COORDINATION_STATE_DIR", "coordination_state")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, run_id: str) -> str:
+        safe = "".join(c for c in run_id if c.isalnum() or c in "-_")
+        return os.path.join(self.directory, f"{safe}.json")
+
+    def save(self, run_id: str, state: Dict[str, Any]):
+        state["updated_at"] = time.time()
+        tmp = self._path(run_id) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, default=str)
+        os.replace(tmp, self._path(run_id))
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(run_id), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[Checkpoint] Could not read run {run_id}: {e}")
+            return None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Every stored run, newest first."""
+        runs = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                state = self.load(name[:-5])
+                if state:
+                    runs.append(state)
+        return sorted(runs, key=lambda s: s.get("updated_at", 0), reverse=True)
+
+    def delete(self, run_id: str) -> bool:
+        try:
+            os.remove(self._path(run_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+
+_store: Optional[CheckpointStore] = None
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    global _store
+    if _store is None:
+        _store = CheckpointStore()
+    return _store
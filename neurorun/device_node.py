@@ -0,0 +1,148 @@
+"""
+Device node: exposes the phones plugged into this host to a remote coordinator.
+
+Each USB device is switched to adb-over-TCP and advertised by its Wi-Fi endpoint
+(`ip:port`); the coordinator `adb connect`s to it and from then on drives it like a
+local phone. A tiny JSON status endpoint (stdlib only, no web framework needed on
+worker hosts) reports the devices, their health and the host load.
+
+    python -m neurorun.device_node --node-id lab-1 --port 8101
+    python -m neurorun.device_node --node-id sim-a --port 8101 --simulate 2   # no phones needed
+"""
+import os
+import re
+import json
+import time
+import argparse
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+TCP_BASE_PORT = 5555
+
+
+def _adb(*args, timeout: float = 10) -> str:
+    try:
+        out = subprocess.run(["adb", *args], capture_output=True, text=True, timeout=timeout)
+        return out.stdout.strip()
+    except (subprocess.TimeoutExpired, FileNotFoundError) as e:
+        return f"error: {e}"
+
+
+class DeviceNode:
+    """Tracks the devices attached to this host and keeps them reachable over TCP."""
+
+    def __init__(self, node_id: str, simulate: int = 0, refresh_interval: float = 15.0):
+        self.node_id = node_id
+        self.simulate = simulate
+        self.refresh_interval = refresh_interval
+        self.started = time.time()
+        self.devices: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _usb_serials(self) -> List[str]:
+        serials = []
+        for line in _adb("devices").splitlines()[1:]:
+            parts = line.split()
+            # Skip TCP entries (ip:port): those are what we advertise, not what we own.
+            if len(parts) >= 2 and parts[1] == "device" and ":" not in parts[0]:
+                serials.append(parts[0])
+        return serials
+
+    def _expose(self, serial: str, port: int) -> dict:
+        """Switches one phone to adb-over-TCP and returns its advertised record."""
+        route = _adb("-s", serial, "shell", "ip", "-f", "inet", "addr", "show", "wlan0")
+        match = re.search(r"inet (\d+\.\d+\.\d+\.\d+)", route)
+        if not match:
+            return {"serial": serial, "endpoint": None, "state": "no_wifi"}
+        _adb("-s", serial, "tcpip", str(port))
+        return {"serial": serial, "endpoint": f"{match.group(1)}:{port}", "state": "device"}
+
+    def refresh(self):
+        if self.simulate:
+            with self._lock:
+                for i in range(self.simulate):
+                    serial = f"{self.node_id}-sim{i}"
+                    self.devices.setdefault(serial, {
+                        "serial": serial, "endpoint": serial, "state": "device", "simulated": True,
+                        "profile": {"model": "SimPhone", "width": 1080, "height": 2400, "density": 420,
+                                    "android_version": "14", "sdk": 34, "packages": []},
+                    })
+            return
+
+        serials = self._usb_serials()
+        with self._lock:
+            known = dict(self.devices)
+        for i, serial in enumerate(sorted(serials)):
+            record = known.get(serial)
+            if not record or record["state"] != "device":
+                record = self._expose(serial, TCP_BASE_PORT + i)
+                print(f"[DeviceNode] {serial} -> {record['endpoint'] or record['state']}")
+            else:
+                healthy = _adb("-s", serial, "shell", "echo", "ok", timeout=5) == "ok"
+                record["state"] = "device" if healthy else "unresponsive"
+            known[serial] = record
+        for serial in list(known):
+            if serial not in serials:
+                known[serial]["state"] = "detached"
+        with self._lock:
+            self.devices = known
+
+    def status(self) -> dict:
+        with self._lock:
+            devices = [dict(d) for d in self.devices.values()]
+        return {
+            "node_id": self.node_id,
+            "simulated": bool(self.simulate),
+            "devices": devices,
+            "load": os.getloadavg()[0] if hasattr(os, "getloadavg") else 0.0,
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    def run_refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[DeviceNode] Refresh failed: {e}")
+
+
+def make_handler(node: DeviceNode):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/node/status":
+                self.send_error(404)
+                return
+            body = json.dumps(node.status()).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # status is polled every few seconds; keep the console quiet
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expose this host's Android devices to a TrioAgent coordinator")
+    parser.add_argument("--node-id", default=os.uname().nodename if hasattr(os, "uname") else "node")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--simulate", type=int, default=0, help="Advertise N fake devices (no adb needed)")
+    args = parser.parse_args()
+
+    node = DeviceNode(args.node_id, simulate=args.simulate)
+    node.refresh()
+    threading.Thread(target=node.run_refresh_loop, daemon=True).start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(node))
+    print(f"[DeviceNode] '{args.node_id}' serving {len(node.devices)} device(s) on {args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
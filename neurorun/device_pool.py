@@ -0,0 +1,355 @@
+import os
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Set
+
+from neurorun.adb_transport import AdbTransport
+from neurorun.node_coordinator import NodeCoordinator
+
+PROFILE_COMMANDS = [
+    "wm size",
+    "wm density",
+    "getprop ro.build.version.release",
+    "getprop ro.build.version.sdk",
+    "getprop ro.product.model",
+    "pm list packages",
+]
+
+
+class NoDeviceAvailable(RuntimeError):
+    pass
+
+
+def _override_or_physical(output: str) -> str:
+    """`wm size` / `wm density` print a Physical line and, if set, an Override line that wins."""
+    value = ""
+    for line in output.splitlines():
+        if ":" not in line:
+            continue
+        label, _, v = line.partition(":")
+        if label.strip().startswith("Override") or not value:
+            value = v.strip()
+    return value
+
+
+class DeviceProfile:
+    """Static facts about one device, collected once per discovery instead of on every connect."""
+
+    def __init__(self, serial: str):
+        self.serial = serial
+        self.width = 1080
+        self.height = 2400
+        self.density = 0
+        self.android_version = ""
+        self.sdk = 0
+        self.model = ""
+        self.packages: Set[str] = set()
+        self.profiled_at = 0.0
+        self.node = "local"       # node_id of the remote host serving this device
+        self.simulated = False    # advertised by a simulated node: placement only, no adb
+
+    @classmethod
+    def from_advertised(cls, serial: str, node: str, data: dict) -> "DeviceProfile":
+        """Profile reported by a simulated node (there is no device to probe)."""
+        profile = cls(serial)
+        for key in ("width", "height", "density", "android_version", "sdk", "model"):
+            if key in data:
+                setattr(profile, key, data[key])
+        profile.packages = set(data.get("packages", []))
+        profile.node = node
+        profile.simulated = True
+        profile.profiled_at = time.time()
+        return profile
+
+    @classmethod
+    async def probe(cls, serial: str) -> "DeviceProfile":
+        profile = cls(serial)
+        size, density, release, sdk, model, packages = await AdbTransport.for_device(serial).run_many(PROFILE_COMMANDS)
+        try:
+            w, h = _override_or_physical(size.output).split("x")
+            profile.width, profile.height = int(w), int(h)
+        except ValueError:
+            print(f"[DevicePool] Could not read resolution of {serial}: {size.output[:60]!r}")
+        try:
+            profile.density = int(_override_or_physical(density.output))
+        except ValueError:
+            pass
+        profile.android_version = release.output.strip()
+        profile.sdk = int(sdk.output.strip()) if sdk.output.strip().isdigit() else 0
+        profile.model = model.output.strip()
+        profile.packages = {line.split(":", 1)[1].strip() for line in packages.output.splitlines()
+                            if line.startswith("package:")}
+        profile.profiled_at = time.time()
+        return profile
+
+    def has_package(self, package: str) -> bool:
+        return package in self.packages
+
+    def to_dict(self) -> dict:
+        return {
+            "serial": self.serial, "width": self.width, "height": self.height, "density": self.density,
+            "android_version": self.android_version, "sdk": self.sdk, "model": self.model,
+            "packages": len(self.packages), "node": self.node, "simulated": self.simulated,
+        }
+
+
+class DeviceLease:
+    """
+    Exclusive use of one device by one owner until released.
+    A heartbeat renews the lease while the task that acquired it is alive, so long agent runs keep
+    their phone; once that task is gone the pool reclaims the device.
+    """
+
+    def __init__(self, profile: DeviceProfile, owner: str, ttl: float):
+        self.profile = profile
+        self.owner = owner
+        self.acquired_at = time.time()
+        self.expires_at = self.acquired_at + ttl
+        self.ttl = ttl
+        self.task: Optional[asyncio.Task] = asyncio.current_task()
+        self.heartbeat: Optional[asyncio.Task] = None
+
+    @property
+    def serial(self) -> str:
+        return self.profile.serial
+
+    @property
+    def adb(self) -> AdbTransport:
+        return AdbTransport.for_device(self.serial)
+
+    def renew(self):
+        self.expires_at = time.time() + self.ttl
+
+    @property
+    def abandoned(self) -> bool:
+        """The acquiring task finished without releasing (crashed or leaked the lease)."""
+        return self.task is not None and self.task.done()
+
+    def to_dict(self) -> dict:
+        return {"serial": self.serial, "owner": self.owner,
+                "held_s": round(time.time() - self.acquired_at, 1),
+                "expires_in_s": round(self.expires_at - time.time(), 1)}
+
+
+class DevicePool:
+    """
+    Registry of attached devices with exclusive leasing.
+    - Discovers devices with `adb devices` and profiles each one once.
+    - Hands out one lease per device; other callers wait for a free device.
+    - Health-checks a device before leasing it; failing devices sit out for a while.
+    - Leases are renewed while their task runs; a lease whose task finished without releasing it
+      is reclaimed at once. DEVICE_LEASE_TTL is the renewal window (a backstop if the heartbeat stops).
+    - With DEVICE_NODES set, phones on remote device nodes join the pool (see node_coordinator.py)
+      and placement prefers the least loaded, lowest latency node.
+    """
+
+    def __init__(self, lease_ttl: float = None, acquire_timeout: float = None):
+        self.lease_ttl = lease_ttl or float(os.getenv("DEVICE_LEASE_TTL", "900"))
+        self.acquire_timeout = acquire_timeout or float(os.getenv("DEVICE_ACQUIRE_TIMEOUT", "300"))
+        self.discovery_interval = 10.0
+        self.unhealthy_cooldown = 30.0
+        self.profiles: Dict[str, DeviceProfile] = {}
+        self.leases: Dict[str, DeviceLease] = {}
+        self._unhealthy: Dict[str, float] = {}
+        self._last_discovery = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+        self.coordinator: Optional[NodeCoordinator] = NodeCoordinator.from_env()
+
+    @property
+    def cond(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    # --- Discovery ---
+
+    async def _attached_serials(self) -> List[str]:
+        proc = await asyncio.create_subprocess_exec(
+            "adb", "devices", stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+        out, _ = await proc.communicate()
+        serials = []
+        for line in out.decode(errors="replace").splitlines()[1:]:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1] == "device":
+                serials.append(parts[0])
+        return serials
+
+    async def discover(self, force: bool = False) -> List[DeviceProfile]:
+        """Refreshes the device list (rate limited) and profiles newly attached devices."""
+        if not force and self.profiles and time.time() - self._last_discovery < self.discovery_interval:
+            return list(self.profiles.values())
+        self._last_discovery = time.time()
+        remote = {}
+        if self.coordinator:
+            await self.coordinator.poll(force=True)
+            remote = self.coordinator.remote_devices()
+        try:
+            serials = await self._attached_serials()
+        except Exception as e:
+            print(f"[DevicePool] adb devices failed: {e}")
+            serials = []
+
+        for serial in list(self.profiles):
+            if serial not in serials and serial not in remote:
+                print(f"[DevicePool] {serial} detached.")
+                del self.profiles[serial]
+        for serial in serials:
+            if serial not in self.profiles:
+                try:
+                    p = await DeviceProfile.probe(serial)
+                    if serial in remote:
+                        p.node = remote[serial][0].node_id
+                    self.profiles[serial] = p
+                    print(f"[DevicePool] 📱 {serial} ({p.node}): {p.model} Android {p.android_version} "
+                          f"{p.width}x{p.height} @{p.density}dpi, {len(p.packages)} packages")
+                except Exception as e:
+                    print(f"[DevicePool] Profiling {serial} failed: {e}")
+        for serial, (node, device) in remote.items():
+            if device.get("simulated") and serial not in self.profiles:
+                self.profiles[serial] = DeviceProfile.from_advertised(serial, node.node_id, device.get("profile", {}))
+                print(f"[DevicePool] 📱 {serial} ({node.node_id}, simulated)")
+        return list(self.profiles.values())
+
+    async def refresh_profile(self, serial: str) -> Optional[DeviceProfile]:
+        """Re-probe one device (e.g. after installing or updating an app)."""
+        if serial in self.profiles:
+            self.profiles[serial] = await DeviceProfile.probe(serial)
+        return self.profiles.get(serial)
+
+    async def health_check(self, serial: str) -> bool:
+        profile = self.profiles.get(serial)
+        if profile and profile.simulated:
+            healthy = self.coordinator is not None and self.coordinator.device_healthy(serial)
+            if not healthy:
+                self._unhealthy[serial] = time.time()
+            return healthy
+        res = await AdbTransport.for_device(serial).run("echo ok", timeout=5)
+        healthy = res.ok and "ok" in res.output
+        if not healthy:
+            print(f"[DevicePool] ⚠️ {serial} failed health check ({res.output[:60]!r}).")
+            await AdbTransport.for_device(serial).close()
+            self._unhealthy[serial] = time.time()
+        else:
+            self._unhealthy.pop(serial, None)
+        return healthy
+
+    # --- Leasing ---
+
+    def _reclaim_expired(self):
+        now = time.time()
+        for serial, lease in list(self.leases.items()):
+            if lease.abandoned or lease.expires_at < now:
+                why = "was abandoned" if lease.abandoned else "expired"
+                print(f"[DevicePool] Lease on {serial} held by '{lease.owner}' {why}. Reclaiming.")
+                self._drop(lease)
+
+    def _drop(self, lease: DeviceLease):
+        if self.leases.get(lease.serial) is lease:
+            del self.leases[lease.serial]
+        if lease.heartbeat and lease.heartbeat is not asyncio.current_task():
+            lease.heartbeat.cancel()
+
+    async def _keep_alive(self, lease: DeviceLease):
+        """Renews `lease` every third of its TTL until it is released or its task ends."""
+        while self.leases.get(lease.serial) is lease and not lease.abandoned:
+            lease.renew()
+            await asyncio.sleep(max(1.0, lease.ttl / 3))
+
+    def _candidates(self, serial: Optional[str], package: Optional[str],
+                    allow_simulated: bool = False) -> List[DeviceProfile]:
+        now = time.time()
+        free = [p for p in self.profiles.values()
+                if p.serial not in self.leases
+                and (allow_simulated or not p.simulated)
+                and now - self._unhealthy.get(p.serial, 0) > self.unhealthy_cooldown
+                and (serial is None or p.serial == serial)]
+        busy_nodes: Dict[str, int] = {}
+        for lease in self.leases.values():
+            busy_nodes[lease.profile.node] = busy_nodes.get(lease.profile.node, 0) + 1
+
+        def placement(p: DeviceProfile):
+            node = self.coordinator.node_of(p.serial) if self.coordinator and p.node != "local" else None
+            # Devices that already have the app installed go first, then the least busy / closest node.
+            return (bool(package) and not p.has_package(package),
+                    busy_nodes.get(p.node, 0),
+                    node.latency_ms if node else 0.0)
+
+        return sorted(free, key=placement)
+
+    async def acquire(self, owner: str, serial: Optional[str] = None, package: Optional[str] = None,
+                      timeout: Optional[float] = None, allow_simulated: bool = False) -> DeviceLease:
+        """
+        Waits for a free, healthy device and leases it to `owner`.
+        Devices of simulated nodes have no adb behind them, so only callers that only exercise
+        placement pass allow_simulated=True.
+        """
+        deadline = time.time() + (timeout if timeout is not None else self.acquire_timeout)
+        async with self.cond:
+            while True:
+                self._reclaim_expired()
+                await self.discover()
+                if not self.profiles:
+                    raise NoDeviceAvailable("No Android device attached (adb devices is empty)")
+                if not any(allow_simulated or not p.simulated for p in self.profiles.values()):
+                    raise NoDeviceAvailable("Only simulated devices are attached (placement only, no adb)")
+                if serial and serial not in self.profiles:
+                    raise NoDeviceAvailable(f"Device {serial} is not attached")
+                if serial and self.profiles[serial].simulated and not allow_simulated:
+                    raise NoDeviceAvailable(f"Device {serial} is simulated (placement only)")
+
+                for profile in self._candidates(serial, package, allow_simulated):
+                    if await self.health_check(profile.serial):
+                        lease = DeviceLease(profile, owner, self.lease_ttl)
+                        self.leases[profile.serial] = lease
+                        lease.heartbeat = asyncio.create_task(self._keep_alive(lease))
+                        print(f"[DevicePool] 🔒 {profile.serial} ({profile.node}) leased to '{owner}'.")
+                        return lease
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    busy = ", ".join(f"{s}->{l.owner}" for s, l in self.leases.items()) or "none leased"
+                    raise NoDeviceAvailable(f"No free device for '{owner}' ({busy})")
+                print(f"[DevicePool] '{owner}' waiting for a free device...")
+                try:
+                    await asyncio.wait_for(self.cond.wait(), timeout=min(remaining, self.discovery_interval))
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, lease: DeviceLease):
+        async with self.cond:
+            if self.leases.get(lease.serial) is lease:
+                print(f"[DevicePool] 🔓 {lease.serial} released by '{lease.owner}'.")
+            self._drop(lease)
+            self.cond.notify_all()
+
+    @asynccontextmanager
+    async def lease(self, owner: str, serial: Optional[str] = None, package: Optional[str] = None,
+                    timeout: Optional[float] = None, allow_simulated: bool = False):
+        """`async with pool.lease("commerce") as device:` - released even if the task fails."""
+        lease = await self.acquire(owner, serial=serial, package=package, timeout=timeout,
+                                   allow_simulated=allow_simulated)
+        try:
+            yield lease
+        finally:
+            await self.release(lease)
+
+    def stats(self) -> dict:
+        return {
+            "devices": [p.to_dict() for p in self.profiles.values()],
+            "leases": [l.to_dict() for l in self.leases.values()],
+            "unhealthy": sorted(s for s, t in self._unhealthy.items() if time.time() - t <= self.unhealthy_cooldown),
+            "lease_ttl_s": self.lease_ttl,
+            "nodes": self.coordinator.stats() if self.coordinator else [],
+        }
+
+
+_pool: Optional[DevicePool] = None
+
+
+def get_device_pool() -> DevicePool:
+    """Process-wide device pool shared by every agent and the orchestrator."""
+    global _pool
+    if _pool is None:
+        _pool = DevicePool()
+    return _pool
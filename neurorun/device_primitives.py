@@ -0,0 +1,133 @@
+import re
+import time
+import shlex
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+
+from neurorun.adb_transport import AdbTransport
+from neurorun.app_registry import get_app_registry, resolve_package
+
+KEYCODE_HOME = 3
+KEYCODE_BACK = 4
+PRIMITIVES = ("home", "back", "launch_app", "open_url", "force_stop", "clear_app", "wait_for_activity")
+
+# Goals that need exactly one deterministic action. Only short, single-step goals match;
+# anything else still goes to the model.
+_NAME = r"['\"]?(?P<app>[\w .|&/-]+?)['\"]?(?: app)?"
+GOAL_PATTERNS = [
+    ("home", re.compile(r"^(?:press|tap|go|navigate|return)?\s*(?:to )?(?:the )?(?:system )?home(?: screen| button)?$", re.I)),
+    ("back", re.compile(r"^(?:press|tap|go)?\s*(?:the )?back(?: button)?$", re.I)),
+    ("open_url", re.compile(r"^(?:open|go to|navigate to|visit)\s+(?:the )?(?:url |link )?['\"]?(?P<url>https?://\S+?)['\"]?$", re.I)),
+    ("force_stop", re.compile(r"^(?:force[- ]stop|close|kill)\s+(?:the app\s+)?" + _NAME + r"$", re.I)),
+    ("launch_app", re.compile(r"^(?:open|launch|start)\s+(?:the app\s+)?" + _NAME + r"$", re.I)),
+]
+
+
+def match_goal(goal: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """(primitive, kwargs) when a natural-language goal is just one trivial action, else None."""
+    text = " ".join(goal.strip().rstrip(".!").split())
+    if not text or len(text.split()) > 8:
+        return None
+    for name, pattern in GOAL_PATTERNS:
+        m = pattern.match(text)
+        if not m:
+            continue
+        kwargs = m.groupdict()
+        # Only apps the registry knows can be launched/stopped without the model.
+        if "app" in kwargs and not resolve_package(kwargs["app"]):
+            return None
+        return name, kwargs
+    return None
+
+
+class DevicePrimitives:
+    """
+    Deterministic ADB actions that never need the model: milliseconds instead of a vision agent run.
+    Every primitive returns {"status", "primitive", "duration_ms", "detail"} like other agent results.
+    """
+
+    def __init__(self, serial: Optional[str] = None):
+        self.serial = serial
+        self.adb = AdbTransport.for_device(serial)
+
+    def _result(self, primitive: str, ok: bool, t0: float, detail: Any = "") -> Dict[str, Any]:
+        ms = (time.perf_counter() - t0) * 1000
+        print(f"   ⚡ [{primitive}] {'ok' if ok else 'failed'} in {ms:.0f}ms {detail if not ok else ''}".rstrip())
+        return {"status": "success" if ok else "failed", "primitive": primitive,
+                "duration_ms": round(ms, 1), "detail": detail}
+
+    async def home(self) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        res = await self.adb.keyevent(KEYCODE_HOME)
+        return self._result("home", res.ok, t0, res.output)
+
+    async def back(self) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        res = await self.adb.keyevent(KEYCODE_BACK)
+        return self._result("back", res.ok, t0, res.output)
+
+    async def launch_app(self, app: str, wait: bool = True) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        ok = await get_app_registry().launch(self.serial, app)
+        if ok and wait:
+            ok = (await self.wait_for_activity(resolve_package(app), timeout=5))["status"] == "success"
+        return self._result("launch_app", ok, t0, app)
+
+    async def open_url(self, url: str, app: Optional[str] = None) -> Dict[str, Any]:
+        """VIEW intent for a URL, optionally pinned to one app's package."""
+        t0 = time.perf_counter()
+        package = resolve_package(app) if app else None
+        cmd = f"am start -a android.intent.action.VIEW -d {shlex.quote(url)}"
+        if package:
+            cmd += f" {package}"
+        res = await self.adb.run(cmd)
+        ok = res.ok and "Error" not in res.output
+        return self._result("open_url", ok, t0, res.output if not ok else url)
+
+    async def force_stop(self, app: str) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        package = resolve_package(app)
+        if not package:
+            return self._result("force_stop", False, t0, f"unknown app {app}")
+        res = await self.adb.run(f"am force-stop {package}")
+        return self._result("force_stop", res.ok, t0, package)
+
+    async def clear_app(self, app: str) -> Dict[str, Any]:
+        """Wipes the app's data (logged-out, first-run state). Destructive: callers opt in explicitly."""
+        t0 = time.perf_counter()
+        package = resolve_package(app)
+        if not package:
+            return self._result("clear_app", False, t0, f"unknown app {app}")
+        res = await self.adb.run(f"pm clear {package}")
+        return self._result("clear_app", res.ok and "Success" in res.output, t0, res.output)
+
+    async def current_activity(self) -> str:
+        """Resumed activity as 'package/.Activity' ('' if unknown)."""
+        res = await self.adb.run("dumpsys activity activities | grep -m1 -E 'mResumedActivity|topResumedActivity'")
+        m = re.search(r"\s([\w.]+/[\w.$]+)", res.output)
+        return m.group(1) if m else ""
+
+    async def wait_for_activity(self, pattern: str, timeout: float = 10.0, interval: float = 0.25) -> Dict[str, Any]:
+        """Polls until the resumed activity contains `pattern` (a package or activity name)."""
+        t0 = time.perf_counter()
+        current = ""
+        while time.perf_counter() - t0 < timeout:
+            current = await self.current_activity()
+            if pattern and pattern in current:
+                return self._result("wait_for_activity", True, t0, current)
+            await asyncio.sleep(interval)
+        return self._result("wait_for_activity", False, t0, f"still on {current or 'unknown'}")
+
+    async def run(self, primitive: str, **kwargs) -> Dict[str, Any]:
+        if primitive not in PRIMITIVES:
+            raise ValueError(f"Unknown primitive: {primitive}")
+        return await getattr(self, primitive)(**kwargs)
+
+    async def run_goal(self, goal: str) -> Optional[Dict[str, Any]]:
+        """Runs the goal as a primitive when it is one; None means the goal needs an agent."""
+        matched = match_goal(goal)
+        if not matched:
+            return None
+        name, kwargs = matched
+        print(f"   ⚡ Goal '{goal}' handled by primitive {name}{kwargs or ''} (no LLM).")
+        return await self.run(name, **kwargs)
@@ -0,0 +1,368 @@
+import re
+import sys
+import json
+import time
+import argparse
+from typing import Any, Dict, List, Optional, Tuple
+
+from neurorun.app_registry import APPS
+
+# Utterances at or above this confidence (and with every required slot) skip the LLM.
+DEFAULT_MIN_CONFIDENCE = 0.8
+
+# --- Gazetteers ---
+# App aliases come from the registry, so a new app there is recognised here too.
+APP_ALIASES: List[Tuple[str, str]] = sorted(
+    ((alias.lower(), name) for name, app in APPS.items() for alias in [name] + app.get("aliases", [])),
+    key=lambda a: -len(a[0]))
+
+INTENT_APPS = {
+    "ride": ["Uber", "Ola"],
+    "food": ["Zomato", "Swiggy"],
+    "medicine": ["PharmEasy", "Apollo 24|7", "Tata 1mg"],
+    "message": ["WhatsApp"],
+    "flight": ["MakeMyTrip"],
+    "hotel": ["MakeMyTrip", "Booking.com"],
+}
+DEFAULT_APP = {intent: apps[0] for intent, apps in INTENT_APPS.items()}
+REQUIRED_SLOTS = {
+    "ride": ["pickup", "drop"],
+    "food": ["item"],
+    "medicine": ["name"],
+    "message": ["contact", "message"],
+    "flight": ["source", "destination", "date"],
+    "hotel": ["city", "date"],
+}
+
+MEDICINES = [
+    "paracetamol", "crocin", "dolo 650", "dolo", "calpol", "combiflam", "metformin", "glycomet", "amlodipine",
+    "telmisartan", "atorvastatin", "rosuvastatin", "pantoprazole", "pan 40", "omeprazole", "rantac", "cetirizine",
+    "allegra", "azithromycin", "amoxicillin", "augmentin", "aspirin", "ecosprin", "thyronorm", "eltroxin",
+    "insulin", "vitamin d", "vitamin c", "b complex", "becosules", "shelcal", "calcium", "ors", "electral",
+    "digene", "eno", "vicks", "benadryl", "volini", "moov", "betadine", "limcee", "zincovit", "losartan",
+]
+RIDE_TYPES = ["prime sedan", "bike taxi", "auto", "bike", "moto", "sedan", "mini", "prime", "suv", "xl", "premier"]
+# An item must name something from this list (plurals included) to be ordered locally: "order flowers"
+# or "get me some water" are not food orders the parser should guess at.
+FOODS = [
+    "pizza", "biryani", "burger", "dosa", "idli", "vada", "sambar", "thali", "paneer", "masala", "curry", "dal",
+    "roti", "naan", "paratha", "chapati", "fried rice", "pulao", "khichdi", "noodles", "momo", "pasta", "sandwich",
+    "wrap", "roll", "shawarma", "kebab", "tikka", "chicken", "mutton", "fish", "chole", "bhature", "poha", "upma",
+    "pav bhaji", "vada pav", "samosa", "pakora", "chaat", "salad", "soup", "cake", "ice cream", "gulab jamun",
+    "rasgulla", "fries", "lassi", "milkshake",
+]
+GENERIC_FOOD = {"food", "something", "something to eat", "some food", "dinner", "lunch", "breakfast", "snacks", "meal"}
+NOT_CONTACTS = {"me", "us", "you", "him", "her", "them", "it", "about", "a", "the"}
+IMMEDIATE = {"now", "right now", "asap", "immediately"}
+
+_i = re.IGNORECASE
+_alt = lambda words: "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+POLITE = re.compile(r"^(?:(?:hey|hi|hello|ok|okay)\s+(?:sanjeevani\s+)?)?(?:please\s+|kindly\s+|can you\s+|could you\s+|would you\s+|i want you to\s+)+", _i)
+QUESTION = re.compile(r"^(?:what|which|how|why|when|where|who|whose|is|are|do|does|did|should|will|was)\b|\?\s*$", _i)
+NEGATION = re.compile(r"\b(?:don'?t|do not|cancel|stop|never|not|no longer|instead)\b", _i)
+POLITE_TAIL = re.compile(r"[\s,]+(?:please|pls|kindly|thanks|thank you)\s*$", _i)
+MULTI = re.compile(r"\b(?:and (?:then|also)|and|also|after that)\s+(?:book|order|send|buy|get|message|call|find)\b", _i)
+
+APP_MENTION = re.compile(r"(?:\s+(?:on|via|using|with|through|from|in)\s+|\s+|^)(?:the\s+)?(" + _alt([a for a, _ in APP_ALIASES]) + r")(?:\s+app)?\b", _i)
+DATE = re.compile(
+    r"\b(?:on\s+|for\s+)?(today|tonight|tomorrow|day after tomorrow|this (?:weekend|\w+day)|next (?:week|\w+day)"
+    r"|\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}(?:/\d{2,4})?"
+    r"|\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*"
+    r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*\s+\d{1,2}(?:st|nd|rd|th)?)\b", _i)
+
+# Trailing "tomorrow" / "in 10 minutes" / "at 5 pm" on a ride: taken off the drop, and the ride is then
+# a scheduled one, which is left to the LLM.
+WHEN_TAIL = re.compile(
+    r"\s+(?:(?:on|for|by|at|around|after|in|within)\s+)?(?P<when>today|tonight|tomorrow(?:\s+(?:morning|afternoon|evening|night))?"
+    r"|day after tomorrow|this (?:morning|afternoon|evening|weekend)|(?:right\s+)?now|asap|immediately"
+    r"|\d+\s*(?:min|mins|minutes?|hours?|hrs?)(?:\s+from now)?|\d{1,2}(?::\d{2})?\s*(?:am|pm|o'?clock)|\d{1,2}:\d{2}"
+    r"|morning|afternoon|evening|night|noon|midnight)\s*$", _i)
+
+# Item phrases the parser will not turn into one search: lists, quantities and orders for someone else.
+ITEM_LIST = re.compile(r"\s(?:and|&|plus|with)\s|,", _i)
+QUANTITY = re.compile(
+    r"\b(?:\d+|one|two|three|four|five|six|seven|eight|nine|ten|dozen|couple|pair|half|few|several)\b"
+    r"|\b(?:strips?|packs?|packets?|bottles?|box|boxes|plates?|pieces?|pcs|units?|kg|grams?|ml|litres?)\b", _i)
+RECIPIENT = re.compile(
+    r"\bfor\s+(?:my|his|her|our|their|your|me|him|us|them|mom|mum|mummy|dad|papa|wife|husband|son|daughter)\b", _i)
+
+RIDE_NOUN = re.compile(r"\b(?:cab|cabs|taxi|ride|auto|rickshaw|bike taxi|" + _alt(["uber", "ola"]) + r")\b", _i)
+RIDE_VERB = re.compile(r"\b(?:book|get|call|need|order|arrange|want|take me|drop me)\b", _i)
+RIDE_TYPE = re.compile(r"\b(" + _alt(RIDE_TYPES) + r")\b", _i)
+FROM_TO = re.compile(r"\bfrom\s+(?P<a>.+?)\s+to\s+(?P<b>.+?)\s*$", _i)
+TO_FROM = re.compile(r"\bto\s+(?P<b>.+?)\s+from\s+(?P<a>.+?)\s*$", _i)
+TO_ONLY = re.compile(r"\b(?:to|till|until)\s+(?P<b>.+?)\s*$", _i)
+
+FOOD_VERB = re.compile(r"^(?:order|get me|get|i want|i'd like|i would like|deliver|bring me|i am craving|i'm craving|send me)\s+(?:to eat\s+)?", _i)
+FOOD_FROM = re.compile(r"\s+from\s+(?P<restaurant>.+?)\s*$", _i)
+FILLER = re.compile(r"^(?:some|a|an|me|the|my)\s+", _i)
+
+MED_NOUN = re.compile(r"\b(?:medicine|medicines|tablet|tablets|syrup|capsules?|pills?|strip|refill|prescription|pharmacy)\b", _i)
+FOOD_NAME = re.compile(r"\b(?:" + _alt(FOODS) + r")(?:e?s)?\b", _i)
+MED_NAME = re.compile(r"\b(" + _alt(MEDICINES) + r")\b", _i)
+MED_VERB = re.compile(r"^(?:buy|order|get|get me|refill|i need|need|reorder|purchase)\s+", _i)
+
+MSG_PATTERNS = [
+    re.compile(r"^send\s+(?:a\s+)?(?:message|msg|text|whatsapp)(?:\s+message)?\s+to\s+(?P<contact>.+?)\s*(?:saying|that|:|,|-)\s*(?P<message>.+)$", _i),
+    re.compile(r"^send\s+['\"](?P<message>.+?)['\"]\s+to\s+(?P<contact>.+?)$", _i),
+    re.compile(r"^(?:message|text|whatsapp|tell|inform|let)\s+(?P<contact>.+?)\s*(?:saying|that|:|,|-|know that)\s*(?P<message>.+)$", _i),
+]
+MSG_LOOSE = re.compile(r"^(?:message|text|whatsapp|tell)\s+(?P<contact>[A-Za-z]+)\s+(?P<message>.{2,})$", _i)
+
+FLIGHT_NOUN = re.compile(r"\b(?:flight|flights|fly|plane|air ticket)\b", _i)
+HOTEL_NOUN = re.compile(r"\b(?:hotel|hotels|room|stay|resort)\b", _i)
+TRAVEL_VERB = re.compile(r"\b(?:book|find|search|get|need|show|look for|fly)\b", _i)
+IN_CITY = re.compile(r"\b(?:in|at|near)\s+(?P<city>.+?)\s*$", _i)
+
+
+def _clean(text: str) -> str:
+    return " ".join(str(text).replace("’", "'").strip().rstrip(".!").split())
+
+
+def _slot(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    value = FILLER.sub("", value.strip(" ,.-"))
+    value = re.sub(r"^(?:the|my)\s+", "", value, flags=_i).strip()
+    return value or None
+
+
+def _find_app(text: str) -> Tuple[Optional[str], str]:
+    """(app name, text without the app mention) using the registry aliases."""
+    m = APP_MENTION.search(text)
+    if not m:
+        return None, text
+    alias = m.group(1).lower()
+    name = next(n for a, n in APP_ALIASES if a == alias)
+    return name, _clean(text[:m.start()] + " " + text[m.end():])
+
+
+def _take_date(text: str) -> Tuple[Optional[str], str]:
+    m = DATE.search(text)
+    if not m:
+        return None, text
+    return m.group(1), _clean(text[:m.start()] + " " + text[m.end():])
+
+
+def _item_defer(item: str) -> Optional[str]:
+    """Why an item phrase needs the LLM (None when it is one plain item)."""
+    if RECIPIENT.search(item):
+        return "ordering for someone else"
+    if ITEM_LIST.search(item):
+        return "several items"
+    if QUANTITY.search(item):
+        return "quantity"
+    return None
+
+
+def _take_when(text: str) -> Tuple[List[str], str]:
+    """(time phrases, text without them): trailing ones ("... tomorrow at 5 pm") and dates anywhere."""
+    found = []
+    m = WHEN_TAIL.search(text)
+    while m:
+        found.insert(0, m.group("when").lower())
+        text = text[:m.start()]
+        m = WHEN_TAIL.search(text)
+    date, text = _take_date(text)
+    if date:
+        found.insert(0, date.lower())
+    return found, text
+
+
+def _ride(text: str, app: Optional[str]) -> Optional[Dict[str, Any]]:
+    if not (RIDE_NOUN.search(text) or app in INTENT_APPS["ride"]) or MED_NAME.search(text):
+        return None
+    slots = {}
+    m = RIDE_TYPE.search(text)
+    if m:
+        slots["type"] = m.group(1).lower()
+    body = re.sub(r"\b(?:by|in)\s+(?:an?\s+)?(?:" + _alt(RIDE_TYPES) + r")\b", "", text, flags=_i)
+    when, body = _take_when(_clean(body))
+    if when:
+        slots["when"] = " ".join(when)
+    m = FROM_TO.search(body) or TO_FROM.search(body)
+    if m:
+        slots["pickup"], slots["drop"] = _slot(m.group("a")), _slot(m.group("b"))
+    else:
+        m = TO_ONLY.search(body)
+        if m:
+            slots["drop"] = _slot(m.group("b"))
+    defer = None
+    if when and not set(when) <= IMMEDIATE:
+        defer = "scheduled ride"
+    elif any(ITEM_LIST.search(slots.get(k) or "") for k in ("pickup", "drop")):
+        defer = "several stops"
+    return {"intent": "ride", "slots": slots, "verb": bool(RIDE_VERB.search(text)), "pattern": "pickup" in slots,
+            "defer": defer}
+
+
+def _medicine(text: str, app: Optional[str]) -> Optional[Dict[str, Any]]:
+    names = [n.group(1).lower() for n in MED_NAME.finditer(text)]
+    if not (names or MED_NOUN.search(text) or app in INTENT_APPS["medicine"]):
+        return None
+    verb = MED_VERB.search(text)
+    # Only gazetteer names are ordered locally; "my bp tablets" needs the LLM to work out what to buy
+    name = ", ".join(dict.fromkeys(names)) if names else None
+    rest = MED_NAME.sub(" ", MED_VERB.sub("", text))
+    return {"intent": "medicine", "slots": {"name": name} if name else {}, "verb": bool(verb), "pattern": bool(names),
+            "defer": _item_defer(rest) or ("several items" if len(set(names)) > 1 else None)}
+
+
+def _food(text: str, app: Optional[str]) -> Optional[Dict[str, Any]]:
+    verb = FOOD_VERB.match(text)
+    if not verb and app not in INTENT_APPS["food"]:
+        return None
+    rest = text[verb.end():] if verb else text
+    slots = {}
+    m = FOOD_FROM.search(rest)
+    if m:
+        slots["restaurant"] = _slot(m.group("restaurant"))
+        rest = rest[:m.start()]
+    item = _slot(rest)
+    if item and item.lower() not in GENERIC_FOOD:
+        if not FOOD_NAME.search(item):
+            return None
+        slots["item"] = item
+    return {"intent": "food", "slots": slots, "verb": bool(verb), "pattern": bool(verb and item),
+            "defer": _item_defer(item or "")}
+
+
+def _message(text: str, app: Optional[str]) -> Optional[Dict[str, Any]]:
+    for pattern in MSG_PATTERNS:
+        m = pattern.match(text)
+        if m:
+            contact = _slot(_find_app(m.group("contact"))[1])  # "Ravi on WhatsApp" -> "Ravi"
+            return {"intent": "message", "slots": {"contact": contact, "message": m.group("message").strip()},
+                    "verb": True, "pattern": True}
+    m = MSG_LOOSE.match(text)
+    if m and m.group("contact").lower() not in NOT_CONTACTS:
+        return {"intent": "message", "slots": {"contact": m.group("contact"), "message": m.group("message").strip()},
+                "verb": True, "pattern": False}
+    return None
+
+
+def _travel(text: str, app: Optional[str]) -> Optional[Dict[str, Any]]:
+    flight, hotel = FLIGHT_NOUN.search(text), HOTEL_NOUN.search(text)
+    if not (flight or hotel) or (flight and hotel):
+        return None
+    date, body = _take_date(text)
+    slots = {"date": date} if date else {}
+    if flight:
+        m = FROM_TO.search(body) or TO_FROM.search(body)
+        if m:
+            slots["source"], slots["destination"] = _slot(m.group("a")), _slot(m.group("b"))
+        else:
+            m = TO_ONLY.search(body)
+            if m:
+                slots["destination"] = _slot(m.group("b"))
+        return {"intent": "flight", "slots": slots, "verb": bool(TRAVEL_VERB.search(text)), "pattern": "source" in slots}
+    m = IN_CITY.search(body)
+    if m:
+        slots["city"] = _slot(m.group("city"))
+    return {"intent": "hotel", "slots": slots, "verb": bool(TRAVEL_VERB.search(text)), "pattern": "city" in slots}
+
+
+# Food is the catch-all ("order X"), so it only counts when no other domain matched.
+MATCHERS = [_travel, _ride, _medicine]
+
+
+def parse_intent(text: str) -> Dict[str, Any]:
+    """
+    Deterministic intent + slot parse of one utterance.
+    Returns {"intent", "app", "slots", "missing", "confidence", "reason"}; intent is None when nothing
+    (or more than one thing) matched, and `reason` is set whenever the utterance should go to the LLM.
+    Callers use it only when `confidence` is high, nothing is missing and there is no reason.
+    """
+    raw = POLITE_TAIL.sub("", _clean(text))
+    text = POLITE.sub("", raw)
+    result = {"intent": None, "app": None, "slots": {}, "missing": [], "confidence": 0.0, "reason": None}
+    if not text:
+        result["reason"] = "empty"
+        return result
+    if QUESTION.search(text) or QUESTION.search(raw):
+        result["reason"] = "question"
+        return result
+    if NEGATION.search(text):
+        result["reason"] = "negation"
+        return result
+    if MULTI.search(text) or len(text.split()) > 30:
+        result["reason"] = "compound"
+        return result
+
+    app, body = _find_app(text)
+    # Messages are matched on the full text: "WhatsApp Priya ..." names the app and the verb at once
+    matches = [m for m in [_message(text, app)] + [matcher(body, app) for matcher in MATCHERS] if m]
+    if not matches:
+        food = _food(body, app)
+        matches = [food] if food else []
+    if not matches:
+        result["reason"] = "no_match"
+        return result
+    best = matches[0]
+    if len(matches) > 1 and not (best["pattern"] and not any(m["pattern"] for m in matches[1:])):
+        result["reason"] = "ambiguous: " + "/".join(m["intent"] for m in matches)
+        return result
+
+    intent = best["intent"]
+    if app and app not in INTENT_APPS[intent]:
+        result["reason"] = f"{app} cannot do {intent}"
+        return result
+    slots = {k: v for k, v in best["slots"].items() if v}
+    confidence = 0.6 + (0.25 if best["verb"] else 0.0) + (0.15 if best["pattern"] else 0.0)
+    result.update(intent=intent, app=app or DEFAULT_APP[intent], slots=slots, confidence=round(confidence, 2),
+                  missing=[s for s in REQUIRED_SLOTS[intent] if s not in slots], reason=best.get("defer"))
+    return result
+
+
+def to_action(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """The same execute block the LLM would have produced for this intent."""
+    s, app = parsed["slots"], parsed["app"]
+    intent = parsed["intent"]
+    if intent == "ride":
+        kind = s.get("type", "cab")
+        instruction = f"Open {app} and book a {kind} ride from '{s['pickup']}' to '{s['drop']}'. Confirm the booking."
+        speak = f"Okay, I am booking a {kind} from {s['pickup']} to {s['drop']} on {app}."
+    elif intent == "food":
+        where = f" from '{s['restaurant']}'" if s.get("restaurant") else ""
+        instruction = f"Open {app}, search for '{s['item']}'{where}, add it to the cart and place the order."
+        speak = f"Okay, I am ordering {s['item']} for you on {app}."
+    elif intent == "medicine":
+        instruction = f"Open {app}, search for '{s['name']}', add it to the cart and place the order."
+        speak = f"Okay, I am ordering {s['name']} for you on {app}."
+    elif intent == "message":
+        instruction = f"Open {app}, open the chat with '{s['contact']}', type the message '{s['message']}' and send it."
+        speak = f"Okay, I am sending your message to {s['contact']}."
+    elif intent == "flight":
+        instruction = (f"Open {app}, go to Flights, search one-way flights from '{s['source']}' to "
+                       f"'{s['destination']}' on {s['date']} and show the best option.")
+        speak = f"Okay, I am looking for flights from {s['source']} to {s['destination']} for {s['date']}."
+    else:
+        instruction = f"Open {app}, go to Hotels, search hotels in '{s['city']}' for check-in {s['date']} and show the best option."
+        speak = f"Okay, I am looking for hotels in {s['city']} for {s['date']}."
+    return {"type": "execute", "app": app, "instruction": instruction, "speak": speak, "source": "local"}
+
+
+def fast_path(text: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE) -> Optional[Dict[str, Any]]:
+    """Execute block for a clear, complete command; None means 'ask the LLM'."""
+    parsed = parse_intent(text)
+    if parsed["intent"] and not (parsed["missing"] or parsed["reason"]) and parsed["confidence"] >= min_confidence:
+        return to_action(parsed)
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local intent parser (no LLM)")
+    parser.add_argument("utterance", nargs="+")
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    parsed = parse_intent(" ".join(args.utterance))
+    parsed["parse_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    print(json.dumps(parsed, indent=2, ensure_ascii=False))
+    action = fast_path(" ".join(args.utterance))
+    print(json.dumps(action, indent=2, ensure_ascii=False) if action else "-> deferred to LLM")
+    return 0 if action else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
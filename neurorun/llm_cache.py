@@ -0,0 +1,199 @@
+import os
+import re
+import json
+import time
+import hashlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from neurorun.screen_cache import STATUS_BAR
+
+# Per-call-site policy: ttl in seconds, cacheable flag.
+# Anything not listed here is never cached.
+CACHE_POLICIES: Dict[str, Dict[str, Any]] = {
+    # same goal + same screen -> same next action; a finishing step ("done" + extracted data) is never replayed
+    "planner": {"ttl": 15 * 60, "cacheable": True, "skip_terminal": True},
+    "planner_replan": {"ttl": 0, "cacheable": False},       # re-plan after a no-op: the cached step just failed
+    "itinerary": {"ttl": 24 * 60 * 60, "cacheable": True},  # same hotel + interests + days
+    "general_chat": {"ttl": 0, "cacheable": False},         # conversational, history dependent
+}
+
+# Steps with side effects are never served from cache, whatever the call site says.
+TRANSACTIONAL = re.compile(
+    r"\b(order|book|booking|checkout|check out|pay|payment|purchase|buy|place order|confirm|send|invite)\b",
+    re.IGNORECASE,
+)
+
+
+class CachedResponse:
+    """Stands in for a Gemini response object when served from cache."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+        self.from_cache = True
+
+
+def _image_digest(item: Any) -> Optional[bytes]:
+    """
+    Digest of the full image. Screens that differ only in text (a price, an OTP, a cart total)
+    must not share a key, so nothing is downscaled or quantized first.
+    """
+    if hasattr(item, "data") and hasattr(item, "mime_type"):          # CapturedFrame
+        return hashlib.sha256(item.data).digest()
+    if isinstance(item, dict) and "mime_type" in item:                 # inline blob
+        return hashlib.sha256(item["data"]).digest()
+    if hasattr(item, "size") and hasattr(item, "tobytes"):             # PIL image
+        h = hashlib.sha256(f"{item.mode}{item.size}".encode())
+        h.update(item.tobytes())
+        return h.digest()
+    return None
+
+
+def screen_digest(frame: Any) -> bytes:
+    """
+    Digest of a screenshot without its status bar (the clock, battery and notification icons change
+    all the time). The rest is hashed pixel for pixel, so a different price still means a different key.
+    """
+    image = frame.image if hasattr(frame, "image") else frame
+    width, height = image.size
+    body = image.crop((0, int(height * STATUS_BAR), width, height))
+    h = hashlib.sha256(f"{body.mode}{body.size}".encode())
+    h.update(body.tobytes())
+    return h.digest()
+
+
+def make_key(model: str, contents: Any) -> str:
+    h = hashlib.sha256(model.encode())
+    items = contents if isinstance(contents, (list, tuple)) else [contents]
+    for item in items:
+        if isinstance(item, str):
+            h.update(b"T" + " ".join(item.split()).encode())
+            continue
+        if isinstance(item, bytes):                                    # precomputed digest (screen_digest)
+            h.update(b"B" + item)
+            continue
+        img = _image_digest(item)
+        if img is not None:
+            h.update(b"I" + img)
+        else:
+            h.update(b"O" + json.dumps(item, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def is_transactional(text: str) -> bool:
+    return bool(text and TRANSACTIONAL.search(text))
+
+
+def is_terminal_plan(text: str) -> bool:
+    """True unless the planner reply is a plain 'continue' step without extracted data (or unreadable)."""
+    body = text.strip()
+    if "```" in body:
+        body = body.split("```json")[1] if "```json" in body else body.split("```")[1]
+        body = body.split("```")[0]
+    try:
+        plan = json.loads(body)
+    except (ValueError, IndexError):
+        return True
+    if not isinstance(plan, dict) or plan.get("status") != "continue" or plan.get("data"):
+        return True
+    actions = [plan.get("action")] + list(plan.get("actions") or [])
+    return any(isinstance(a, dict) and (a.get("type") == "done" or a.get("data")) for a in actions)
+
+
+class LLMResponseCache:
+    """
+    Content-addressed cache of LLM response text.
+    Tier 1: in-memory LRU. Tier 2 (optional): one JSON file per key under LLM_CACHE_DIR.
+    """
+
+    def __init__(self, max_entries: int = None, disk_dir: Optional[str] = None):
+        self.max_entries = max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+        self.disk_dir = disk_dir if disk_dir is not None else os.getenv("LLM_CACHE_DIR") or None
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+        self._mem: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.skipped_terminal = 0
+
+    def policy(self, call_site: str) -> Dict[str, Any]:
+        return CACHE_POLICIES.get(call_site, {"ttl": 0, "cacheable": False})
+
+    def should_cache(self, call_site: str, context: str) -> bool:
+        if not self.policy(call_site)["cacheable"]:
+            return False
+        if is_transactional(context):
+            self.skipped += 1
+            return False
+        return True
+
+    def should_store(self, call_site: str, text: str) -> bool:
+        """Response-side check: terminal planner steps are not stored even when the request was cacheable."""
+        if self.policy(call_site).get("skip_terminal") and is_terminal_plan(text):
+            self.skipped_terminal += 1
+            return False
+        return True
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        now = time.time()
+        entry = self._mem.get(key)
+        if entry and entry["expires"] > now:
+            self._mem.move_to_end(key)
+            self.hits += 1
+            return CachedResponse(entry["text"])
+        if entry:
+            del self._mem[key]
+
+        if self.disk_dir and os.path.exists(self._disk_path(key)):
+            try:
+                with open(self._disk_path(key), encoding="utf-8") as f:
+                    entry = json.load(f)
+                if entry["expires"] > now:
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+                    return CachedResponse(entry["text"])
+                os.remove(self._disk_path(key))
+            except Exception as e:
+                print(f"[LLMCache] Disk read failed for {key[:12]}: {e}")
+
+        self.misses += 1
+        return None
+
+    def put(self, key: str, text: str, ttl: float):
+        if not text or ttl <= 0:
+            return
+        entry = {"text": text, "expires": time.time() + ttl}
+        self._remember(key, entry)
+        if self.disk_dir:
+            try:
+                tmp = self._disk_path(key) + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(entry, f)
+                os.replace(tmp, self._disk_path(key))
+            except Exception as e:
+                print(f"[LLMCache] Disk write failed for {key[:12]}: {e}")
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._mem[key] = entry
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def clear(self):
+        self._mem.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._mem), "hits": self.hits, "disk_hits": self.disk_hits,
+            "misses": self.misses, "skipped_transactional": self.skipped,
+            "skipped_terminal": self.skipped_terminal,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            "disk_tier": bool(self.disk_dir),
+        }
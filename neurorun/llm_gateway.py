@@ -0,0 +1,335 @@
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import google.generativeai as genai
+
+from neurorun.llm_cache import LLMResponseCache, make_key
+
+# Request priorities (lower runs first when the gateway is saturated).
+PRIORITY_INTERACTIVE = 0   # voice chat: a person is waiting
+PRIORITY_MISSION = 1       # device missions: the phone is idle until we answer
+PRIORITY_BACKGROUND = 2    # itineraries, summaries, anything batch-like
+
+TOKENS_PER_IMAGE = 258
+QUOTA_MARKERS = ("429", "resourceexhausted", "resource_exhausted", "quota", "rate limit")
+
+
+def is_quota_error(e: Exception) -> bool:
+    text = f"{type(e).__name__} {e}".lower()
+    return any(m in text for m in QUOTA_MARKERS)
+
+
+def estimate_tokens(contents: Any) -> int:
+    """Cheap local estimate (~4 chars per token, fixed cost per image) used for rate limiting."""
+    if contents is None:
+        return 0
+    if isinstance(contents, str):
+        return max(1, len(contents) // 4)
+    if isinstance(contents, dict):
+        if "mime_type" in contents:
+            return TOKENS_PER_IMAGE
+        return estimate_tokens(contents.get("parts"))
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(c) for c in contents)
+    if hasattr(contents, "tokens"):          # CapturedFrame
+        return contents.tokens
+    if hasattr(contents, "size"):            # PIL image
+        return TOKENS_PER_IMAGE
+    return max(1, len(str(contents)) // 4)
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` units refilled continuously over one minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= amount  # may go negative when the estimate was low; refill pays it back
+
+    def give(self, amount: float):
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class LLMGateway:
+    """
+    Single async entry point for every direct Gemini call.
+    - Process-wide token buckets for requests/min and tokens/min.
+    - Concurrency cap with priority ordering of waiting requests.
+    - Jittered exponential backoff on quota (429) errors.
+    - Stats for monitoring (`/api/llm/stats`).
+    """
+
+    def __init__(self, rpm: int = None, tpm: int = None, max_concurrency: int = None, max_retries: int = 4):
+        self.rpm = rpm or int(os.getenv("LLM_RPM", "15"))
+        self.tpm = tpm or int(os.getenv("LLM_TPM", "1000000"))
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+        self.max_retries = max_retries
+
+        self.requests = TokenBucket(self.rpm)
+        self.tokens = TokenBucket(self.tpm)
+        self._bucket_lock = asyncio.Lock()
+
+        self._in_flight = 0
+        self._waiters: List = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+
+        self.cache = LLMResponseCache()
+        self._models: Dict[tuple, Any] = {}
+        self._configured_key: Optional[str] = None
+
+        self.stats_data = {
+            "calls": 0, "errors": 0, "retries": 0, "quota_errors": 0,
+            "prompt_tokens": 0, "output_tokens": 0, "total_latency_ms": 0.0,
+            "by_call_site": {},
+        }
+
+    # --- Model handling ---
+
+    def configure(self, api_key: Optional[str] = None):
+        api_key = api_key or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+        if api_key and api_key != self._configured_key:
+            genai.configure(api_key=api_key)
+            self._configured_key = api_key
+            self._models.clear()
+
+    def model(self, name: str, system_instruction: Optional[str] = None):
+        """Cached GenerativeModel per (name, system instruction)."""
+        self.configure()
+        key = (name, system_instruction)
+        if key not in self._models:
+            if system_instruction:
+                self._models[key] = genai.GenerativeModel(name, system_instruction=system_instruction)
+            else:
+                self._models[key] = genai.GenerativeModel(name)
+        return self._models[key]
+
+    # --- Admission control ---
+
+    async def _acquire_slot(self, priority: int):
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), future))
+        await future  # the releasing request hands its slot over directly
+
+    def _release_slot(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)  # slot transferred, _in_flight unchanged
+                return
+        self._in_flight -= 1
+
+    async def _acquire_budget(self, est_tokens: int):
+        # The lock only covers check-and-take: a caller waiting for budget sleeps without it,
+        # so it never blocks other callers from checking the buckets.
+        while True:
+            async with self._bucket_lock:
+                wait = max(self.requests.wait_time(1), self.tokens.wait_time(est_tokens))
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(est_tokens)
+                    return
+            await asyncio.sleep(wait)
+
+    # --- Calls ---
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], est_tokens: int = 1,
+                   priority: int = PRIORITY_MISSION, call_site: str = "default") -> Any:
+        """Runs an async Gemini call under the limiter, with retries on quota errors."""
+        site = self.stats_data["by_call_site"].setdefault(call_site, {"calls": 0, "errors": 0, "latency_ms": 0.0})
+        await self._acquire_slot(priority)
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._acquire_budget(est_tokens)
+                t0 = time.perf_counter()
+                try:
+                    response = await fn()
+                except Exception as e:
+                    if is_quota_error(e) and attempt < self.max_retries:
+                        self.stats_data["quota_errors"] += 1
+                        self.stats_data["retries"] += 1
+                        delay = min(60.0, 2.0 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                        print(f"[LLMGateway] Quota hit at {call_site}. Backing off {delay:.1f}s (attempt {attempt + 1})...")
+                        await asyncio.sleep(delay)
+                        continue
+                    self.stats_data["errors"] += 1
+                    site["errors"] += 1
+                    raise
+
+                latency = (time.perf_counter() - t0) * 1000
+                self._record_usage(response, est_tokens)
+                self.stats_data["calls"] += 1
+                self.stats_data["total_latency_ms"] += latency
+                site["calls"] += 1
+                site["latency_ms"] += latency
+                return response
+        finally:
+            self._release_slot()
+
+    def _record_usage(self, response, est_tokens: int):
+        usage = getattr(response, "usage_metadata", None)
+        prompt = getattr(usage, "prompt_token_count", None) if usage else None
+        output = getattr(usage, "candidates_token_count", None) if usage else None
+        if prompt is None:
+            prompt = est_tokens
+        output = output or 0
+        self.stats_data["prompt_tokens"] += prompt
+        self.stats_data["output_tokens"] += output
+        # Settle the token bucket with what was actually used.
+        actual = prompt + output
+        if actual > est_tokens:
+            self.tokens.take(actual - est_tokens)
+        else:
+            self.tokens.give(est_tokens - actual)
+
+    def _cache_key(self, model_name: str, contents: Any, call_site: str, system_instruction: Optional[str],
+                   cache_context: Optional[str], cache_key_parts: Any = None) -> Optional[str]:
+        context = cache_context if cache_context is not None else " ".join(
+            c for c in (contents if isinstance(contents, (list, tuple)) else [contents]) if isinstance(c, str))
+        if not self.cache.should_cache(call_site, context):
+            return None
+        return make_key(f"{model_name}|{system_instruction or ''}", contents if cache_key_parts is None else cache_key_parts)
+
+    async def generate(self, model_name: str, contents: Any, priority: int = PRIORITY_MISSION,
+                       call_site: str = "default", system_instruction: Optional[str] = None,
+                       cache_context: Optional[str] = None, cache_key_parts: Any = None, **kwargs):
+        """
+        Async generate_content through the limiter.
+        Responses are served from / stored in the response cache when the call site's policy allows it;
+        `cache_context` (e.g. the mission goal) is checked against the booking/ordering exclusions.
+        `cache_key_parts` replaces `contents` as what the cache key is computed from, for prompts that
+        carry parts which should not split the key (step counters, action history).
+        """
+        key = self._cache_key(model_name, contents, call_site, system_instruction, cache_context, cache_key_parts)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"[LLMGateway] Cache hit at {call_site}.")
+                return cached
+
+        # CapturedFrames are sent as their encoded inline blobs
+        parts = [c.as_part() if hasattr(c, "as_part") else c for c in contents] \
+            if isinstance(contents, (list, tuple)) else contents
+        model = self.model(model_name, system_instruction)
+        response = await self.call(lambda: model.generate_content_async(parts, **kwargs),
+                                   est_tokens=estimate_tokens(contents), priority=priority, call_site=call_site)
+        if key is not None:
+            try:
+                if self.cache.should_store(call_site, response.text):
+                    self.cache.put(key, response.text, self.cache.policy(call_site)["ttl"])
+            except Exception as e:
+                # Blocked/empty candidates have no .text; just don't cache them.
+                print(f"[LLMGateway] Response not cached: {e}")
+        return response
+
+    async def generate_stream(self, model_name: str, contents: Any, priority: int = PRIORITY_BACKGROUND,
+                              call_site: str = "default", system_instruction: Optional[str] = None,
+                              cache_context: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+        """
+        Streaming generate_content: yields response text chunks as they arrive.
+        Same limiter and cache rules as generate(); a cached response comes back as one chunk.
+        Quota errors are retried only before the first chunk (a half-streamed answer can't be replayed).
+        """
+        key = self._cache_key(model_name, contents, call_site, system_instruction, cache_context)
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                print(f"[LLMGateway] Cache hit at {call_site}.")
+                yield cached.text
+                return
+
+        parts = [c.as_part() if hasattr(c, "as_part") else c for c in contents] \
+            if isinstance(contents, (list, tuple)) else contents
+        model = self.model(model_name, system_instruction)
+        est_tokens = estimate_tokens(contents)
+        site = self.stats_data["by_call_site"].setdefault(call_site, {"calls": 0, "errors": 0, "latency_ms": 0.0})
+        chunks: List[str] = []
+        await self._acquire_slot(priority)
+        try:
+            for attempt in range(self.max_retries + 1):
+                await self._acquire_budget(est_tokens)
+                t0 = time.perf_counter()
+                try:
+                    response = await model.generate_content_async(parts, stream=True, **kwargs)
+                    async for chunk in response:
+                        text = chunk.text
+                        chunks.append(text)
+                        yield text
+                    break
+                except Exception as e:
+                    if is_quota_error(e) and not chunks and attempt < self.max_retries:
+                        self.stats_data["quota_errors"] += 1
+                        self.stats_data["retries"] += 1
+                        delay = min(60.0, 2.0 * (2 ** attempt)) * random.uniform(0.5, 1.5)
+                        print(f"[LLMGateway] Quota hit at {call_site}. Backing off {delay:.1f}s (attempt {attempt + 1})...")
+                        await asyncio.sleep(delay)
+                        continue
+                    self.stats_data["errors"] += 1
+                    site["errors"] += 1
+                    raise
+
+            latency = (time.perf_counter() - t0) * 1000
+            self._record_usage(response, est_tokens)
+            self.stats_data["calls"] += 1
+            self.stats_data["total_latency_ms"] += latency
+            site["calls"] += 1
+            site["latency_ms"] += latency
+        finally:
+            self._release_slot()
+
+        if key is not None and chunks and self.cache.should_store(call_site, "".join(chunks)):
+            self.cache.put(key, "".join(chunks), self.cache.policy(call_site)["ttl"])
+
+    async def send_message(self, chat, content: Any, priority: int = PRIORITY_INTERACTIVE,
+                           call_site: str = "chat", history_tokens: int = 0, **kwargs):
+        """Async chat turn through the limiter (the whole history is billed, so count it)."""
+        return await self.call(lambda: chat.send_message_async(content, **kwargs),
+                               est_tokens=estimate_tokens(content) + history_tokens,
+                               priority=priority, call_site=call_site)
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self.stats_data)
+        s["avg_latency_ms"] = round(s["total_latency_ms"] / s["calls"], 1) if s["calls"] else 0.0
+        s["in_flight"] = self._in_flight
+        s["queued"] = len(self._waiters)
+        s["limits"] = {"rpm": self.rpm, "tpm": self.tpm, "max_concurrency": self.max_concurrency}
+        s["cache"] = self.cache.stats()
+        s["buckets"] = {"requests_available": round(max(0.0, self.requests.level), 2),
+                        "tokens_available": int(max(0.0, self.tokens.level))}
+        return s
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_gateway() -> LLMGateway:
+    """Process-wide gateway shared by every agent."""
+    global _gateway
+    if _gateway is None:
+        _gateway = LLMGateway()
+    return _gateway
@@ -0,0 +1,129 @@
+import os
+import json
+import time
+import asyncio
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+LATENCY_SMOOTHING = 0.3   # EWMA weight of the newest status round-trip
+MAX_FAILURES = 2          # consecutive failed polls before a node is taken out of placement
+
+
+class NodeState:
+    """What the coordinator knows about one remote device node."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.node_id = url
+        self.healthy = False
+        self.simulated = False
+        self.latency_ms = 0.0
+        self.load = 0.0
+        self.failures = 0
+        self.last_seen = 0.0
+        self.devices: Dict[str, dict] = {}   # advertised serial/endpoint -> record
+
+    @property
+    def capacity(self) -> int:
+        return sum(1 for d in self.devices.values() if d.get("state") == "device")
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url, "node_id": self.node_id, "healthy": self.healthy, "simulated": self.simulated,
+            "latency_ms": round(self.latency_ms, 1), "load": self.load, "capacity": self.capacity,
+            "failures": self.failures,
+            "last_seen_s": round(time.time() - self.last_seen, 1) if self.last_seen else None,
+        }
+
+
+class NodeCoordinator:
+    """
+    Polls remote device nodes (neurorun/device_node.py) and makes their phones part of the device pool.
+    Real devices are attached with `adb connect <endpoint>`, so every existing ADB path works unchanged;
+    simulated ones are only placed/leased (useful to exercise scheduling on one machine).
+    """
+
+    def __init__(self, node_urls: List[str], poll_interval: float = 10.0, timeout: float = 3.0):
+        self.nodes: Dict[str, NodeState] = {url: NodeState(url) for url in node_urls}
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._last_poll = 0.0
+        self._connected: set = set()
+
+    @classmethod
+    def from_env(cls) -> Optional["NodeCoordinator"]:
+        urls = [u.strip() for u in os.getenv("DEVICE_NODES", "").split(",") if u.strip()]
+        return cls(urls) if urls else None
+
+    def _fetch_status(self, url: str) -> dict:
+        with urllib.request.urlopen(f"{url}/node/status", timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode())
+
+    async def _poll_node(self, node: NodeState):
+        t0 = time.perf_counter()
+        try:
+            status = await asyncio.to_thread(self._fetch_status, node.url)
+        except Exception as e:
+            node.failures += 1
+            if node.failures >= MAX_FAILURES and node.healthy:
+                print(f"[NodeCoordinator] ⚠️ Node {node.node_id} unreachable ({e}). Removing from placement.")
+            node.healthy = node.failures < MAX_FAILURES and node.healthy
+            return
+        rtt = (time.perf_counter() - t0) * 1000
+        node.latency_ms = rtt if not node.last_seen else (1 - LATENCY_SMOOTHING) * node.latency_ms + LATENCY_SMOOTHING * rtt
+        if not node.healthy:
+            print(f"[NodeCoordinator] 🌐 Node {status.get('node_id')} online ({len(status.get('devices', []))} devices, {rtt:.0f}ms).")
+        node.node_id = status.get("node_id", node.url)
+        node.simulated = bool(status.get("simulated"))
+        node.load = status.get("load", 0.0)
+        node.healthy = True
+        node.failures = 0
+        node.last_seen = time.time()
+        node.devices = {d["endpoint"]: d for d in status.get("devices", []) if d.get("endpoint")}
+
+        for endpoint, device in node.devices.items():
+            if device.get("simulated") or device.get("state") != "device" or endpoint in self._connected:
+                continue
+            await self._adb_connect(endpoint)
+
+    async def _adb_connect(self, endpoint: str):
+        proc = await asyncio.create_subprocess_exec(
+            "adb", "connect", endpoint, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+        out, _ = await proc.communicate()
+        text = out.decode(errors="replace").strip()
+        if "connected" in text and "cannot" not in text:
+            self._connected.add(endpoint)
+            print(f"[NodeCoordinator] Attached remote device {endpoint}.")
+        else:
+            print(f"[NodeCoordinator] adb connect {endpoint} failed: {text}")
+
+    async def poll(self, force: bool = False):
+        """Refreshes every node's status (rate limited to poll_interval)."""
+        if not force and time.time() - self._last_poll < self.poll_interval:
+            return
+        self._last_poll = time.time()
+        await asyncio.gather(*(self._poll_node(n) for n in self.nodes.values()))
+
+    def remote_devices(self) -> Dict[str, Tuple[NodeState, dict]]:
+        """serial -> (node, advertised record) for every usable device on a healthy node."""
+        devices = {}
+        for node in self.nodes.values():
+            if not node.healthy:
+                continue
+            for endpoint, device in node.devices.items():
+                if device.get("state") == "device":
+                    devices[endpoint] = (node, device)
+        return devices
+
+    def node_of(self, serial: str) -> Optional[NodeState]:
+        for node in self.nodes.values():
+            if serial in node.devices:
+                return node
+        return None
+
+    def device_healthy(self, serial: str) -> bool:
+        node = self.node_of(serial)
+        return bool(node and node.healthy and node.devices[serial].get("state") == "device")
+
+    def stats(self) -> List[dict]:
+        return [n.to_dict() for n in self.nodes.values()]
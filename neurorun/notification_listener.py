@@ -0,0 +1,133 @@
+import re
+import time
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple
+
+from neurorun.adb_transport import AdbTransport
+from neurorun.app_registry import resolve_package
+from neurorun.device_pool import get_device_pool
+
+_RECORD = re.compile(r"NotificationRecord\(0x[0-9a-f]+: pkg=(?P<pkg>\S+).*?key=(?P<key>\S+)")
+_EXTRA = re.compile(r"^\s*android\.(?P<name>title|text|bigText)=\w+ \((?P<value>.*)\)\s*$")
+_WHEN = re.compile(r"\bwhen=(\d+)")
+_COUNT_SUFFIX = re.compile(r"\s*\(\d+ (?:new )?messages?\)$", re.I)
+
+
+class ReplyEvent:
+    """One incoming message notification attributed to a contact."""
+
+    __slots__ = ("contact", "text", "package", "posted_at")
+
+    def __init__(self, contact: str, text: str, package: str, posted_at: float):
+        self.contact = contact
+        self.text = text
+        self.package = package
+        self.posted_at = posted_at
+
+    def to_dict(self) -> dict:
+        return {"contact": self.contact, "text": self.text, "package": self.package, "posted_at": self.posted_at}
+
+
+def parse_notifications(dump: str, package: str) -> List[Dict[str, str]]:
+    """Posted notifications of one package from `dumpsys notification --noredact` output."""
+    records, current = [], None
+    for line in dump.splitlines():
+        m = _RECORD.search(line)
+        if m:
+            current = {"key": m.group("key").rstrip(":"), "title": "", "text": "", "when": ""} if m.group("pkg") == package else None
+            if current is not None:
+                records.append(current)
+            continue
+        if current is None:
+            continue
+        extra = _EXTRA.match(line)
+        if extra:
+            name = "text" if extra.group("name") == "bigText" and not current["text"] else extra.group("name")
+            if name in current and not current[name]:
+                current[name] = extra.group("value").strip()
+        elif not current["when"]:
+            when = _WHEN.search(line)
+            if when:
+                current["when"] = when.group(1)
+    return records
+
+
+class NotificationListener:
+    """
+    Watches a chat app's notifications and turns them into per-contact ReplyEvents.
+    One `dumpsys notification` per poll (milliseconds, no model) replaces opening every chat
+    with an agent; while nothing arrives the poll interval backs off up to max_interval.
+    """
+
+    def __init__(self, app: str = "WhatsApp", min_interval: float = 2.0, max_interval: float = 30.0):
+        self.package = resolve_package(app) or app
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._seen: Set[Tuple[str, str, str]] = set()
+        self.polls = 0
+        self.events = 0
+
+    def _match_contact(self, title: str, contacts: Iterable[str]) -> Optional[str]:
+        title = _COUNT_SUFFIX.sub("", title).strip().lower()
+        if not title:
+            return None
+        contacts = list(contacts)
+        for contact in contacts:
+            if contact.strip().lower() == title:
+                return contact
+        for contact in contacts:
+            if re.search(rf"\b{re.escape(contact.strip().lower())}\b", title):
+                return contact
+        return None
+
+    async def _dump(self, serial: Optional[str]) -> str:
+        res = await AdbTransport.for_device(serial).run("dumpsys notification --noredact", timeout=10)
+        return res.output if res.ok else ""
+
+    async def prime(self, serial: Optional[str] = None):
+        """Marks what is already in the shade as seen, so only later messages count as replies."""
+        for record in parse_notifications(await self._dump(serial), self.package):
+            self._seen.add((record["key"], record["when"], record["text"]))
+
+    async def poll(self, contacts: Iterable[str], serial: Optional[str] = None) -> List[ReplyEvent]:
+        """New message notifications from any of `contacts` since the last poll."""
+        self.polls += 1
+        events = []
+        for record in parse_notifications(await self._dump(serial), self.package):
+            fingerprint = (record["key"], record["when"], record["text"])
+            if fingerprint in self._seen or not record["text"]:
+                continue
+            self._seen.add(fingerprint)
+            contact = self._match_contact(record["title"], contacts)
+            if contact:
+                posted = int(record["when"]) / 1000 if record["when"].isdigit() else time.time()
+                events.append(ReplyEvent(contact, record["text"], self.package, posted))
+        self.events += len(events)
+        return events
+
+    async def replies(self, contacts: Iterable[str], timeout: float = 600.0,
+                      serial: Optional[str] = None) -> AsyncIterator[ReplyEvent]:
+        """
+        Yields reply events until every contact has replied or `timeout` passes without one.
+        `serial` is the phone the messages were sent from (any phone with the app if None).
+        The device is leased only for the duration of each dump, so other tasks can use it in between.
+        """
+        pending = set(contacts)
+        interval = self.min_interval
+        deadline = time.time() + timeout
+        while pending and time.time() < deadline:
+            async with get_device_pool().lease("notification_listener", serial=serial, package=self.package) as device:
+                events = await self.poll(pending, device.serial)
+            if events:
+                interval = self.min_interval
+                deadline = time.time() + timeout
+                for event in events:
+                    pending.discard(event.contact)
+                    yield event
+                continue
+            print(f"[Notifications] No new replies ({len(pending)} pending). Next check in {interval:.0f}s.")
+            await asyncio.sleep(min(interval, max(0.0, deadline - time.time())))
+            interval = min(interval * 2, self.max_interval)
+
+    def stats(self) -> dict:
+        return {"package": self.package, "polls": self.polls, "events": self.events, "seen": len(self._seen)}
@@ -5,94 +5,128 @@ import json
 import base64
 from typing import List, Dict, Any, Optional
 
-import google.generativeai as genai
-from PIL import Image
+from neurorun.llm_gateway import get_gateway, PRIORITY_MISSION
+from neurorun.llm_cache import screen_digest
+from neurorun.screen_capture import ScreenCapture, CapturedFrame
+from neurorun.screen_cache import ScreenCache, is_unchanged
+from neurorun.adb_transport import AdbTransport
+from neurorun.token_budget import TokenBudget
+from neurorun.postconditions import PostConditionChecker, EXPECTATIONS
+from neurorun.device_pool import get_device_pool, DeviceLease, NoDeviceAvailable
+from neurorun.device_primitives import DevicePrimitives
 
 try:
     from droidrun.agent.droid import DroidAgent
     from droidrun.tools import AdbTools
-    from droidrun.adb import DeviceManager
     from droidrun.agent.utils.llm_picker import load_llm
 except ImportError:
     print("Critical: DroidRun SDK not found.")
     raise
 
+# Actions safe to send twice when the screen did not react: repeating them lands in the same state.
+REPLAYABLE_ACTIONS = ("launch", "open_url", "home")
+
 class NeuroOrchestrator:
     def __init__(self, api_key: str):
         self.api_key = api_key
         if not api_key:
             raise ValueError("API Key required for NeuroOrchestrator")
         
-        # Configure Gemini for Vision/Planning
-        genai.configure(api_key=self.api_key)
-        self.planner_model = genai.GenerativeModel('gemini-2.0-flash-exp') # Use flash for speed, or pro for reasoning
+        # Configure Gemini for Vision/Planning (all calls go through the shared async gateway)
+        self.llm = get_gateway()
+        self.llm.configure(self.api_key)
+        self.planner_model = 'gemini-2.0-flash-exp' # Use flash for speed, or pro for reasoning
         
         self.device_serial = None
         self.tools = None
+        self.screen: Optional[ScreenCapture] = None
+        self.adb: Optional[AdbTransport] = None
         self.width = 1080 
         self.height = 2400
         self.step_limit = 15
-        self.history: List[Dict] = []
+        self.settle_after_wait = 2.0  # seconds a 'wait' action gives the UI
+        # "sequence": up to max_plan_actions actions per model call, verified locally between actions.
+        # "single": one action per screenshot (the original behaviour).
+        self.plan_mode = os.getenv("NEURO_PLAN_MODE", "sequence").lower()
+        self.max_plan_actions = int(os.getenv("NEURO_PLAN_MAX_ACTIONS", "4"))
+        self.checker: Optional[PostConditionChecker] = None
+        self.primitives: Optional[DevicePrimitives] = None
+        # Compact rolling action history + per-mission token accounting (reset per mission)
+        self.budget = TokenBudget()
 
-    async def connect(self):
-        """Connect to device and initialize tools"""
+    async def connect(self, lease: DeviceLease):
+        """Initialize tools for the leased device (resolution comes from the pool's profile)"""
         try:
-            dm = DeviceManager()
-            devices = await dm.list_devices()
-            if not devices:
-                print("NeuroOrchestrator: No device found.")
-                return False
-            self.device_serial = devices[0].serial
+            self.device_serial = lease.serial
             print(f"NeuroOrchestrator: Connected to {self.device_serial}")
             self.tools = AdbTools(serial=self.device_serial)
-            
-            # Get Resolution
-            try:
-                # Direct ADB call to get size
-                stream = os.popen(f"adb -s {self.device_serial} shell wm size")
-                out = stream.read().strip() # e.g., Physical size: 1080x2400
-                if "size:" in out:
-                    res = out.split("size:")[1].strip().split("x")
-                    self.width = int(res[0])
-                    self.height = int(res[1])
-                    print(f"Detected Resolution: {self.width}x{self.height}")
-                else:
-                     self.width = 1080
-                     self.height = 2400
-            except:
-                self.width = 1080
-                self.height = 2400
+            self.adb = lease.adb
+            self.screen = ScreenCapture(serial=self.device_serial)
+            self.checker = PostConditionChecker(self.adb, self.screen, self.device_serial)
+            self.primitives = DevicePrimitives(self.device_serial)
+            self.width = lease.profile.width
+            self.height = lease.profile.height
+            print(f"Detected Resolution: {self.width}x{self.height}")
             return True
         except Exception as e:
             print(f"NeuroOrchestrator Connection Error: {e}")
             return False
 
-    async def capture_state_image(self) -> Optional[Image.Image]:
-        try:
-            path = f"neuro_state_{int(time.time())}.png"
-            os.system(f"adb -s {self.device_serial} shell screencap -p /sdcard/neuro_cap.png")
-            os.system(f"adb -s {self.device_serial} pull /sdcard/neuro_cap.png {path}")
-            
-            if os.path.exists(path):
-                img = Image.open(path)
-                return img
-            return None
-        except Exception as e:
-            print(f"Screenshot failed: {e}")
-            return None
+    async def capture_state_image(self) -> Optional[CapturedFrame]:
+        """Streams a screenshot into memory, downscaled and encoded for the planner."""
+        frame = await self.screen.capture()
+        if frame:
+            print(f"  [Vision] {frame} (capture {frame.capture_ms:.0f}ms, encode {frame.encode_ms:.0f}ms)")
+        return frame
 
-    def plan_next_step(self, main_goal: str, current_image: Image.Image, step_count: int) -> Dict:
+    async def plan_next_step(self, main_goal: str, current_image: CapturedFrame, step_count: int,
+                             replan: bool = False) -> Dict:
         """
         Uses Vision to output exact COORDINATES or TEXT args.
+        In "sequence" mode the plan may hold several actions, each with a post-condition.
+        `replan` (the last plan did nothing on this screen) bypasses the response cache.
         """
+        if self.plan_mode == "sequence":
+            plan_rules = f"""
+        Identify the NEXT actions: up to {self.max_plan_actions} in a row, but ONLY when every later action
+        can be decided from THIS screenshot (e.g. tap search bar -> type query). Stop the list at any action
+        whose result you need to see before deciding the next one.
+        Give every action an "expect" post-condition that will be checked before the next action runs:
+        "screen_change" (screen must look different), "keyboard" (soft keyboard must open),
+        "focus" (a text field must be focused) or "none".
+        Note: 'type' already presses Enter after the text."""
+            action_schema = """"actions": [
+                {
+                    "type": "tap" | "type" | "key" | "wait" | "back" | "home" | "launch" | "open_url",
+                    "bq_box": [ymin, xmin, ymax, xmax] (0-1000 scale) - REQUIRED for 'tap',
+                    "text": "..." (REQUIRED for 'type'),
+                    "app": "..." (REQUIRED for 'launch': app name, opens it without finding the icon),
+                    "url": "..." (REQUIRED for 'open_url'),
+                    "keycode": "..." (OPTIONAL for 'key'),
+                    "expect": "screen_change" | "keyboard" | "focus" | "none"
+                }
+            ],
+            "data": {...} (REQUIRED if status='done', extracted info)"""
+        else:
+            plan_rules = """
+        Identify the NEXT single action."""
+            action_schema = """"action": {
+                "type": "tap" | "type" | "key" | "wait" | "back" | "home" | "launch" | "open_url" | "done",
+                "bq_box": [ymin, xmin, ymax, xmax] (0-1000 scale) - REQUIRED for 'tap', OPTIONAL for 'type' (to tap first),
+                "text": "..." (REQUIRED for 'type'),
+                "app": "..." (REQUIRED for 'launch': app name, opens it without finding the icon),
+                "url": "..." (REQUIRED for 'open_url'),
+                "keycode": "..." (OPTIONAL for 'key'),
+                "data": {...} (REQUIRED if status='done', extracted info)
+            }"""
+
         prompt = f"""
         You are an advanced Android Automation Brain.
         Main Goal: {main_goal}
         Step: {step_count}/{self.step_limit}
-        History: {[h['action'] for h in self.history]}
+        History: {self.budget.history_text()}
 
-        Analyze the screenshot. The device resolution is implied 1000x1000 relative for coordinates.
-        Identify the NEXT single action.
+        Analyze the screenshot. The device resolution is implied 1000x1000 relative for coordinates.{plan_rules}
         - If the keyboard is open and blocking the view, use "back" to close it ONLY if you are NOT currently typing/searching.
         - If you are searching, DO NOT use "back" as it might exit the search. Instead, proceed to tap the result IF VISIBLE.
         - If the desired item (like 'Fries' image) is ALREADY visible, prefer 'tap' over 'type'.
@@ -101,38 +135,27 @@ class NeuroOrchestrator:
         {{
             "analysis": "Thinking process...",
             "status": "continue" | "done" | "failed",
-            "action": {{
-                "type": "tap" | "type" | "key" | "wait" | "back" | "home" | "done",
-                "bq_box": [ymin, xmin, ymax, xmax] (0-1000 scale) - REQUIRED for 'tap', OPTIONAL for 'type' (to tap first),
-                "text": "..." (REQUIRED for 'type'),
-                "keycode": "..." (OPTIONAL for 'key'),
-                "data": {{...}} (REQUIRED if status='done', extracted info)
-            }}
+            {action_schema}
         }}
         """
         
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                # Add delay to respect rate limits
-                if attempt > 0:
-                    time.sleep(2) 
-                
-                response = self.planner_model.generate_content([prompt, current_image])
-                text = response.text.strip()
-                if "```json" in text:
-                    text = text.split("```json")[1].split("```")[0]
-                elif "```" in text:
-                    text = text.split("```")[1].split("```")[0]
-                return json.loads(text)
-            except Exception as e:
-                print(f"Planning Error (Attempt {attempt+1}): {e}")
-                if "429" in str(e) or "ResourceExhausted" in str(e) or "quota" in str(e).lower():
-                    wait_time = (attempt + 1) * 5
-                    print(f"Quota hit. Waiting {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    break
+        try:
+            # Rate limiting and quota backoff are handled by the gateway
+            # Cached by goal + screen (status bar cropped): the step counter and history would make every key unique
+            response = await self.llm.generate(
+                self.planner_model, [prompt, current_image],
+                priority=PRIORITY_MISSION, call_site="planner_replan" if replan else "planner", cache_context=main_goal,
+                cache_key_parts=[main_goal, self.plan_mode, self.max_plan_actions, screen_digest(current_image)]
+            )
+            self.budget.record_step(prompt, current_image.tokens, response)
+            text = response.text.strip()
+            if "```json" in text:
+                text = text.split("```json")[1].split("```")[0]
+            elif "```" in text:
+                text = text.split("```")[1].split("```")[0]
+            return json.loads(text)
+        except Exception as e:
+            print(f"Planning Error: {e}")
         
         return {"status": "failed", "analysis": "Failed after retries", "action": {"type": "wait"}}
 
@@ -150,38 +173,43 @@ class NeuroOrchestrator:
                 ymin, xmin, ymax, xmax = box
                 cx = (xmin + xmax) / 2 / 1000 * self.width
                 cy = (ymin + ymax) / 2 / 1000 * self.height
-                cmd = f"adb -s {self.device_serial} shell input tap {int(cx)} {int(cy)}"
-                os.system(cmd)
+                await self.adb.tap(cx, cy)
                 return "Tapped"
                 
         elif tipo == 'type':
             text = action.get('text', '')
             
             # Standard input text is most compatible with standard keyboards
-            # We escape spaces
-            clean_text = text.replace(" ", "%s")
-            os.system(f"adb -s {self.device_serial} shell input text {clean_text}")
+            await self.adb.text(text)
             
             # Hit Enter to search
-            time.sleep(1.5)
-            os.system(f"adb -s {self.device_serial} shell input keyevent 66")
+            await asyncio.sleep(1.5)
+            await self.adb.keyevent(66)
             return f"Typed {text}"
             
         elif tipo == 'key':
             code = action.get('keycode', '')
-            os.system(f"adb -s {self.device_serial} shell input keyevent {code}")
+            await self.adb.keyevent(code)
             return f"Key {code}"
             
         elif tipo == 'back':
-            os.system(f"adb -s {self.device_serial} shell input keyevent 4")
+            await self.adb.keyevent(4)
             return "Back (Close Keyboard/Nav)"
             
         elif tipo == 'home':
-            os.system(f"adb -s {self.device_serial} shell input keyevent 3")
+            await self.adb.keyevent(3)
             return "Home"
             
+        elif tipo == 'launch':
+            res = await self.primitives.launch_app(action.get('app', ''), wait=False)
+            return f"Launched {action.get('app')}" if res["status"] == "success" else "Launch Failed"
+
+        elif tipo == 'open_url':
+            res = await self.primitives.open_url(action.get('url', ''))
+            return f"Opened {action.get('url')}" if res["status"] == "success" else "Open URL Failed"
+
         elif tipo == 'wait':
-            time.sleep(2)
+            await asyncio.sleep(2)
             return "Waited"
             
         return "Unknown Action"
@@ -216,34 +244,181 @@ class NeuroOrchestrator:
         result = await handler
         return result
 
-    async def run_mission(self, goal: str):
+    def _plan_actions(self, plan: Dict) -> List[Dict]:
+        """Normalises single-action and multi-action plans to a capped action list."""
+        actions = plan.get('actions')
+        if not isinstance(actions, list):
+            action = plan.get('action')
+            actions = [action] if action else []
+        actions = [a for a in actions if isinstance(a, dict) and a.get('type') not in (None, 'done')]
+        return actions[:self.max_plan_actions] if self.plan_mode == "sequence" else actions[:1]
+
+    async def _execute_plan(self, actions: List[Dict], frame: CapturedFrame, timing: Dict) -> tuple:
+        """
+        Runs a plan's actions in order, checking each action's post-condition before the next one.
+        Stops at the first failed check so the planner sees the real screen.
+        Returns (settled frame, last executed action).
+        """
+        settled = None
+        action = actions[0]
+        for n, action in enumerate(actions, 1):
+            settled = None
+            outcome = await self.execute_action_direct(action)
+            timing["actions"] += 1
+            if n == len(actions):
+                # The last action is judged by the next planning step (and stuck detection).
+                self.budget.record_action(action, outcome)
+                break
+            expect = action.get('expect')
+            if expect not in EXPECTATIONS:
+                expect = "screen_change"
+            passed, settled = await self.checker.check(expect, frame)
+            if settled:
+                frame = settled
+            if not passed:
+                print(f"  [Verify] Expected '{expect}' after {action.get('type')}: not met. "
+                      f"Re-planning ({len(actions) - n} queued actions dropped).")
+                self.budget.record_action(action, f"{outcome}; expected {expect} NOT met")
+                timing["replans"] += 1
+                break
+            print(f"  [Verify] '{expect}' OK after {action.get('type')}.")
+            self.budget.record_action(action, outcome)
+        return settled or await self.screen.capture_settled(), action
+
+    def _mission_result(self, status: str, cache: ScreenCache, timing: Dict[str, float], **extra) -> Dict:
+        elapsed = time.perf_counter() - timing["start"]
+        steps = timing["steps"]
+        stats = cache.stats()
+        stats.update({
+            "steps": steps,
+            "elapsed_s": round(elapsed, 2),
+            "steps_per_min": round(steps / elapsed * 60, 2) if elapsed > 0 else 0.0,
+            "llm_ms": round(timing["llm_ms"]),
+            "device_ms": round(timing["device_ms"]),
+            "speculative_hits": timing["speculative_hits"],
+            "plan_mode": self.plan_mode,
+            "actions": timing["actions"],
+            "replans": timing["replans"],
+            "actions_per_call": round(timing["actions"] / stats["llm_calls"], 2) if stats["llm_calls"] else 0.0,
+        })
+        result = {"status": status, "stats": stats, "token_usage": self.budget.usage()}
+        result.update(extra)
+        print(f"Mission {status}: {stats} | Tokens: {result['token_usage']}")
+        return result
+
+    async def _speculative_frame(self, delay: float) -> Optional[CapturedFrame]:
+        """Prefetches a frame while the planner is thinking (used if the plan is a no-op)."""
+        await asyncio.sleep(delay)
+        return await self.screen.capture()
+
+    async def run_mission(self, goal: str, serial: Optional[str] = None):
         print(f"NeuroOrchestrator Mission (Direct Mode): {goal}")
-        if not await self.connect():
+        pool = get_device_pool()
+        try:
+            lease = await pool.acquire("neuro_orchestrator", serial=serial)
+        except NoDeviceAvailable as e:
+            print(f"NeuroOrchestrator: {e}")
             return {"status": "failed", "error": "Connection Failed"}
+        try:
+            if not await self.connect(lease):
+                return {"status": "failed", "error": "Connection Failed"}
+            return await self._run_mission(goal)
+        finally:
+            await pool.release(lease)
+
+    async def _run_mission(self, goal: str):
+
+        cache = ScreenCache()
+        self.budget.reset()
+        timing = {"start": time.perf_counter(), "steps": 0, "llm_ms": 0.0, "device_ms": 0.0, "speculative_hits": 0,
+                  "actions": 0, "replans": 0}
+        prev_frame: Optional[CapturedFrame] = None
+        last_action: Optional[Dict] = None
+        stuck_count = 0
+
+        # A single trivial goal (home, back, open app/URL) is one ADB primitive: no screenshot, no planner
+        quick = await self.primitives.run_goal(goal)
+        if quick is not None:
+            if quick["status"] == "success":
+                return self._mission_result("success", cache, timing, data=quick)
+            return self._mission_result("failed", cache, timing, data=quick, error=quick.get("detail"))
+
+        img = await self.capture_state_image()
 
         for i in range(1, self.step_limit + 1):
             print(f"\n--- Step {i}/{self.step_limit} ---")
+            timing["steps"] = i
             
-            img = await self.capture_state_image()
             if not img:
-                return {"status": "failed", "error": "Vision Lost"}
-                
-            plan = self.plan_next_step(goal, img, i)
+                return self._mission_result("failed", cache, timing, error="Vision Lost")
+
+            # Identical screen after an action: give the UI time (or replay an idempotent action),
+            # then ask the planner again. Taps and typing are never replayed blindly: a tap that did
+            # land may have toggled a checkbox or bumped a quantity too subtly for the diff to see.
+            replan = False
+            if last_action and last_action.get('type') != 'wait' and is_unchanged(prev_frame, img):
+                stuck_count += 1
+                if stuck_count == 1:
+                    cache.record_local_recovery()
+                    if last_action.get('type') in REPLAYABLE_ACTIONS:
+                        print("  [Cache] Screen unchanged. Retrying last action locally...")
+                        outcome = await self.execute_action_direct(last_action)
+                        self.budget.record_action(last_action, f"retry {outcome}")
+                        img = await self.screen.capture_settled()
+                    else:
+                        print("  [Cache] Screen unchanged. Waiting longer for the UI...")
+                        await asyncio.sleep(self.settle_after_wait)
+                        img = await self.capture_state_image()
+                    continue
+                if stuck_count == 2:
+                    print("  [Cache] Still unchanged. Asking the planner again...")
+                    self.budget.record_action(last_action, "no visible change on screen")
+                    replan = True
+                else:
+                    print("  [Cache] Screen did not react to the action. Escalating.")
+                    return self._mission_result("failed", cache, timing, error=f"Screen unchanged after action {last_action}")
+            else:
+                stuck_count = 0
+
+            speculative = None
+            t_plan = time.perf_counter()
+            # A re-plan must not be answered by the memoized plan that just failed on this screen.
+            plan = None if replan else cache.lookup(goal, img)
+            if plan is not None:
+                print("  [Cache] Known screen. Reusing plan.")
+            else:
+                # Keep the device busy while the model thinks: prefetch the next frame.
+                speculative = asyncio.create_task(self._speculative_frame(self.settle_after_wait))
+                plan = await self.plan_next_step(goal, img, i, replan=replan)
+                cache.store(goal, img, plan)
+            timing["llm_ms"] += (time.perf_counter() - t_plan) * 1000
             print(f"Brain: {plan.get('analysis', '...')}")
             
-            action = plan.get('action', {})
+            actions = self._plan_actions(plan) or [{"type": "wait"}]
             status = plan.get('status', 'continue')
             
+            if status in ('done', 'failed') and speculative:
+                speculative.cancel()
             if status == 'done':
-                print("Mission Success!")
-                return {"status": "success", "data": action.get("data", {})}
+                data = plan.get("data") or (plan.get("action") or {}).get("data", {})
+                return self._mission_result("success", cache, timing, data=data)
             if status == 'failed':
-                return {"status": "failed", "error": plan.get("analysis")}
-            
-            # Act Direct
-            await self.execute_action_direct(action)
-            
-            self.history.append({"action": action})
-            time.sleep(2) # Stabilize UI
+                return self._mission_result("failed", cache, timing, error=plan.get("analysis"))
+
+            t_act = time.perf_counter()
+            prev_frame = img
+            if len(actions) == 1 and actions[0].get('type') == 'wait' and speculative and speculative.done() and speculative.result():
+                # The model asked to wait and the prefetched frame was taken after it had already waited.
+                img, last_action = speculative.result(), actions[0]
+                timing["speculative_hits"] += 1
+                timing["actions"] += 1
+                self.budget.record_action(last_action, "Waited (prefetched)")
+                print("  [Pipeline] Using frame prefetched during planning.")
+            else:
+                if speculative:
+                    speculative.cancel()  # the plan changes the screen: the prefetched frame is stale
+                # Act Direct, verifying post-conditions locally; capture as soon as the UI settles
+                img, last_action = await self._execute_plan(actions, img, timing)
+            timing["device_ms"] += (time.perf_counter() - t_act) * 1000
 
-        return {"status": "timeout", "error": "Limit reached"}
+        return self._mission_result("timeout", cache, timing, error="Limit reached")
@@ -0,0 +1,54 @@
+from typing import Optional, Tuple
+
+from neurorun.adb_transport import AdbTransport
+from neurorun.screen_capture import ScreenCapture, CapturedFrame
+from neurorun.screen_cache import is_unchanged
+from neurorun.ui_extractor import UIExtractor, UIIndex
+
+# Post-conditions the planner may attach to each action of a multi-action plan.
+#   "screen_change" -> the screen must look different afterwards
+#   "keyboard"      -> the soft keyboard must be showing
+#   "focus"         -> a text field must have focus
+#   "none"          -> nothing to verify
+EXPECTATIONS = ("screen_change", "keyboard", "focus", "none")
+
+
+class PostConditionChecker:
+    """
+    Cheap local checks run between the actions of a plan, so the vision model is only
+    called again when the device did not end up where the plan expected.
+    """
+
+    def __init__(self, adb: AdbTransport, screen: ScreenCapture, serial: Optional[str] = None):
+        self.adb = adb
+        self.screen = screen
+        self.extractor = UIExtractor(serial)
+
+    async def keyboard_shown(self) -> bool:
+        res = await self.adb.run("dumpsys input_method | grep mInputShown")
+        return "mInputShown=true" in res.output
+
+    async def input_focused(self) -> bool:
+        xml_text = await self.extractor.dump_xml()
+        if not xml_text:
+            # No hierarchy (secure screen, dump timeout): an open keyboard implies a focused field.
+            return await self.keyboard_shown()
+        try:
+            return UIIndex(xml_text).focused_input is not None
+        except Exception:
+            return await self.keyboard_shown()
+
+    async def check(self, expect: Optional[str], before: Optional[CapturedFrame]) -> Tuple[bool, Optional[CapturedFrame]]:
+        """
+        Returns (passed, frame). `frame` is the settled screenshot when one had to be taken
+        (screen_change), so the caller can reuse it as the next "before" frame.
+        """
+        expect = (expect or "none").lower()
+        if expect == "screen_change":
+            frame = await self.screen.capture_settled()
+            return frame is not None and not is_unchanged(before, frame), frame
+        if expect == "keyboard":
+            return await self.keyboard_shown(), None
+        if expect == "focus":
+            return await self.input_focused(), None
+        return True, None
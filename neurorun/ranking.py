@@ -0,0 +1,173 @@
+import os
+import re
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_CLOCK = re.compile(r"^\s*(\d{1,2}):(\d{2})(?::\d{2})?\s*([AaPp][Mm])?\s*$")
+_MISSING = {"", "n/a", "na", "unknown", "none", "-"}
+
+# Default criteria per record kind: field -> {"weight": w, "better": "low" | "high"}
+# Optional per criterion: "missing": "worst" (default, scores 0) or "neutral" (scores 0.5);
+# "type": "timestamp" ranks on full date-times only (a bare clock time would put 00:30 before 23:10
+# of the previous day, so it counts as missing).
+FOOD_CRITERIA = {"numeric_price": {"weight": 1.0, "better": "low"},
+                 "rating": {"weight": 0.2, "better": "high", "missing": "neutral"}}
+RIDE_CRITERIA = {"numeric_price": {"weight": 1.0, "better": "low"},
+                 "eta": {"weight": 0.3, "better": "low", "missing": "neutral"}}
+BASKET_CRITERIA = {"total": {"weight": 1.0, "better": "low"}}
+FLIGHT_CRITERIA = {"price": {"weight": 1.0, "better": "low"},
+                   "arrival_time": {"weight": 0.3, "better": "low", "type": "timestamp"}}
+HOTEL_CRITERIA = {"price_per_night": {"weight": 1.0, "better": "low"},
+                  "rating": {"weight": 0.6, "better": "high"}}
+
+
+def to_number(value: Any) -> Optional[float]:
+    """'₹5,499' -> 5499.0, '4.2' -> 4.2, '07:45 PM' -> minutes after midnight, datetime -> timestamp."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return None if math.isinf(value) or math.isnan(value) else float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    text = str(value).strip()
+    if text.lower() in _MISSING:
+        return None
+    clock = _CLOCK.match(text) if ":" in text else None
+    if clock:
+        hours, minutes, half = int(clock.group(1)), int(clock.group(2)), (clock.group(3) or "").lower()
+        if half == "pm" and hours < 12:
+            hours += 12
+        elif half == "am" and hours == 12:
+            hours = 0
+        return float(hours * 60 + minutes)
+    if len(text) == 19 and text[4] == "-":
+        try:
+            return datetime.strptime(text, "%Y-%m-%d %H:%M:%S").timestamp()
+        except ValueError:
+            pass
+    m = _NUMBER.search(text)
+    return float(m.group(0).replace(",", "")) if m else None
+
+
+def to_timestamp(value: Any) -> Optional[float]:
+    """'2025-03-02 00:30:00' (or ISO, or a datetime) -> timestamp; anything without a date -> None."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    text = str(value or "").strip().replace("T", " ")
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+def rank_offers(offers: List[Dict[str, Any]], criteria: Dict[str, Dict[str, Any]],
+                preferences: Optional[Dict[str, Dict[str, float]]] = None,
+                required: Tuple[str, ...] = ()) -> List[Dict[str, Any]]:
+    """
+    Weighted multi-criteria ranking of offers from any number of apps, best first.
+
+    Works column by column: each criterion is parsed once into a float column, min-max scaled
+    (1 = best) and added to the score vector, so hundreds of offers cost a few list passes.
+    - Missing values score 0 ("worst") or 0.5 ("neutral"); a criterion no offer has is dropped
+      and the remaining weights are renormalised.
+    - `preferences` add a bonus for matching values, e.g. {"app": {"Swiggy": 0.1}}.
+    - Offers without every `required` field (e.g. no price found) are left out.
+    - Equal scores share a rank ("tied": True) and keep the input order.
+    Returns copies of the offers with "score", "rank" and "tied" added.
+    """
+    parsers = {f: to_timestamp if criteria.get(f, {}).get("type") == "timestamp" else to_number
+               for f in set(criteria) | set(required)}
+    columns = {f: [parse(o.get(f)) for o in offers] for f, parse in parsers.items()}
+    keep = [i for i in range(len(offers)) if all(columns[f][i] is not None for f in required)]
+    if not keep:
+        return []
+    if len(keep) < len(offers):
+        columns = {f: [c[i] for i in keep] for f, c in columns.items()}
+    rows = [offers[i] for i in keep]
+    n = len(rows)
+    scores = [0.0] * n
+    used = {f: c for f, c in criteria.items() if c.get("weight", 1.0) and any(v is not None for v in columns[f])}
+    total_weight = sum(c.get("weight", 1.0) for c in used.values()) or 1.0
+
+    for field, spec in used.items():
+        column = columns[field]
+        present = [v for v in column if v is not None]
+        low, high = min(present), max(present)
+        span = high - low
+        weight = spec.get("weight", 1.0) / total_weight
+        fill = 0.5 if spec.get("missing") == "neutral" else 0.0
+        if span:
+            lower_is_better = spec.get("better", "low") == "low"
+            scaled = [fill if v is None else ((high - v) if lower_is_better else (v - low)) / span for v in column]
+        else:
+            scaled = [fill if v is None else 1.0 for v in column]
+        scores = [s + weight * x for s, x in zip(scores, scaled)]
+
+    for field, bonuses in (preferences or {}).items():
+        lookup = {str(k).lower(): b for k, b in bonuses.items()}
+        scores = [s + lookup.get(str(o.get(field, "")).lower(), 0.0) for s, o in zip(scores, rows)]
+
+    scores = [round(s, 6) for s in scores]
+    order = sorted(range(n), key=lambda i: -scores[i])  # stable: ties keep input order
+    ranked, rank = [], 0
+    for pos, i in enumerate(order):
+        if pos == 0 or scores[i] != scores[order[pos - 1]]:
+            rank = pos + 1
+        tied = (pos > 0 and scores[i] == scores[order[pos - 1]]) or (pos + 1 < n and scores[i] == scores[order[pos + 1]])
+        ranked.append({**rows[i], "score": round(scores[i], 4), "rank": rank, "tied": tied})
+    return ranked
+
+
+def merge_weights(defaults: Dict[str, Dict[str, Any]], weights: Optional[Dict[str, float]]) -> Dict[str, Dict[str, Any]]:
+    """User weights ({"price": 2, "rating": 0}) override the default criterion weights."""
+    criteria = {f: dict(spec) for f, spec in defaults.items()}
+    for field, weight in (weights or {}).items():
+        if field in criteria:
+            criteria[field]["weight"] = float(weight)
+    return criteria
+
+
+class RankingIndex:
+    """
+    Top-N results of device searches, keyed by (kind, search inputs). One device session captures
+    several cards; picking a cheaper flight or another hotel later is then a local re-rank.
+    Entries expire after RANKING_INDEX_TTL seconds (fares and room prices move).
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: int = 128):
+        self.ttl = ttl if ttl is not None else float(os.getenv("RANKING_INDEX_TTL", "1800"))
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, Tuple], Tuple[float, List[Dict[str, Any]]]] = {}
+
+    def put(self, kind: str, key: Tuple, records: List[Dict[str, Any]]):
+        if not records:
+            return
+        self._entries[(kind, key)] = (time.time() + self.ttl, list(records))
+        while len(self._entries) > self.max_entries:
+            self._entries.pop(min(self._entries, key=lambda k: self._entries[k][0]))
+
+    def get(self, kind: str, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get((kind, key))
+        if entry and entry[0] > time.time():
+            return entry[1]
+        self._entries.pop((kind, key), None)
+        return None
+
+    def ranked(self, kind: str, key: Tuple, criteria: Dict[str, Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        records = self.get(kind, key)
+        return rank_offers(records, criteria) if records else None
+
+
+_index: Optional[RankingIndex] = None
+
+
+def get_ranking_index() -> RankingIndex:
+    global _index
+    if _index is None:
+        _index = RankingIndex()
+    return _index
@@ -0,0 +1,98 @@
+import os
+import re
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from neurorun.device_pool import get_device_pool
+
+_FILLER = re.compile(r"^(?:a|an|one|some|the|\d+(?:\s*x)?)\s+|\s+please$")
+
+
+def normalize_item(item: str) -> str:
+    """'Pizza', ' pizza please!' and 'a Pizza' share one key."""
+    text = re.sub(r"[^\w\s&]", " ", str(item).lower())
+    text = " ".join(text.split())
+    previous = None
+    while previous != text:
+        previous, text = text, _FILLER.sub("", text).strip()
+    return text
+
+
+class ResearchQueue:
+    """
+    Memoized, de-duplicated work queue for per-item lookups.
+    - Each normalized item is researched at most once; later requests get the stored result.
+    - A request for an item that is already being researched waits for that run instead of starting another.
+    - research_all() runs the unique items concurrently, bounded by `concurrency` (default: one per device).
+    Failures (exceptions) are not memoized, so the next request retries.
+    """
+
+    def __init__(self, worker: Callable[[str], Awaitable[Any]], concurrency: Optional[int] = None):
+        self.worker = worker
+        self.concurrency = concurrency or int(os.getenv("RESEARCH_CONCURRENCY", "0"))
+        self.results: Dict[str, Any] = {}
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._sem: Optional[asyncio.Semaphore] = None
+        self.stats_data = {"requests": 0, "runs": 0, "memo_hits": 0, "joined_in_flight": 0, "run_ms": 0.0}
+
+    async def _slots(self) -> asyncio.Semaphore:
+        if self._sem is None:
+            limit = self.concurrency
+            if not limit:
+                limit = max(1, len(await get_device_pool().discover()))
+            self._sem = asyncio.Semaphore(limit)
+        return self._sem
+
+    async def _run(self, key: str, item: str) -> Any:
+        sem = await self._slots()
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                result = await self.worker(item)
+            finally:
+                self.stats_data["runs"] += 1
+                self.stats_data["run_ms"] += (time.perf_counter() - t0) * 1000
+                self._in_flight.pop(key, None)
+        self.results[key] = result
+        return result
+
+    async def get(self, item: str) -> Any:
+        """Result for `item`, researching it only if no equivalent item was done or is running."""
+        self.stats_data["requests"] += 1
+        key = normalize_item(item)
+        if key in self.results:
+            self.stats_data["memo_hits"] += 1
+            print(f"[ResearchQueue] '{item}' already researched. Reusing.")
+            return self.results[key]
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.stats_data["joined_in_flight"] += 1
+            print(f"[ResearchQueue] '{item}' is being researched. Waiting for that result.")
+        else:
+            task = asyncio.ensure_future(self._run(key, item))
+            self._in_flight[key] = task
+        # shield: one cancelled waiter must not cancel the run the others wait on
+        return await asyncio.shield(task)
+
+    def remember(self, item: str, result: Any):
+        """Seeds a result found earlier (e.g. loaded from a checkpoint)."""
+        self.results.setdefault(normalize_item(item), result)
+
+    async def research_all(self, items: Iterable[str]) -> Dict[str, Any]:
+        """Researches every unique item (in parallel) and returns {item: result} for all of them."""
+        items = list(items)
+        results = await asyncio.gather(*(self.get(i) for i in items), return_exceptions=True)
+        out = {}
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                print(f"[ResearchQueue] Research for '{item}' failed: {result}")
+                result = None
+            out[item] = result
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        s = dict(self.stats_data)
+        s["unique_items"] = len(self.results)
+        s["run_ms"] = round(s["run_ms"], 1)
+        return s
@@ -0,0 +1,95 @@
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageChops
+
+HASH_SIZE = 16                 # 16x16 horizontal + vertical difference hash -> 512 bits
+THUMB_SIZE = (216, 480)        # portrait greyscale copy used for pixel diffs (1/5 of a 1080x2400 screen)
+PIXEL_DELTA = 16               # grey levels a thumbnail pixel must move to count as changed
+TILE = 12                      # pixel diffs are judged per 12x12 tile, so a small local change is not averaged away
+TILE_CHANGED_PIXELS = 3        # changed pixels that make a tile (and so the screen) count as changed
+STATUS_BAR = 0.05              # top fraction of the screen ignored by diffs (clock, battery, notification icons)
+SAME_SCREEN_BITS = 6           # hamming distance under which two hashes are the same screen
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: sign of horizontal and vertical gradients on a tiny greyscale copy."""
+    side = hash_size + 1
+    px = list(image.convert("L").resize((side, side), Image.BILINEAR).getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            here = px[row * side + col]
+            bits = (bits << 1) | (here > px[row * side + col + 1])
+            bits = (bits << 1) | (here > px[(row + 1) * side + col])
+    return bits
+
+
+def thumbnail(image: Image.Image) -> bytes:
+    return image.convert("L").resize(THUMB_SIZE, Image.BILINEAR).tobytes()
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def changed_tiles(thumb_a: bytes, thumb_b: bytes) -> int:
+    """
+    Number of TILE x TILE regions below the status bar where at least TILE_CHANGED_PIXELS pixels
+    moved by more than PIXEL_DELTA. A ticked checkbox, a stepper going 1 -> 2 or one new digit
+    is a single tile, which a whole-screen changed-pixel ratio would round down to "identical".
+    """
+    width, height = THUMB_SIZE
+    if not thumb_a or not thumb_b or len(thumb_a) != len(thumb_b) or len(thumb_a) != width * height:
+        return width * height
+    box = (0, int(height * STATUS_BAR), width, height)
+    a = Image.frombytes("L", THUMB_SIZE, thumb_a).crop(box)
+    b = Image.frombytes("L", THUMB_SIZE, thumb_b).crop(box)
+    moved = ImageChops.difference(a, b).point(lambda v: 255 if v > PIXEL_DELTA else 0)
+    # reduce() averages each tile, so a tile's value is 255 * (changed pixels) / TILE**2
+    limit = 255 * TILE_CHANGED_PIXELS // (TILE * TILE)
+    return sum(moved.reduce(TILE).histogram()[limit:])
+
+
+def is_unchanged(frame_a, frame_b) -> bool:
+    """True when two captured frames show the same screen (the last action did nothing)."""
+    if frame_a is None or frame_b is None:
+        return False
+    if hamming(frame_a.phash, frame_b.phash) > SAME_SCREEN_BITS:
+        return False
+    return changed_tiles(frame_a.thumb, frame_b.thumb) == 0
+
+
+class ScreenCache:
+    """
+    Per-mission plan memo keyed by (goal step, screen hash).
+    Also counts the planner calls it saved so missions can report them.
+    """
+
+    def __init__(self):
+        self.plans: Dict[Tuple[str, int], Tuple[bytes, Dict]] = {}
+        self.llm_calls = 0
+        self.llm_calls_saved = 0
+
+    def lookup(self, goal_step: str, frame) -> Optional[Dict]:
+        """Plan for this goal step on the same screen (hash close AND no changed tile), if any."""
+        for (step, h), (thumb, plan) in self.plans.items():
+            if step != goal_step or hamming(h, frame.phash) > SAME_SCREEN_BITS:
+                continue
+            # Only the status bar may differ (clock tick, new notification icon).
+            if changed_tiles(thumb, frame.thumb) == 0:
+                self.llm_calls_saved += 1
+                return plan
+        return None
+
+    def store(self, goal_step: str, frame, plan: Dict):
+        self.llm_calls += 1
+        # Terminal/failed plans are not worth replaying.
+        if plan.get("status") == "continue" or plan.get("status") is None:
+            self.plans[(goal_step, frame.phash)] = (frame.thumb, plan)
+
+    def record_local_recovery(self):
+        """A re-plan that was avoided by retrying/escalating locally on an identical screen."""
+        self.llm_calls_saved += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"llm_calls": self.llm_calls, "llm_calls_saved": self.llm_calls_saved, "memoized_screens": len(self.plans)}
@@ -0,0 +1,166 @@
+import io
+import os
+import math
+import time
+import asyncio
+from typing import Optional, Tuple
+
+from PIL import Image
+
+from neurorun.screen_cache import dhash, thumbnail, is_unchanged
+from neurorun.adb_transport import AdbTransport
+
+# Gemini bills an image as 258 tokens per 768x768 tile (images <= 384px on both sides are a single tile).
+TOKENS_PER_TILE = 258
+TILE_SIZE = 768
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv("NEURO_IMAGE_TOKEN_BUDGET", str(2 * TOKENS_PER_TILE)))
+DEFAULT_FORMAT = os.getenv("NEURO_IMAGE_FORMAT", "JPEG").upper()  # JPEG | WEBP
+DEFAULT_QUALITY = int(os.getenv("NEURO_IMAGE_QUALITY", "70"))
+DEBUG_DIR = os.getenv("NEURO_DEBUG_DIR", "neuro_debug")
+
+
+def image_tokens(width: int, height: int) -> int:
+    """Estimated Gemini token cost of an image of this size."""
+    if width <= 384 and height <= 384:
+        return TOKENS_PER_TILE
+    return math.ceil(width / TILE_SIZE) * math.ceil(height / TILE_SIZE) * TOKENS_PER_TILE
+
+
+def fit_to_budget(width: int, height: int, token_budget: int) -> Tuple[int, int]:
+    """Largest size with the same aspect ratio whose tile count fits the token budget."""
+    max_tiles = max(1, token_budget // TOKENS_PER_TILE)
+    if image_tokens(width, height) <= max_tiles * TOKENS_PER_TILE:
+        return width, height
+
+    best = (1, 1)
+    # Try every tile grid that fits and keep the one that preserves the most pixels.
+    for cols in range(1, max_tiles + 1):
+        rows = max_tiles // cols
+        scale = min(cols * TILE_SIZE / width, rows * TILE_SIZE / height, 1.0)
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        if size[0] * size[1] > best[0] * best[1]:
+            best = size
+    return best
+
+
+class CapturedFrame:
+    """One screenshot, already downscaled and encoded for the model."""
+
+    def __init__(self, image: Image.Image, data: bytes, mime_type: str,
+                 native_size: Tuple[int, int], capture_ms: float, encode_ms: float,
+                 phash: int = 0, thumb: bytes = b""):
+        self.image = image
+        self.data = data
+        self.mime_type = mime_type
+        self.native_size = native_size
+        self.capture_ms = capture_ms
+        self.encode_ms = encode_ms
+        self.phash = phash
+        self.thumb = thumb
+        self.timestamp = time.time()
+
+    @property
+    def tokens(self) -> int:
+        return image_tokens(*self.image.size)
+
+    def as_part(self) -> dict:
+        """Inline blob accepted by google.generativeai content lists."""
+        return {"mime_type": self.mime_type, "data": self.data}
+
+    def __repr__(self):
+        return (f"CapturedFrame({self.native_size[0]}x{self.native_size[1]} -> "
+                f"{self.image.size[0]}x{self.image.size[1]}, {len(self.data) // 1024}KB {self.mime_type}, "
+                f"~{self.tokens} tok)")
+
+
+class ScreenCapture:
+    """
+    In-memory screenshot pipeline.
+    Streams `exec-out screencap -p` into memory, decodes/downscales/encodes in a worker thread
+    and only touches the disk when debugging is enabled.
+    """
+
+    def __init__(self, serial: Optional[str] = None, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 image_format: str = DEFAULT_FORMAT, quality: int = DEFAULT_QUALITY,
+                 debug: Optional[bool] = None):
+        self.serial = serial
+        self.adb = AdbTransport.for_device(serial)
+        self.token_budget = token_budget
+        self.image_format = "WEBP" if image_format.upper() == "WEBP" else "JPEG"
+        self.quality = quality
+        if debug is None:
+            debug = os.getenv("NEURO_DEBUG_SCREENSHOTS", "False").lower() == "true"
+        self.debug = debug
+
+    async def _read_png(self) -> bytes:
+        out = await self.adb.exec_out("screencap", "-p", timeout=15)
+        if not out:
+            raise RuntimeError("screencap returned no data")
+        return out
+
+    def _process(self, png: bytes) -> Tuple[Image.Image, bytes, Tuple[int, int], int, bytes]:
+        """CPU-bound part: decode, downscale, encode and fingerprint. Runs off the event loop."""
+        img = Image.open(io.BytesIO(png))
+        img.load()
+        native = img.size
+        img = img.convert("RGB")
+
+        target = fit_to_budget(*native, self.token_budget)
+        if target != native:
+            img = img.resize(target, Image.LANCZOS)
+
+        buf = io.BytesIO()
+        img.save(buf, format=self.image_format, quality=self.quality)
+        phash, thumb = dhash(img), thumbnail(img)
+
+        if self.debug:
+            os.makedirs(DEBUG_DIR, exist_ok=True)
+            with open(os.path.join(DEBUG_DIR, f"neuro_state_{int(time.time() * 1000)}.png"), "wb") as f:
+                f.write(png)
+        return img, buf.getvalue(), native, phash, thumb
+
+    async def _to_frame(self, png: bytes, capture_ms: float) -> CapturedFrame:
+        t0 = time.perf_counter()
+        img, data, native, phash, thumb = await asyncio.to_thread(self._process, png)
+        encode_ms = (time.perf_counter() - t0) * 1000
+        mime = "image/webp" if self.image_format == "WEBP" else "image/jpeg"
+        return CapturedFrame(img, data, mime, native, capture_ms, encode_ms, phash, thumb)
+
+    async def _timed_read(self) -> Tuple[bytes, float]:
+        t0 = time.perf_counter()
+        png = await self._read_png()
+        return png, (time.perf_counter() - t0) * 1000
+
+    async def capture(self) -> Optional[CapturedFrame]:
+        try:
+            png, capture_ms = await self._timed_read()
+            return await self._to_frame(png, capture_ms)
+        except Exception as e:
+            print(f"Screenshot failed: {e}")
+            return None
+
+    async def capture_settled(self, min_delay: float = 0.3, timeout: float = 3.0) -> Optional[CapturedFrame]:
+        """
+        Returns the first frame once the UI stops changing (two consecutive frames match),
+        or the latest frame after `timeout`. Reading frame k+1 from the device overlaps
+        decoding/encoding frame k in the worker thread.
+        """
+        await asyncio.sleep(min_delay)
+        deadline = time.perf_counter() + timeout
+        last: Optional[CapturedFrame] = None
+        pending = asyncio.create_task(self._timed_read())
+        try:
+            while True:
+                png, capture_ms = await pending
+                pending = asyncio.create_task(self._timed_read()) if time.perf_counter() < deadline else None
+                frame = await self._to_frame(png, capture_ms)
+                if pending is None or (last is not None and is_unchanged(last, frame)):
+                    return frame
+                last = frame
+        except Exception as e:
+            print(f"Screenshot failed: {e}")
+            return last
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
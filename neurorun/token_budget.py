@@ -0,0 +1,113 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from neurorun.llm_gateway import estimate_tokens
+
+
+def compact_action(action: Dict[str, Any]) -> str:
+    """One short line per action instead of the full action dict."""
+    kind = action.get("type", "?")
+    if kind == "tap":
+        box = action.get("bq_box")
+        if box and len(box) == 4:
+            return f"tap@({int((box[1] + box[3]) / 2)},{int((box[0] + box[2]) / 2)})"
+        return "tap"
+    if kind == "type":
+        return f"type '{str(action.get('text', ''))[:40]}'"
+    if kind == "key":
+        return f"key {action.get('keycode', '')}"
+    return kind
+
+
+class TokenBudget:
+    """
+    Keeps the planner prompt flat as missions get longer.
+    - The last `recent` actions are kept verbatim (compact form).
+    - Older actions are folded into a rolling summary (counts + typed text).
+    - Prompt, image and output tokens are counted per step and per mission.
+    Call `reset()` at the start of every mission.
+    """
+
+    def __init__(self, recent: int = 4, max_history_tokens: int = 200):
+        self.recent = recent
+        self.max_history_tokens = max_history_tokens
+        self.reset()
+
+    def reset(self):
+        self.actions: List[str] = []
+        self._folded: Counter = Counter()
+        self._folded_typed: List[str] = []
+        self._folded_count = 0
+        self.steps: List[Dict[str, Any]] = []
+
+    # --- History ---
+
+    def record_action(self, action: Dict[str, Any], outcome: Optional[str] = None):
+        line = compact_action(action)
+        if outcome:
+            line += f" -> {outcome}"
+        self.actions.append(line)
+        while len(self.actions) > self.recent:
+            self._fold(self.actions.pop(0))
+
+    def _fold(self, line: str):
+        self._folded_count += 1
+        kind = line.split("@")[0].split(" ")[0]
+        self._folded[kind] += 1
+        if kind == "type":
+            self._folded_typed.append(line.split("'")[1] if "'" in line else "")
+            self._folded_typed = self._folded_typed[-3:]
+
+    def summary(self) -> str:
+        if not self._folded_count:
+            return ""
+        counts = ", ".join(f"{k} x{v}" for k, v in self._folded.most_common())
+        typed = f"; typed {', '.join(repr(t) for t in self._folded_typed)}" if self._folded_typed else ""
+        return f"{self._folded_count} earlier actions ({counts}{typed})"
+
+    def history_text(self) -> str:
+        parts = []
+        summary = self.summary()
+        if summary:
+            parts.append(f"Earlier: {summary}.")
+        if self.actions:
+            start = self._folded_count + 1
+            parts.append("Recent: " + "; ".join(f"{start + i}) {a}" for i, a in enumerate(self.actions)))
+        text = " ".join(parts) or "None yet."
+        # Hard cap in case typed text is long
+        max_chars = self.max_history_tokens * 4
+        return text if len(text) <= max_chars else "..." + text[-max_chars:]
+
+    # --- Accounting ---
+
+    def record_step(self, prompt: str, image_tokens: int, response: Any = None):
+        usage = getattr(response, "usage_metadata", None) if response is not None else None
+        cached = bool(getattr(response, "from_cache", False))
+        prompt_tokens = estimate_tokens(prompt)
+        output_tokens = 0
+        if usage is not None:
+            billed = getattr(usage, "prompt_token_count", None)
+            if billed:
+                # Billed prompt count includes the image; split it back out.
+                prompt_tokens = max(0, billed - image_tokens)
+            output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+        elif response is not None and not cached:
+            output_tokens = estimate_tokens(getattr(response, "text", ""))
+
+        self.steps.append({
+            "prompt_tokens": 0 if cached else prompt_tokens,
+            "image_tokens": 0 if cached else image_tokens,
+            "output_tokens": 0 if cached else output_tokens,
+            "cached": cached,
+        })
+
+    def usage(self) -> Dict[str, Any]:
+        totals = {k: sum(s[k] for s in self.steps) for k in ("prompt_tokens", "image_tokens", "output_tokens")}
+        totals["total_tokens"] = sum(totals.values())
+        totals["llm_steps"] = len(self.steps)
+        totals["cached_steps"] = sum(1 for s in self.steps if s["cached"])
+        billed = [s for s in self.steps if not s["cached"]]
+        totals["avg_tokens_per_call"] = round(
+            sum(s["prompt_tokens"] + s["image_tokens"] + s["output_tokens"] for s in billed) / len(billed)
+        ) if billed else 0
+        return totals
@@ -0,0 +1,338 @@
+import re
+import sys
+import json
+import asyncio
+import argparse
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Any, Optional
+
+from neurorun.adb_transport import AdbTransport
+
+# Structured fields the agents care about. Anything else still goes through vision.
+FIELDS = ["title", "price", "rating", "restaurant", "ride_type", "eta"]
+
+PRICE_PATTERN = r"(?:₹|Rs\.?|INR)\s?[\d,]+(?:\.\d+)?"
+RATING_PATTERN = r"^\s*([0-5](?:\.\d)?)\s*★?\s*$"
+ETA_PATTERN = r"\d+\s?(?:min|mins|minutes)\b(?:\s*away)?"
+
+# --- Selector Recipes ---
+# A selector is a dict of regexes matched against node attributes:
+#   "id"    -> resource-id          "text"  -> text
+#   "desc"  -> content-desc         "class" -> class name
+#   "value" -> regex applied to text/desc to pull out the value (group 1 if present)
+# A recipe maps each field to an ordered list of selectors (first hit wins).
+# "card" (optional) selects the container of one result so every card becomes a record. Without it
+# (or when it matches nothing) each price's own container is found from the tree; a record never
+# mixes nodes from two results.
+GENERIC_RECIPE = {
+    "fields": {
+        "price": [{"text": PRICE_PATTERN, "value": f"({PRICE_PATTERN})"},
+                  {"desc": PRICE_PATTERN, "value": f"({PRICE_PATTERN})"}],
+        "rating": [{"text": RATING_PATTERN, "value": RATING_PATTERN}],
+        "eta": [{"text": ETA_PATTERN, "value": f"({ETA_PATTERN})"}],
+    }
+}
+
+APP_RECIPES: Dict[str, Dict[str, Any]] = {
+    "Zomato": {
+        "card": {"id": r"(dish|menu_item|search_result)_?(card|container|item)"},
+        "fields": {
+            "title": [{"id": r"(dish|item)_?(name|title)"}],
+            "price": [{"id": r"(dish|item)_?price", "value": r"([\d,.]+)"}] + GENERIC_RECIPE["fields"]["price"],
+            "rating": [{"id": r"rating"}] + GENERIC_RECIPE["fields"]["rating"],
+            "restaurant": [{"id": r"(res|restaurant)_?name"}],
+        },
+    },
+    "Swiggy": {
+        "card": {"id": r"(item|dish)_?(card|container|layout)"},
+        "fields": {
+            "title": [{"id": r"(item|dish)_?(name|title)"}],
+            "price": [{"id": r"(item|dish|final)_?price", "value": r"([\d,.]+)"}] + GENERIC_RECIPE["fields"]["price"],
+            "rating": [{"id": r"rating"}] + GENERIC_RECIPE["fields"]["rating"],
+            "restaurant": [{"id": r"(restaurant|rest)_?name"}],
+        },
+    },
+    "Amazon": {
+        "card": {"id": r"search_result|s-result"},
+        "fields": {
+            "title": [{"id": r"(product_?title|title_feature_div|item_title)"}],
+            "price": [{"id": r"price", "value": r"([\d,.]+)"}] + GENERIC_RECIPE["fields"]["price"],
+            "rating": [{"desc": r"out of 5 stars", "value": r"([0-5](?:\.\d)?) out of 5"}],
+        },
+    },
+    "Flipkart": {
+        "fields": {
+            "title": [{"id": r"product_?(title|name)"}],
+            "price": [{"id": r"(final_?price|selling_?price)", "value": r"([\d,.]+)"}] + GENERIC_RECIPE["fields"]["price"],
+            "rating": [{"id": r"rating"}] + GENERIC_RECIPE["fields"]["rating"],
+        },
+    },
+    "Uber": {
+        "card": {"id": r"(product|vehicle)_?(cell|row|item)"},
+        "fields": {
+            "ride_type": [{"id": r"(product|vehicle)_?(name|title)"}, {"text": r"^Uber\s?\w+|^Moto$|^Auto$|^Premier$"}],
+            "price": [{"id": r"fare|price", "value": r"([\d,.]+)"}] + GENERIC_RECIPE["fields"]["price"],
+            "eta": [{"id": r"eta|pickup_?time"}] + GENERIC_RECIPE["fields"]["eta"],
+        },
+    },
+    "Ola": {
+        "card": {"id": r"(category|cab)_?(item|row|card)"},
+        "fields": {
+            "ride_type": [{"id": r"(category|cab)_?(name|title)"}, {"text": r"^(Mini|Prime\s?Sedan|Prime|Auto|Bike)$"}],
+            "price": [{"id": r"fare|price", "value": r"([\d,.]+)"}] + GENERIC_RECIPE["fields"]["price"],
+            "eta": [{"id": r"eta"}] + GENERIC_RECIPE["fields"]["eta"],
+        },
+    },
+}
+
+
+def parse_bounds(bounds: str) -> List[int]:
+    """'[0,63][1080,200]' -> [0, 63, 1080, 200]"""
+    nums = re.findall(r"-?\d+", bounds or "")
+    return [int(n) for n in nums[:4]] if len(nums) >= 4 else [0, 0, 0, 0]
+
+
+class UINode:
+    """One node of the uiautomator view hierarchy."""
+
+    __slots__ = ("index", "text", "resource_id", "class_name", "package", "desc",
+                 "bounds", "clickable", "focused", "parent", "children")
+
+    def __init__(self, index: int, attrib: Dict[str, str], parent: Optional["UINode"] = None):
+        self.index = index
+        self.text = attrib.get("text", "")
+        self.resource_id = attrib.get("resource-id", "")
+        self.class_name = attrib.get("class", "")
+        self.package = attrib.get("package", "")
+        self.desc = attrib.get("content-desc", "")
+        self.bounds = parse_bounds(attrib.get("bounds", ""))
+        self.clickable = attrib.get("clickable") == "true"
+        self.focused = attrib.get("focused") == "true"
+        self.parent = parent
+        self.children: List["UINode"] = []
+
+    @property
+    def label(self) -> str:
+        return self.text or self.desc
+
+    def descendants(self) -> List["UINode"]:
+        out, stack = [], list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            out.append(node)
+            stack.extend(reversed(node.children))
+        return out
+
+    def __repr__(self):
+        return f"UINode({self.index}, id={self.resource_id!r}, text={self.label[:30]!r})"
+
+
+class UIIndex:
+    """Flattened, document-ordered index of a hierarchy dump."""
+
+    def __init__(self, xml_text: str):
+        self.nodes: List[UINode] = []
+        self.root: Optional[UINode] = None
+        self.packages = set()
+        root_el = ET.fromstring(xml_text)
+        self.root = self._build(root_el, None)
+
+    def _build(self, el, parent: Optional[UINode]) -> UINode:
+        node = UINode(len(self.nodes), el.attrib, parent)
+        self.nodes.append(node)
+        if node.package:
+            self.packages.add(node.package)
+        for child in el:
+            if child.tag == "node":
+                node.children.append(self._build(child, node))
+        return node
+
+    @property
+    def focused_input(self) -> Optional[UINode]:
+        for node in self.nodes:
+            if node.focused and "EditText" in node.class_name:
+                return node
+        return None
+
+    def find(self, selector: Dict[str, str], scope: Optional[UINode] = None) -> List[UINode]:
+        """All nodes (in document order) matching every regex in the selector."""
+        candidates = scope.descendants() if scope else self.nodes
+        checks = []
+        for key, attr in (("id", "resource_id"), ("text", "text"), ("desc", "desc"), ("class", "class_name")):
+            if key in selector:
+                checks.append((attr, re.compile(selector[key], re.IGNORECASE)))
+        return [n for n in candidates if all(rx.search(getattr(n, attr)) for attr, rx in checks)]
+
+
+def _value_of(node: UINode, selector: Dict[str, str]) -> Optional[str]:
+    raw = node.label.strip()
+    if not raw:
+        return None
+    if "value" in selector:
+        m = re.search(selector["value"], raw, re.IGNORECASE)
+        if not m:
+            return None
+        return (m.group(1) if m.groups() else m.group(0)).strip()
+    return raw
+
+
+def _extract_record(index: UIIndex, recipe: Dict[str, Any], fields: List[str], scope: UINode) -> Dict[str, str]:
+    record = {}
+    for field in fields:
+        for selector in recipe["fields"].get(field, []):
+            for node in index.find(selector, scope):
+                value = _value_of(node, selector)
+                if value:
+                    record[field] = value
+                    break
+            if field in record:
+                break
+    return record
+
+
+def _matches(index: UIIndex, selectors: List[Dict[str, str]]) -> List[UINode]:
+    seen, out = set(), []
+    for selector in selectors:
+        for node in index.find(selector):
+            if node.index not in seen and _value_of(node, selector):
+                seen.add(node.index)
+                out.append(node)
+    return out
+
+
+def _infer_cards(index: UIIndex, recipe: Dict[str, Any]) -> List[UINode]:
+    """
+    Containers of one result each, for recipes/screens without a matching card selector.
+    Walks up from every price node to the smallest ancestor that also holds a title (or ride type)
+    and no other price. Prices with no such ancestor yield no card rather than a mixed record.
+    """
+    prices = _matches(index, recipe["fields"].get("price", []))
+    price_ids = {n.index for n in prices}
+    label_selectors = recipe["fields"].get("title", []) + recipe["fields"].get("ride_type", [])
+    label_ids = {n.index for n in _matches(index, label_selectors)}
+    cards, seen = [], set()
+    for price in prices:
+        card, node = None, price.parent
+        while node is not None:
+            inside = {n.index for n in node.descendants()}
+            if len(inside & price_ids) > 1:
+                break
+            card = node
+            if label_ids and inside & label_ids:
+                break
+            node = node.parent
+        if card is None or (label_ids and not {n.index for n in card.descendants()} & label_ids):
+            continue
+        if card.index not in seen:
+            seen.add(card.index)
+            cards.append(card)
+    return cards
+
+
+def _innermost(cards: List[UINode]) -> List[UINode]:
+    """Drops cards that contain another matched card (nested containers)."""
+    ids = {c.index for c in cards}
+    return [c for c in cards if not any(d.index in ids for d in c.descendants())]
+
+
+def _tokens(text: str) -> set:
+    return {t.rstrip("s") for t in re.findall(r"[a-z0-9]+", text.lower()) if len(t) > 2}
+
+
+def _relevant(records: List[Dict[str, str]], query: str) -> List[Dict[str, str]]:
+    """Records whose title/restaurant share the most words with the query (none if no word matches)."""
+    wanted = _tokens(query)
+    if not wanted:
+        return records
+    scored = [(len(wanted & _tokens(f"{r.get('title', '')} {r.get('restaurant', '')} {r.get('ride_type', '')}")), r)
+              for r in records]
+    best = max((score for score, _ in scored), default=0)
+    return [r for score, r in scored if best and score == best]
+
+
+def extract_from_xml(app_name: str, xml_text: str, fields: Optional[List[str]] = None,
+                     query: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Pure (offline) extraction: runs the app's selector recipe over a hierarchy dump.
+    Returns { "records": [...], "missing": [...], "source": "hierarchy" }; every record comes from
+    one result card. With `query`, only the cards that best match it are kept.
+    A field is 'missing' when no record has it, which is the caller's cue to fall back to vision.
+    """
+    fields = fields or FIELDS
+    recipe = APP_RECIPES.get(app_name, GENERIC_RECIPE)
+
+    try:
+        index = UIIndex(xml_text)
+    except ET.ParseError as e:
+        print(f"[UIExtractor] Bad hierarchy dump: {e}")
+        return {"records": [], "missing": list(fields), "source": "hierarchy"}
+
+    cards = _innermost(index.find(recipe["card"])) if recipe.get("card") else []
+    if not cards:
+        cards = _infer_cards(index, recipe)
+    records = [rec for rec in (_extract_record(index, recipe, fields, card) for card in cards) if rec]
+    if query:
+        records = _relevant(records, query)
+
+    missing = [f for f in fields if not any(f in r for r in records)]
+    return {"records": records, "missing": missing, "source": "hierarchy"}
+
+
+class UIExtractor:
+    """
+    Accessibility-tree extraction engine.
+    Dumps the view hierarchy over ADB and reads structured fields with per-app selectors,
+    so the LLM is only needed when the selectors miss.
+    """
+
+    def __init__(self, serial: Optional[str] = None):
+        self.serial = serial
+        self.adb = AdbTransport.for_device(serial)
+
+    async def dump_xml(self) -> Optional[str]:
+        """Dumps the current hierarchy straight to stdout (no file on /sdcard)."""
+        try:
+            out = await self.adb.exec_out("uiautomator", "dump", "/dev/tty", timeout=15)
+            text = out.decode("utf-8", errors="replace")
+            end = text.rfind("</hierarchy>")
+            start = text.find("<?xml")
+            if start == -1:
+                start = text.find("<hierarchy")
+            if end == -1 or start == -1:
+                print(f"[UIExtractor] No hierarchy in dump output: {text[:80]}")
+                return None
+            return text[start:end + len("</hierarchy>")]
+        except Exception as e:
+            print(f"[UIExtractor] Dump failed: {e}")
+            return None
+
+    async def extract(self, app_name: str, fields: Optional[List[str]] = None,
+                      query: Optional[str] = None) -> Dict[str, Any]:
+        xml_text = await self.dump_xml()
+        if not xml_text:
+            fields = fields or FIELDS
+            return {"records": [], "missing": list(fields), "source": "hierarchy"}
+        return extract_from_xml(app_name, xml_text, fields, query)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="UI hierarchy field extraction (offline or live)")
+    parser.add_argument("--app", required=True, help="Recipe to use (e.g. Zomato, Uber)")
+    parser.add_argument("--xml", help="Saved uiautomator dump. Omit to dump the connected device.")
+    parser.add_argument("--fields", help="Comma-separated fields (default: all)")
+    parser.add_argument("--serial", help="Device serial for live dumps")
+    parser.add_argument("--query", help="Keep only the cards matching this search (e.g. 'Margherita Pizza')")
+    args = parser.parse_args()
+
+    fields = [f.strip() for f in args.fields.split(",")] if args.fields else None
+    if args.xml:
+        with open(args.xml, encoding="utf-8") as f:
+            result = extract_from_xml(args.app, f.read(), fields, args.query)
+    else:
+        result = await UIExtractor(args.serial).extract(args.app, fields, args.query)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    return 0 if not result["missing"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,190 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+EventCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+FINISHED = ("done", "reused", "memoized")
+
+
+class StageMemo:
+    """
+    Results of workflow stages keyed by (stage, inputs), so a re-run only recomputes stages whose
+    inputs changed. Entries expire after `ttl` seconds (prices and availability go stale).
+    Empty results (None, [], {}) are never stored: they mean the stage found nothing, not an answer.
+    """
+
+    def __init__(self, ttl: Optional[float] = None, max_entries: int = 256):
+        self.ttl = ttl if ttl is not None else float(os.getenv("WORKFLOW_MEMO_TTL", "1800"))
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.time():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+        if entry:
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def put(self, key: Tuple[str, str], value: Any) -> bool:
+        if value is None or (isinstance(value, (list, tuple, dict)) and not value):
+            return False
+        self._entries[key] = (time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses, "ttl_s": self.ttl}
+
+
+class WorkflowNode:
+    """One stage: `fn(results)` gets the results of every finished stage by name."""
+
+    def __init__(self, name: str, fn: Callable[[Dict[str, Any]], Awaitable[Any]], deps: Iterable[str] = (),
+                 optional: bool = False, kind: str = "device", key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+                 complete: Optional[Callable[[Any], bool]] = None):
+        self.name = name
+        self.fn = fn
+        self.deps = list(deps)
+        self.optional = optional  # failure only skips dependants instead of failing the workflow
+        self.kind = kind          # "device" (leases a phone) or "llm" (no phone): shown in events/report
+        self.key = key            # key(results) -> the stage's inputs, for StageMemo
+        self.complete = complete  # complete(result) -> False: use the (partial) result but do not memoize it
+
+
+class WorkflowFailed(RuntimeError):
+    def __init__(self, node: str, error: BaseException, report: Dict[str, Any]):
+        super().__init__(f"Stage '{node}' failed: {error}")
+        self.node = node
+        self.error = error
+        self.report = report
+
+
+class Workflow:
+    """
+    Minimal DAG executor. Every stage starts as soon as its dependencies are done, so independent
+    stages overlap (device stages on different leased phones, LLM stages next to device stages).
+    Progress is streamed through `on_event` as node_start / node_done / node_failed / node_skipped.
+    """
+
+    def __init__(self, name: str = "workflow"):
+        self.name = name
+        self.nodes: Dict[str, WorkflowNode] = {}
+
+    def add(self, name: str, fn: Callable[[Dict[str, Any]], Awaitable[Any]], deps: Iterable[str] = (),
+            optional: bool = False, kind: str = "device",
+            key: Optional[Callable[[Dict[str, Any]], Any]] = None,
+            complete: Optional[Callable[[Any], bool]] = None) -> "Workflow":
+        deps = list(deps)
+        for dep in deps:
+            if dep not in self.nodes:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self.nodes[name] = WorkflowNode(name, fn, deps, optional, kind, key, complete)
+        return self
+
+    async def run(self, on_event: Optional[EventCallback] = None, results: Optional[Dict[str, Any]] = None,
+                  memo: Optional[StageMemo] = None) -> Dict[str, Any]:
+        """
+        Runs every stage and returns {"results": {...}, "report": {...}}.
+        Stages already present in `results` are treated as done and not run again; with a `memo`,
+        stages whose key(inputs) was computed before are served from it ("memoized").
+        Raises WorkflowFailed (after cancelling running stages) when a required stage fails.
+        """
+        t0 = time.perf_counter()
+        results = dict(results or {})
+        timings: Dict[str, Dict[str, Any]] = {n: {"status": "reused", "kind": self.nodes[n].kind}
+                                              for n in results if n in self.nodes}
+        running: Dict[asyncio.Task, str] = {}
+        memo_keys: Dict[str, Tuple[str, str]] = {}
+
+        async def emit(event: Dict[str, Any]):
+            event["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            if on_event:
+                try:
+                    await on_event(event)
+                except Exception as e:
+                    print(f"[Workflow] Event callback failed: {e}")
+
+        async def run_node(node: WorkflowNode):
+            start = time.perf_counter()
+            timings[node.name]["start_ms"] = round((start - t0) * 1000, 1)
+            await emit({"type": "node_start", "node": node.name, "kind": node.kind})
+            try:
+                return await node.fn(results)
+            finally:
+                timings[node.name]["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+        def report() -> Dict[str, Any]:
+            wall = (time.perf_counter() - t0) * 1000
+            serial = sum(t.get("duration_ms", 0.0) for t in timings.values())
+            return {"workflow": self.name, "wall_ms": round(wall, 1), "serial_ms": round(serial, 1),
+                    "parallel_speedup": round(serial / wall, 2) if wall > 0 else 0.0, "stages": timings}
+
+        while True:
+            progressed = True
+            while progressed:  # memo hits finish instantly and can unblock later stages in the same pass
+                progressed = False
+                for node in self.nodes.values():
+                    if node.name in timings:
+                        continue
+                    blocked = [d for d in node.deps if timings.get(d, {}).get("status") in ("failed", "skipped")]
+                    if blocked:
+                        timings[node.name] = {"status": "skipped", "kind": node.kind}
+                        results[node.name] = None
+                        await emit({"type": "node_skipped", "node": node.name, "reason": f"{blocked[0]} did not finish"})
+                        progressed = True
+                        continue
+                    if not all(timings.get(d, {}).get("status") in FINISHED for d in node.deps):
+                        continue
+                    if memo is not None and node.key:
+                        memo_keys[node.name] = (node.name, repr(node.key(results)))
+                        hit, value = memo.get(memo_keys[node.name])
+                        if hit:
+                            results[node.name] = value
+                            timings[node.name] = {"status": "memoized", "kind": node.kind}
+                            await emit({"type": "node_done", "node": node.name, "kind": node.kind, "result": value,
+                                        "duration_ms": 0.0, "memoized": True})
+                            progressed = True
+                            continue
+                    timings[node.name] = {"status": "running", "kind": node.kind}
+                    running[asyncio.ensure_future(run_node(node))] = node.name
+            if not running:
+                break
+
+            finished, _ = await asyncio.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                name = running.pop(task)
+                node = self.nodes[name]
+                error = task.exception()
+                if error is None:
+                    results[name] = task.result()
+                    timings[name]["status"] = "done"
+                    if name in memo_keys and (node.complete is None or node.complete(results[name])):
+                        memo.put(memo_keys[name], results[name])
+                    await emit({"type": "node_done", "node": name, "kind": node.kind, "result": results[name],
+                                "duration_ms": timings[name]["duration_ms"]})
+                    continue
+                timings[name]["status"] = "failed"
+                timings[name]["error"] = str(error)
+                results[name] = None
+                await emit({"type": "node_failed", "node": name, "error": str(error), "optional": node.optional})
+                if not node.optional:
+                    for other in running:
+                        other.cancel()
+                    await asyncio.gather(*running, return_exceptions=True)
+                    for other_name in running.values():
+                        timings[other_name]["status"] = "cancelled"
+                    raise WorkflowFailed(name, error, report())
+
+        final = report()
+        await emit({"type": "workflow_done", "report": final})
+        return {"results": results, "report": final}
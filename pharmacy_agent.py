@@ -11,6 +11,10 @@ from dotenv import load_dotenv
 from droidrun.agent.droid.droid_agent import DroidAgent
 from droidrun.agent.utils.llm_picker import load_llm
 from droidrun import AdbTools
+from neurorun.device_pool import get_device_pool, DeviceLease
+from neurorun.app_registry import resolve_package
+from neurorun.device_primitives import DevicePrimitives
+from neurorun.ranking import BASKET_CRITERIA, rank_offers
 # except ImportError:
 #     print("CRITICAL ERROR: 'droidrun' library not found or incompatible version.")
 #     print("Please ensure you have installed it: pip install droidrun")
@@ -43,7 +47,17 @@ class PharmacyAgent:
             return float('inf')
 
     async def execute_task(self, app_name: str, medicine: str, role: str) -> dict:
+        """Leases a free device from the pool and runs the medicine search on it."""
+        async with get_device_pool().lease(f"patient:{app_name}", package=resolve_package(app_name)) as device:
+            return await self._execute_on_device(device, app_name, medicine, role)
+
+    async def _execute_on_device(self, device: DeviceLease, app_name: str, medicine: str, role: str) -> dict:
         print(f"\n[PharmaAgent] Initializing Task for: {app_name} - {medicine} ({role} mode)")
+
+        # Launch the app directly (am start -n) so the agent doesn't have to find its icon
+        primitives = DevicePrimitives(device.serial)
+        launched = (await primitives.launch_app(app_name))["status"] == "success"
+        open_step = f"The app '{app_name}' is already open. " if launched else f"Open the app '{app_name}'. "
         
         # Mode-specific instructions
         if role == "pharmacist":
@@ -58,7 +72,7 @@ class PharmacyAgent:
             report_instruction = "Report the Price."
 
         goal = (
-            f"Open the app '{app_name}'. "
+            f"{open_step}"
             f"If a 'Location Permission' popup appears, click 'While using the app' or 'Allow'. "
             f"Click on the search bar. "
             f"{search_instruction} "
@@ -78,7 +92,7 @@ class PharmacyAgent:
             api_key=api_key
         )
 
-        tools = await AdbTools.create()
+        tools = await AdbTools.create(serial=device.serial)
 
         agent = DroidAgent(
             goal=goal,
@@ -212,27 +226,29 @@ class PharmacyAgent:
             await asyncio.sleep(3)
 
         print(f"\n--- Final Aggregated Basket Results ---")
-        best_option = None
-        min_total = float('inf')
-
+        baskets = []
         for app, result in app_totals.items():
             if result.get("status") != "incomplete":
                 total = result["total_cost"]
                 print(f"{app}: Total Basket = ₹{total:.2f}")
                 for item in result["items"]:
                     print(f"  - {item['name']}: ₹{item['unit_price']} x {item['qty']}")
-                
-                if total < min_total:
-                    min_total = total
-                    best_option = {"app": app, "total": total, "items": result["items"]}
+                baskets.append({"app": app, "total": total, "items": result["items"]})
             else:
                 print(f"{app}: Incomplete Basket")
 
+        # Complete baskets ranked by total (equal totals are reported as a tie)
+        ranked = rank_offers(baskets, BASKET_CRITERIA, required=("total",))
+        best_option = {k: ranked[0][k] for k in ("app", "total", "items")} if ranked else None
+
         if best_option:
-            print(f"\n🏆 Best Basket Deal: {best_option['app']} - ₹{best_option['total']:.2f}")
+            tie = " (tie)" if ranked[0]["tied"] else ""
+            print(f"\n🏆 Best Basket Deal: {best_option['app']} - ₹{best_option['total']:.2f}{tie}")
         else:
             print("\n❌ Could not determine best basket option.")
 
+        return {"best_option": best_option, "ranked": ranked, "baskets": app_totals}
+
 async def main():
     parser = argparse.ArgumentParser(description="Pharmacy Agent (Basket Comparison)")
     parser.add_argument("--meds", required=True, help="List of medicines 'Name:Qty, Name:Qty'")
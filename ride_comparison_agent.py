@@ -4,6 +4,7 @@ import argparse
 import asyncio
 import re
 import sys
+from typing import Optional
 from dotenv import load_dotenv
 
 # --- DroidRun Professional Architecture Imports ---
@@ -11,6 +12,11 @@ from dotenv import load_dotenv
 from droidrun.agent.droid.droid_agent import DroidAgent
 from droidrun.agent.utils.llm_picker import load_llm
 from droidrun import AdbTools
+from neurorun.ui_extractor import UIExtractor
+from neurorun.device_pool import get_device_pool, DeviceLease
+from neurorun.app_registry import resolve_package
+from neurorun.device_primitives import DevicePrimitives
+from neurorun.ranking import RIDE_CRITERIA, rank_offers
 # except ImportError:
 #     print("CRITICAL ERROR: 'droidrun' library not found or incompatible version.")
 #     print("Please ensure you have installed it: pip install droidrun")
@@ -45,12 +51,22 @@ class RideComparisonAgent:
             return float('inf')
 
     async def execute_task(self, app_name: str, pickup: str, drop: str, preference: str = "cab", action: str = "compare") -> dict:
+        """Leases a free device from the pool and runs the ride task on it."""
+        async with get_device_pool().lease(f"rider:{app_name}", package=resolve_package(app_name)) as device:
+            return await self._execute_on_device(device, app_name, pickup, drop, preference, action)
+
+    async def _execute_on_device(self, device: DeviceLease, app_name: str, pickup: str, drop: str, preference: str = "cab", action: str = "compare") -> dict:
         """
         Executes a ride check task on a specific app.
         Action: 'compare' (view prices) or 'book' (book cheapest ride via Cash).
         Preference: 'cab', 'auto', 'sedan'
         """
         print(f"\n[RideAgent] Initializing Task for: {app_name} (Action: {action}, Pref: {preference})")
+
+        # Launch the app directly (am start -n) so the agent doesn't have to find its icon
+        primitives = DevicePrimitives(device.serial)
+        launched = (await primitives.launch_app(app_name))["status"] == "success"
+        open_step = f"The app '{app_name}' is already open. " if launched else f"Open the app '{app_name}'. "
         
         # Define Goal with specific instructions for each app and permission handling
         # Map preference to specific ride types
@@ -64,7 +80,7 @@ class RideComparisonAgent:
 
         if action == "book":
             goal = (
-                f"Open the app '{app_name}'. "
+                f"{open_step}"
                 f"If a 'Location Permission' popup appears, click 'While using the app' or 'Allow'. "
                 f"Click on 'Ride' or the search bar. "
                 f"Enter pickup location: '{pickup}'. "
@@ -80,7 +96,7 @@ class RideComparisonAgent:
             )
         else:
             goal = (
-                f"Open the app '{app_name}'. "
+                f"{open_step}"
                 f"If a 'Location Permission' popup appears, click 'While using the app' or 'Allow'. "
                 f"Click on 'Ride' or the search bar to start a booking. "
                 f"Enter pickup location: '{pickup}'. "
@@ -102,8 +118,50 @@ class RideComparisonAgent:
             api_key=api_key
         )
 
-        tools = await AdbTools.create()
+        tools = await AdbTools.create(serial=device.serial)
+
+        result_data = {"app": app_name, "status": "failed", "data": {}, "numeric_price": float('inf')}
+
+        if action == "compare":
+            # Let the agent only navigate; the ride options are read from the view hierarchy.
+            nav_goal = (
+                f"{open_step}"
+                f"If a 'Location Permission' popup appears, click 'While using the app' or 'Allow'. "
+                f"Click on 'Ride' or the search bar to start a booking. "
+                f"Enter pickup location: '{pickup}'. "
+                f"Enter destination: '{drop}'. "
+                f"Wait for the ride options to load. Do NOT select or book anything. "
+                f"Return a strict JSON object: {{'status': 'ready'}}. "
+            )
+            nav = await self._run_goal(app_name, nav_goal, llm, tools)
+            if nav and str(nav.get("status", "")).lower() == "ready":
+                data = await self._extract_from_hierarchy(app_name, ride_keywords, device.serial)
+                if data:
+                    result_data["data"] = data
+                    result_data["status"] = "success"
+                    result_data["numeric_price"] = self._parse_price(data.get("price"))
+                    return result_data
+
+                # Options are on screen already: only the reading step needs vision.
+                goal = (
+                    f"The ride options are already on screen. Do NOT change pickup or destination. "
+                    f"Visually SCAN for rides matching preference '{preference}' (Look for: {ride_keywords}). "
+                    f"Extract the ride type, price, and ETA. "
+                    f"Return a strict JSON object with keys: 'app', 'ride_type', 'price', 'eta'. "
+                    f"Ensure strict JSON format."
+                )
+
+        data = await self._run_goal(app_name, goal, llm, tools)
+        if data is not None:
+            result_data["data"] = data
+            result_data["status"] = "success"
+            # Extract numeric price for comparison
+            price_val = data.get("price", "inf")
+            result_data["numeric_price"] = self._parse_price(price_val)
+        return result_data
 
+    async def _run_goal(self, app_name: str, goal: str, llm, tools):
+        """Runs one DroidAgent goal and returns its parsed JSON output (None on failure)."""
         agent = DroidAgent(
             goal=goal,
             llm=llm,
@@ -112,8 +170,6 @@ class RideComparisonAgent:
             reasoning=False
         )
 
-        result_data = {"app": app_name, "status": "failed", "data": {}, "numeric_price": float('inf')}
-
         try:
             print(f"[RideAgent] 🧠 Running Agent on {app_name}...")
             result = await agent.run()
@@ -141,22 +197,43 @@ class RideComparisonAgent:
                 
                 if clean_json.startswith("{"):
                     try:
-                        data = json.loads(clean_json)
-                        result_data["data"] = data
-                        result_data["status"] = "success"
-                        # Extract numeric price for comparison
-                        price_val = data.get("price", "inf")
-                        result_data["numeric_price"] = self._parse_price(price_val)
+                        return json.loads(clean_json)
                     except json.JSONDecodeError:
                         print(f"[Warn] JSON Decode Error: {clean_json}")
                 else:
                      print(f"[Warn] Agent output was not JSON: {clean_json[:50]}...")
             
-            return result_data
+            return None
 
         except Exception as e:
             print(f"[Error] Task Execution Failed for {app_name}: {e}")
-            return result_data
+            return None
+
+    async def _extract_from_hierarchy(self, app_name: str, ride_keywords: str, serial: Optional[str] = None):
+        """
+        Reads ride type/price/ETA from the view hierarchy (no LLM).
+        Picks the best-ranked option (price, ETA) matching the preference keywords. Returns None when selectors miss.
+        """
+        extracted = await UIExtractor(serial).extract(app_name, ["ride_type", "price", "eta"])
+        keywords = [k.strip().lower() for k in ride_keywords.split(",") if k.strip()]
+        matching = [
+            r for r in extracted["records"]
+            if r.get("ride_type") and r.get("price")
+            and any(k in r["ride_type"].lower() or r["ride_type"].lower() in k for k in keywords)
+        ]
+        if not matching:
+            print(f"[RideAgent] Hierarchy selectors missed on {app_name} ({extracted['missing']}). Falling back to vision.")
+            return None
+
+        ranked = rank_offers([{**r, "numeric_price": self._parse_price(r["price"])} for r in matching],
+                             RIDE_CRITERIA, required=("numeric_price",))
+        if not ranked:
+            print(f"[RideAgent] No readable fare on {app_name}. Falling back to vision.")
+            return None
+        best = ranked[0]
+        data = {"app": app_name, "ride_type": best["ride_type"], "price": best["price"], "eta": best.get("eta", "N/A")}
+        print(f"[RideAgent] ⚡ Extracted from UI hierarchy: {data}")
+        return data
 
     async def compare_rides(self, pickup, drop, preference="cab"):
         apps = ["Uber", "Ola"]
@@ -168,22 +245,20 @@ class RideComparisonAgent:
             # Cooldown to allow app switching/closing
             await asyncio.sleep(3)
 
-        # Comparison Logic
+        # Comparison Logic: weighted price + ETA ranking across apps
         print("\n--- Final Aggregated Results ---")
-        best_deal = None
-        min_price = float('inf')
-
+        offers = []
         for app, res in results.items():
             if res["status"] == "success":
-                price = res["numeric_price"]
-                print(f"{app}: {res['data'].get('ride_type')} - {res['data'].get('price')} (Numeric: {price})")
-                
-                if price < min_price:
-                    min_price = price
-                    best_deal = res
+                print(f"{app}: {res['data'].get('ride_type')} - {res['data'].get('price')} (Numeric: {res['numeric_price']})")
+                offers.append({"app": app, "ride_type": res["data"].get("ride_type"), "price": res["data"].get("price"),
+                               "numeric_price": res["numeric_price"], "eta": res["data"].get("eta")})
             else:
                 print(f"{app}: Failed to get data.")
 
+        ranked = rank_offers(offers, RIDE_CRITERIA, required=("numeric_price",))
+        best_deal = results[ranked[0]["app"]] if ranked else None
+        results["ranked"] = ranked
         results["best_deal"] = best_deal
 
         if best_deal:
@@ -25,6 +25,7 @@ class HotelDetails(BaseModel):
     name: str
     address: str
     price_per_night: str
+    rating: Optional[str] = None
 
 class FullTripPlan(BaseModel):
     flight: FlightDetails
@@ -13,18 +13,19 @@ from pydantic import BaseModel
 from commerce_agent import CommerceAgent
 from ride_comparison_agent import RideComparisonAgent
 from pharmacy_agent import PharmacyAgent
-from event_coordinator_agent import EventCoordinatorAgent
+from event_coordinator_agent import EventCoordinatorAgent, ACTIVE_RUNS
 from agents.general_agent import GeneralAgent
 from fastapi.staticfiles import StaticFiles
 
 # Voyager-1 Imports
-from agents.transit_agent import TransitManager
-from agents.stay_agent import StayManager
-from trip_visualizer import TripVisualizer
-from schemas import FullTripPlan
+from agents.trip_planner import TripPlanner
 
 # Import Factory
 from agents.agent_factory import AgentFactory
+from neurorun.llm_gateway import get_gateway
+from neurorun.device_pool import get_device_pool
+from neurorun.app_registry import get_app_registry
+from neurorun.checkpoint_store import get_checkpoint_store
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -126,13 +127,30 @@ class TaskPayload(BaseModel):
     # For Coordinator: List of names (str)
     event_name: str = None
     guest_list: List[str] = [] 
+    run_id: Optional[str] = None # Resume an interrupted coordination run
     
     # For Traveller
     source: str = None
     destination: str = None
     date: str = None
-    date: str = None
+    end_date: str = None # Optional return flight
     user_interests: str = None
+    hotel_preference: str = None # e.g. a hotel name or "beachfront"
+    ranking_weights: Optional[Dict[str, float]] = None # e.g. {"price": 1, "arrival_time": 2, "rating": 1}
+
+    # For Universal
+    app: Optional[str] = None # App to drive (default: let the agent decide)
+    session_id: Optional[str] = None # Voice chat session that asked for it (result is spoken back)
+
+class ReplanPayload(BaseModel):
+    """Changed trip inputs; anything left out keeps its previous value."""
+    source: Optional[str] = None
+    destination: Optional[str] = None
+    date: Optional[str] = None
+    end_date: Optional[str] = None
+    user_interests: Optional[str] = None
+    hotel_preference: Optional[str] = None
+    ranking_weights: Optional[Dict[str, float]] = None
 
 class ChatPayload(BaseModel):
     session_id: str
@@ -145,15 +163,91 @@ async def root():
     return RedirectResponse(url="/static/index.html")
 
 # --- CHAT ENDPOINT ---
-general_agent = GeneralAgent()
+async def submit_chat_action(session_id: str, action: Dict[str, Any]) -> str:
+    """Execute intents from the voice brain become normal tasks; progress and result go out over /ws."""
+    payload = TaskPayload(persona="universal", instruction=action["instruction"], app=action.get("app"),
+                          session_id=session_id)
+    return submit_task(payload)
+
+general_agent = GeneralAgent(submit_action=submit_chat_action)
 
 @app.post("/api/chat")
 async def chat_endpoint(payload: ChatPayload):
-    """Voice OS Endpoint"""
+    """Voice OS Endpoint (returns as soon as the reply is known; actions run as tasks)"""
     logger.info(f"Chat Request: {payload.message}")
     response = await general_agent.chat(payload.session_id, payload.message)
     return response
 
+@app.get("/api/chat/stats")
+async def chat_stats():
+    """Voice chat session store: live sessions, evictions, trims"""
+    return general_agent.sessions.stats()
+
+@app.on_event("shutdown")
+async def persist_chat_sessions():
+    general_agent.sessions.flush()
+
+@app.get("/api/llm/stats")
+async def llm_stats():
+    """Shared LLM gateway limiter/usage stats for monitoring"""
+    return get_gateway().stats()
+
+@app.get("/api/devices")
+async def device_pool_status():
+    """Attached devices, their profiles, current leases and resolved apps"""
+    pool = get_device_pool()
+    await pool.discover()
+    return {**pool.stats(), "apps": get_app_registry().stats()}
+
+def _run_summary(run: Dict[str, Any]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    for guest in run.get("guests", {}).values():
+        counts[guest["status"]] = counts.get(guest["status"], 0) + 1
+    return {
+        "run_id": run["run_id"],
+        "event": run.get("event", {}).get("name"),
+        "phase": run.get("phase"),
+        "guests": counts,
+        "active": run["run_id"] in ACTIVE_RUNS,
+        "updated_at": run.get("updated_at"),
+    }
+
+@app.get("/api/coordination")
+async def list_coordination_runs():
+    return [_run_summary(run) for run in get_checkpoint_store().list()]
+
+@app.get("/api/coordination/{run_id}")
+async def get_coordination_run(run_id: str):
+    run = get_checkpoint_store().load(run_id)
+    if not run:
+        return {"error": "Run not found"}
+    return {**run, "active": run_id in ACTIVE_RUNS}
+
+@app.post("/api/coordination/{run_id}/resume")
+async def resume_coordination_run(run_id: str):
+    run = get_checkpoint_store().load(run_id)
+    if not run:
+        return {"error": "Run not found"}
+    if run_id in ACTIVE_RUNS:
+        return {"error": "Run already in progress"}
+    if run.get("phase") == "complete":
+        return {"error": "Run already complete", "summary": _run_summary(run)}
+    payload = TaskPayload(persona="coordinator", event_name=run["event"]["name"],
+                          guest_list=run["contacts"], run_id=run_id)
+    task_id = submit_task(payload)
+    return {"status": "accepted", "message": f"Resuming run {run_id} from phase '{run['phase']}'", "task_id": task_id}
+
+@app.post("/api/trips/{task_id}/replan")
+async def replan_trip(task_id: str, changes: ReplanPayload):
+    """Re-runs a traveller task with some inputs changed; stages whose inputs are unchanged are reused."""
+    record = next((t for t in task_history if t["id"] == task_id and t["persona"] == "traveller"), None)
+    if not record:
+        return {"error": "Trip not found"}
+    updates = {k: v for k, v in changes.dict().items() if v is not None}
+    payload = TaskPayload(**{**record["payload"], **updates})
+    new_id = submit_task(payload)
+    return {"status": "accepted", "message": "Re-planning trip", "changed": sorted(updates), "task_id": new_id}
+
 @app.get("/tasks")
 async def get_tasks():
     return task_history
@@ -184,14 +278,18 @@ async def log_and_broadcast(task_id: str, message: str):
         "message": message
     })
 
-async def run_agent_task(payload: TaskPayload):
+def submit_task(payload: TaskPayload) -> str:
+    """Registers the task and starts it in the background; the id is usable (GET /tasks/{id}) right away."""
+    task_id = str(uuid.uuid4())
+    add_task_record(task_id, payload.persona, payload)
+    asyncio.create_task(run_agent_task(payload, task_id))
+    return task_id
+
+async def run_agent_task(payload: TaskPayload, task_id: str):
     """
     Executes the agent logic based on persona.
     Broadcasts logs to WebSocket.
     """
-    task_id = str(uuid.uuid4())
-    add_task_record(task_id, payload.persona, payload)
-    
     # Notify start
     await manager.broadcast_json({
         "type": "start",
@@ -273,7 +371,7 @@ async def run_agent_task(payload: TaskPayload):
             
             # Now passing list of dicts directly
             full_res = await agent.compare_prices(payload.medicine, "patient")
-            result = full_res.get('best_option', {"status": "failed"})
+            result = full_res.get('best_option') or {"status": "failed"}
 
         elif payload.persona == "foodie":
              agent = CommerceAgent(model="models/gemini-2.5-flash")
@@ -308,13 +406,12 @@ async def run_agent_task(payload: TaskPayload):
                  z_price = results.get('zomato', {}).get('data', {}).get('price', 'N/A')
                  s_price = results.get('swiggy', {}).get('data', {}).get('price', 'N/A')
                  
-                 zp = float(results.get('zomato', {}).get('data', {}).get('numeric_price', float('inf')))
-                 sp = float(results.get('swiggy', {}).get('data', {}).get('numeric_price', float('inf')))
+                 ranked = agent.rank_platforms(results)
+                 results["ranked"] = ranked
                  
                  winner = "None"
-                 if zp < sp: winner = "Zomato"
-                 elif sp < zp: winner = "Swiggy"
-                 elif zp == sp and zp != float('inf'): winner = "Tie"
+                 if ranked:
+                     winner = "Tie" if ranked[0]["tied"] else ranked[0]["app"]
 
                  await log_and_broadcast(task_id, f"Prices found: Zomato ({z_price}), Swiggy ({s_price})")
                  result = {
@@ -328,66 +425,39 @@ async def run_agent_task(payload: TaskPayload):
             await log_and_broadcast(task_id, f"🎪 Orchestrating Event: {payload.event_name}")
             
             # Passing list of strings directly to organize_event
-            await agent.organize_event(payload.guest_list, {
+            summary = await agent.organize_event(payload.guest_list, {
                 "name": payload.event_name,
                 "date": "TBD", 
                 "location": "TBD",
                 "time": "Evening"
-            })
-            result = {"status": "success", "message": "Event Orchestration Complete"}
+            }, run_id=payload.run_id)
+            result = {"status": summary.get("status", "failed"), "message": "Event Orchestration Complete", **summary}
 
         elif payload.persona == "traveller":
             await log_and_broadcast(task_id, f"✈️ Starting Voyager-1: Trip to {payload.destination}...")
             
-            transit_agent = TransitManager()
-            stay_agent = StayManager()
-            
-            # 1. Flight (Outbound)
-            await log_and_broadcast(task_id, f"Searching OUTBOUND flight from {payload.source} to {payload.destination}...")
-            flight = await transit_agent.find_best_flight(payload.source, payload.destination, payload.date)
-            await log_and_broadcast(task_id, f"✅ Outbound Found: {flight.airline} ({flight.price})")
-            
-            # Flight (Return) - Optional
-            return_flight = None
-            if payload.end_date:
-                await log_and_broadcast(task_id, f"Searching RETURN flight from {payload.destination} to {payload.source} on {payload.end_date}...")
-                try:
-                    return_flight = await transit_agent.find_best_flight(payload.destination, payload.source, payload.end_date)
-                    await log_and_broadcast(task_id, f"✅ Return Found: {return_flight.airline} ({return_flight.price})")
-                except Exception as e:
-                    await log_and_broadcast(task_id, f"⚠️ Return flight search failed: {e}")
-            
-            # 2. Cab
-            await log_and_broadcast(task_id, f"Booking cab for arrival at {flight.arrival_time}...")
-            cab = await transit_agent.book_cab(payload.destination, flight.arrival_time)
-            await log_and_broadcast(task_id, f"✅ Cab Scheduled: {cab.provider} at {cab.pickup_time}")
-            
-            # 3. Hotel
-            await log_and_broadcast(task_id, f"Finding hotels in {payload.destination}...")
-            hotel = await stay_agent.find_hotel(payload.destination, payload.date)
-            await log_and_broadcast(task_id, f"✅ Hotel Found: {hotel.name} ({hotel.price_per_night})")
-            
-            # 4. Itinerary
-            await log_and_broadcast(task_id, f"Generating itinerary based on: {payload.user_interests}...")
-            itinerary = await stay_agent.generate_itinerary(hotel.name, payload.user_interests)
-            await log_and_broadcast(task_id, f"✅ Itinerary Generated for {len(itinerary)} days.")
-            
-            # Compile
-            full_plan = FullTripPlan(
-                flight=flight,
-                arrival_cab=cab,
-                hotel=hotel,
-                daily_schedule=itinerary
-            )
-            
-            # 5. Visualizer
-            await log_and_broadcast(task_id, "Generating Trip Visualization...")
-            mermaid_code = TripVisualizer.generate_mermaid(full_plan)
-            full_plan.flowchart_code = mermaid_code
+            # Independent stages run concurrently; every stage completion is streamed as it happens
+            async def on_stage(event):
+                await manager.broadcast_json({"task_id": task_id, **{k: v for k, v in event.items() if k != "result"},
+                                              "type": f"stage_{event['type']}"})
+                line = TripPlanner.describe(event)
+                if line:
+                    await log_and_broadcast(task_id, line)
+
+            trip = await TripPlanner().plan(payload.source, payload.destination, payload.date,
+                                            payload.user_interests, end_date=payload.end_date, on_event=on_stage,
+                                            hotel_preference=payload.hotel_preference,
+                                            weights=payload.ranking_weights)
+            report = trip["report"]
+            await log_and_broadcast(task_id, f"⏱️ Trip planned in {report['wall_ms'] / 1000:.1f}s "
+                                             f"(stages total {report['serial_ms'] / 1000:.1f}s, "
+                                             f"recomputed: {', '.join(report['recomputed']) or 'nothing'})")
             
-            result_dict = full_plan.dict()
-            if return_flight:
-                result_dict['return_flight'] = return_flight.dict()
+            result_dict = trip["plan"].dict()
+            if trip["return_flight"]:
+                result_dict['return_flight'] = trip["return_flight"].dict()
+            result_dict['options'] = trip["options"]
+            result_dict['timing'] = report
             
             result = result_dict
             status = "success"
@@ -398,7 +468,7 @@ async def run_agent_task(payload: TaskPayload):
             
             # Use Factory directly
             res = await AgentFactory.run_task(
-                app_identifier="Universal", 
+                app_identifier=payload.app or "Universal", 
                 instruction=payload.instruction,
                 provider="gemini"
             )
@@ -436,12 +506,21 @@ async def run_agent_task(payload: TaskPayload):
         "status": status,
         "result": result
     })
+    if payload.session_id:
+        # Spoken answer for the voice UI that started this task
+        await manager.broadcast_json({
+            "type": "voice",
+            "task_id": task_id,
+            "session_id": payload.session_id,
+            "status": status,
+            "text": GeneralAgent.describe_result(result)
+        })
 
 @app.post("/task")
 async def create_task(payload: TaskPayload):
     # Run in background
-    asyncio.create_task(run_agent_task(payload))
-    return {"status": "accepted", "message": "Task queued"}
+    task_id = submit_task(payload)
+    return {"status": "accepted", "message": "Task queued", "task_id": task_id}
 
 if __name__ == "__main__":
     import uvicorn
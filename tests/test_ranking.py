@@ -0,0 +1,24 @@
+"""
+Flight ranking on the arrival timestamps the transit agent returns.
+
+    python -m pytest tests -q
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from neurorun.ranking import FLIGHT_CRITERIA, merge_weights, rank_offers
+
+
+def test_overnight_arrival_ranks_after_same_evening_arrival():
+    flights = [{"airline": "IndiGo", "price": "5,000", "arrival_time": "2025-03-02 00:30:00"},
+               {"airline": "Vistara", "price": "5,000", "arrival_time": "2025-03-01 23:10:00"}]
+    ranked = rank_offers(flights, FLIGHT_CRITERIA)
+    assert [f["airline"] for f in ranked] == ["Vistara", "IndiGo"]
+
+
+def test_arrival_without_a_date_counts_as_missing():
+    flights = [{"airline": "IndiGo", "price": "5,000", "arrival_time": "00:30"},
+               {"airline": "Vistara", "price": "5,000", "arrival_time": "2025-03-01 23:10:00"}]
+    ranked = rank_offers(flights, merge_weights(FLIGHT_CRITERIA, {"price": 0}))
+    assert [f["airline"] for f in ranked] == ["Vistara", "IndiGo"]
@@ -0,0 +1,46 @@
+"""
+Same-screen detection behind stuck recovery, the plan memo and the "screen_change" post-condition.
+
+    python -m pytest tests -q
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from neurorun.screen_cache import ScreenCache, dhash, is_unchanged, thumbnail
+
+
+def frame(checked=False, quantity="1", clock="10:41"):
+    """A cart screen at native size, downscaled like the model image in ScreenCapture._process."""
+    image = Image.new("RGB", (1080, 2400), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, 1080, 90), fill=(30, 30, 30))
+    draw.text((40, 24), clock, fill="white", font=ImageFont.load_default(size=40))
+    for top in range(200, 2200, 300):
+        draw.rectangle((40, top, 1040, top + 250), outline=(200, 200, 200), width=3)
+        draw.text((80, top + 40), "Milton Thermosteel Flask 1L", fill="black", font=ImageFont.load_default(size=36))
+    draw.rectangle((900, 500, 940, 540), outline="black", width=3)
+    if checked:
+        draw.line((905, 520, 918, 535, 935, 505), fill="black", width=5)
+    draw.text((980, 800), quantity, fill="black", font=ImageFont.load_default(size=44))
+    image = image.resize((540, 1200), Image.LANCZOS)
+    return SimpleNamespace(phash=dhash(image), thumb=thumbnail(image))
+
+
+def test_status_bar_changes_are_ignored():
+    assert is_unchanged(frame(), frame(clock="10:42"))
+
+
+def test_small_local_changes_count_as_changed():
+    assert not is_unchanged(frame(), frame(checked=True))
+    assert not is_unchanged(frame(), frame(quantity="2"))
+
+
+def test_memoized_plan_is_not_reused_after_a_small_change():
+    cache = ScreenCache()
+    cache.store("add flask to cart", frame(), {"status": "continue", "action": {"type": "tap"}})
+    assert cache.lookup("add flask to cart", frame(clock="10:42")) is not None
+    assert cache.lookup("add flask to cart", frame(quantity="2")) is None
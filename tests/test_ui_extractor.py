@@ -0,0 +1,85 @@
+"""
+Offline selector tests: each recipe runs over a saved uiautomator dump (tests/fixtures/ui).
+
+    python -m pytest tests -q
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from neurorun.ui_extractor import extract_from_xml
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "ui")
+
+
+def dump(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("app, fixture, expected", [
+    ("Flipkart", "flipkart_search.xml", [
+        {"title": "Apple iPhone 15 (Black, 128 GB)", "price": "79,900", "rating": "4.6"},
+        {"title": "Apple iPhone 15 Case", "price": "499", "rating": "4.1"},
+    ]),
+    ("Zomato", "zomato_search.xml", [
+        {"title": "Margherita Pizza", "price": "299", "rating": "4.3", "restaurant": "Domino's"},
+        {"title": "Farmhouse Pizza", "price": "459", "rating": "4.4", "restaurant": "Domino's"},
+        {"title": "Penne Pasta", "price": "249", "rating": "4.0", "restaurant": "La Pino'z"},
+    ]),
+    ("Swiggy", "swiggy_search.xml", [
+        {"title": "Chicken Dum Biryani", "price": "320", "rating": "4.5", "restaurant": "Meghana Foods"},
+        {"title": "Veg Biryani", "price": "240", "rating": "4.2", "restaurant": "Paradise"},
+    ]),
+    ("Amazon", "amazon_search.xml", [
+        {"title": "Milton Thermosteel Flask 1L", "price": "899", "rating": "4.3"},
+        {"title": "Cello Water Bottle 1L", "price": "349", "rating": "4.1"},
+    ]),
+])
+def test_commerce_recipes_read_one_record_per_card(app, fixture, expected):
+    result = extract_from_xml(app, dump(fixture), ["title", "price", "rating", "restaurant"])
+    assert result["records"] == expected
+
+
+@pytest.mark.parametrize("app, fixture, expected", [
+    ("Uber", "uber_products.xml", [
+        {"ride_type": "Uber Go", "price": "231", "eta": "4 mins away"},
+        {"ride_type": "Premier", "price": "298", "eta": "6 mins away"},
+        {"ride_type": "Uber XL", "price": "412", "eta": "9 mins away"},
+    ]),
+    ("Ola", "ola_categories.xml", [
+        {"ride_type": "Mini", "price": "219", "eta": "3 min"},
+        {"ride_type": "Prime Sedan", "price": "265", "eta": "5 min"},
+        {"ride_type": "Auto", "price": "140", "eta": "2 min"},
+    ]),
+])
+def test_ride_recipes(app, fixture, expected):
+    result = extract_from_xml(app, dump(fixture), ["ride_type", "price", "eta"])
+    assert result["records"] == expected
+    assert result["missing"] == []
+
+
+def test_toolbar_title_is_never_paired_with_a_card_price():
+    # Flipkart has no card selector: cards are inferred per price, the toolbar stays out
+    records = extract_from_xml("Flipkart", dump("flipkart_search.xml"), ["title", "price"])["records"]
+    assert all(r["title"] != "Search results" for r in records)
+
+
+def test_card_without_price_is_not_merged_with_a_neighbour():
+    # Zomato's card selector matches nothing here; "Garlic Bread" is sold out (no price)
+    records = extract_from_xml("Zomato", dump("zomato_search.xml"), ["title", "price"])["records"]
+    assert "Garlic Bread" not in [r["title"] for r in records]
+    assert {"title": "Margherita Pizza", "price": "299"} in records
+
+
+def test_query_keeps_only_the_best_matching_cards():
+    records = extract_from_xml("Zomato", dump("zomato_search.xml"), ["title", "price"], query="margherita pizza")["records"]
+    assert records == [{"title": "Margherita Pizza", "price": "299"}]
+    assert extract_from_xml("Swiggy", dump("swiggy_search.xml"), ["title", "price"], query="paneer tikka")["records"] == []
+
+
+def test_bad_dump_reports_every_field_missing():
+    result = extract_from_xml("Uber", "<hierarchy><node", ["ride_type", "price"])
+    assert result == {"records": [], "missing": ["ride_type", "price"], "source": "hierarchy"}